@@ -18,6 +18,7 @@ For example, we attached experiment.py (adjust it for your own usage) below for
 from pykg2vec.data.kgcontroller import KnowledgeGraph
 from pykg2vec.common import Importer, KGEArgParser
 from pykg2vec.utils.trainer import Trainer
+from pykg2vec.utils.multi_trainer import MultiModelTrainer, SAMPLING_SETTINGS
 
 
 def experiment(model_name):
@@ -33,7 +34,7 @@ def experiment(model_name):
     # Extracting the corresponding model config and definition from Importer().
     config_def, model_def = Importer().import_model_config(model_name)
     config = config_def(args)
-    model = model_def(**config.__dict__)
+    model = model_def(**config.get_model_params())
 
     # Create, Compile and Train the model. While training, several evaluation will be performed.
     trainer = Trainer(model, config)
@@ -41,6 +42,35 @@ def experiment(model_name):
     trainer.train_model()
 
 
+def shared_experiment(model_names):
+    args = KGEArgParser().get_args([])
+
+    args.exp = True
+    args.dataset_name = "freebase15k"
+
+    knowledge_graph = KnowledgeGraph(dataset=args.dataset_name, custom_dataset_path=args.dataset_path)
+    knowledge_graph.prepare_data()
+
+    trainers = []
+    for model_name in model_names:
+        config_def, model_def = Importer().import_model_config(model_name)
+        config = config_def(args)
+        if trainers:
+            # the models share the batches, hence the sampling settings of the first model.
+            for name in SAMPLING_SETTINGS:
+                setattr(config, name, getattr(trainers[0].config, name))
+            # the relation count doubles with the reciprocal relations.
+            config.tot_relation = trainers[0].config.tot_relation
+        model = model_def(**config.get_model_params())
+
+        trainer = Trainer(model, config)
+        trainer.build_model()
+        trainers.append(trainer)
+
+    # the models (of the same training strategy) are trained on the batches of one generator.
+    MultiModelTrainer(trainers).train_model()
+
+
 if __name__ == "__main__":
 
     # examples of train an algorithm on a benchmark dataset.
@@ -48,5 +78,8 @@ if __name__ == "__main__":
     experiment("transh")
     experiment("transr")
 
+    # the same comparison with a single sampling pipeline.
+    # shared_experiment(["transe", "transh", "transr"])
+
     # other combination we are still working on them.
     # experiment("transe", "wn18_rr")
@@ -72,7 +72,7 @@ def main():
     # Extracting the corresponding model config and definition from Importer().
     config_def, model_def = Importer().import_model_config(args.model_name.lower())
     config = config_def(args)
-    model = model_def(**config.__dict__)
+    model = model_def(**config.get_model_params())
 
     # Create, Compile and Train the model. While training, several evaluation will be performed.
     trainer = Trainer(model, config)
@@ -50,6 +50,13 @@ class KGEArgParser:
         self.general_hyper_group.add_argument('-opt', dest='optimizer', default='adam', type=str, help='optimizer to be used in training.')
         self.general_hyper_group.add_argument('-s', dest='sampling', default='uniform', type=str, help='strategy to do negative sampling.')
         self.general_hyper_group.add_argument('-ngr', dest='neg_rate', default=1, type=int, help='The number of negative samples generated per positve one.')
+        self.general_hyper_group.add_argument('-nd', dest='negative_distribution', default='uniform', type=str, choices=['uniform', 'degree', 'domain'], help='The distribution of the corrupted entities: uniform, degree^0.75 or per-relation domain/range frequency^0.75.')
+        self.general_hyper_group.add_argument('-nps', dest='neg_pool_size', default=0, type=int, help='The number of negative entities shared by a chunk of positives (0 disables the shared negatives).')
+        self.general_hyper_group.add_argument('-ncs', dest='neg_chunk_size', default=50, type=int, help='The number of positives sharing a pool of negative entities.')
+        self.general_hyper_group.add_argument('-on', dest='one_to_n', default=None, type=str, choices=['kvsall', '1vsall'], help='Train the bilinear pointwise models (DistMult, Complex, ComplexN3, CP, SimplE, ANALOGY) against all the entities: binary cross entropy on all the known tails and heads (kvsall) or cross entropy of the true one (1vsall).')
+        self.general_hyper_group.add_argument('-rcp', dest='reciprocal', default=False, type=lambda x: (str(x).lower() == 'true'), help='Add the inverse (t, r^-1, h) of every training triple and train the tails only, the head queries are evaluated as tail queries on the inverse relations.')
+        self.general_hyper_group.add_argument('-sg', dest='sparse_grad', default=False, type=lambda x: (str(x).lower() == 'true'), help='Use sparse gradients and sparse optimizers (adam, adagrad or sgd) for the embedding tables.')
+        self.general_hyper_group.add_argument('-pr', dest='precision', default='fp32', type=str, choices=['fp32', 'bf16'], help='The precision of the forward passes (bf16 uses autocast, the losses stay in fp32).')
         self.general_hyper_group.add_argument('-l', dest='epochs', default=100, type=int, help='The total number of Epochs')
         self.general_hyper_group.add_argument('-lr', dest='learning_rate', default=0.01, type=float, help='learning rate')
         self.general_hyper_group.add_argument('-k', dest='hidden_size', default=50, type=int, help='Hidden embedding size.')
@@ -66,6 +73,7 @@ class KGEArgParser:
         self.general_hyper_group.add_argument('-hdt1', dest="hidden_dropout1", default=0.4, type=float, help="hidden dropout value used in TuckER.")
         self.general_hyper_group.add_argument('-hdt2', dest="hidden_dropout2", default=0.5, type=float, help="hidden dropout value used in TuckER.")
         self.general_hyper_group.add_argument('-lbs', dest='label_smoothing', default=0.1, type=float, help="The parameter used in label smoothing.")
+        self.general_hyper_group.add_argument('-ecs', dest='entity_chunk_size', default=0, type=int, help='Compute the 1-N loss of ConvE and TuckER by chunks of _ entities from sparse labels, without the [batch, tot_entity] logits and labels (0 uses the dense labels).')
         self.general_hyper_group.add_argument('-cmax', dest='cmax', default=0.05, type=float, help="The parameter for clipping values for KG2E.")
         self.general_hyper_group.add_argument('-cmin', dest='cmin', default=5.00, type=float, help="The parameter for clipping values for KG2E.")
 
@@ -87,6 +95,42 @@ class KGEArgParser:
         self.general_group.add_argument('-plot', dest='plot_entity_only', default=False, type=lambda x: (str(x).lower() == 'true'), help='Plot the entity only!')
         self.general_group.add_argument('-device', dest='device', default='cpu', type=str, choices=['cpu', 'cuda'], help="Device to run pykg2vec (cpu or cuda).")
         self.general_group.add_argument('-npg', dest='num_process_gen', default=2, type=int, help='number of processes used in the Generator.')
+        self.general_group.add_argument('-hw', dest='hogwild_workers', default=0, type=int, help='The number of Hogwild trainer processes sharing the model (0 disables Hogwild training).')
+        self.general_group.add_argument('-ws', dest='world_size', default=int(os.environ.get('WORLD_SIZE', 1)), type=int, help='The number of processes of the distributed (gloo) training (1 disables distributed training).')
+        self.general_group.add_argument('-rk', dest='rank', default=int(os.environ.get('RANK', 0)), type=int, help='The rank of this process in the distributed training.')
+        self.general_group.add_argument('-im', dest='init_method', default='env://', type=str, help='The URL used to initialize the distributed process group (e.g. tcp://10.1.1.20:23456).')
+        self.general_group.add_argument('-np', dest='num_partitions', default=0, type=int, help='Split the entities into _ partitions stored on disk and train bucket by bucket with two partitions in memory (0 disables the partitioned training).')
+        self.general_group.add_argument('-gqs', dest='generator_queue_size', default=10, type=int, help='The size of the Generator queues (the number of batches prefetched).')
+        self.general_group.add_argument('-gat', dest='generator_autotune', default=False, type=lambda x: (str(x).lower() == 'true'), help='Adapt the number of Generator processes and the prefetch depth at runtime.')
+        self.general_group.add_argument('-cb', dest='cpu_budget', default=0, type=int, help='The number of cores available to pykg2vec (0 uses all the cores).')
+        self.general_group.add_argument('-tpl', dest='thread_plan', default=False, type=lambda x: (str(x).lower() == 'true'), help='Split the cpu budget between the trainer threads, the sampler processes and the background evaluator instead of letting each of them use all the cores.')
+        self.general_group.add_argument('-tt', dest='trainer_threads', default=0, type=int, help='The number of intra-op threads of the trainer in the resource plan (0 to plan it).')
+        self.general_group.add_argument('-spr', dest='sampler_processes', default=0, type=int, help='The number of sampler processes in the resource plan (0 to plan it, at most num_process_gen).')
+        self.general_group.add_argument('-et', dest='eval_threads', default=0, type=int, help='The number of threads of the background evaluator in the resource plan (0 to plan it).')
+        self.general_group.add_argument('-caf', dest='cpu_affinity', default=False, type=lambda x: (str(x).lower() == 'true'), help='Pin the trainer, the sampler processes and the evaluator of the resource plan to disjoint cores.')
+        self.general_group.add_argument('-sd', dest='staging_depth', default=2, type=int, help='The number of batches converted and moved to the device ahead of the training step (0 stages them synchronously).')
+        self.general_group.add_argument('-cmp', dest='compile_mode', default=None, type=str, choices=['default', 'reduce-overhead', 'max-autotune'], help='Compile the forward pass and the loss of the training steps with torch.compile in the given mode (falls back to eager on failure).')
+        self.general_group.add_argument('-cp', dest='constraint', default=None, type=str, choices=['unit', 'max'], help='Keep the tables of the translational models at unit norm (unit) or inside the unit ball (max) by projecting the rows touched by every step instead of normalizing the embeddings on every forward.')
+        self.general_group.add_argument('-ack', dest='activation_checkpointing', default=False, type=lambda x: (str(x).lower() == 'true'), help='Recompute the activations of the heavy blocks of ConvE, ConvKB and NTN in the backward pass instead of storing them (trades compute for the memory of larger batches).')
+        self.general_group.add_argument('-fbs', dest='find_batch_size', default=False, type=lambda x: (str(x).lower() == 'true'), help='Pick the batch size with the highest throughput from short calibration bursts before the training.')
+        self.general_group.add_argument('-mcap', dest='memory_cap', default=0, type=float, help='The peak memory (MB) allowed to the batch size finder (0 for no cap).')
+        self.general_group.add_argument('-slr', dest='scale_learning_rate', default=False, type=lambda x: (str(x).lower() == 'true'), help='Scale the learning rate with the batch size picked by the batch size finder.')
+        self.general_group.add_argument('-ous', dest='online_update_size', default=1000, type=int, help='The number of new triples trained by every update of the online training.')
+        self.general_group.add_argument('-rr', dest='replay_ratio', default=1.0, type=float, help='The number of old triples replayed per new triple in the online training.')
+        self.general_group.add_argument('-rb', dest='relation_bucket', default=False, type=lambda x: (str(x).lower() == 'true'), help='Group every batch by relation (speeds up TransR and Rescal).')
+        self.general_group.add_argument('-dl', dest='data_loader', default=None, type=str, choices=['map', 'iterable'], help='Feed batches with a torch DataLoader over a map-style or an iterable dataset instead of the Generator.')
+        self.general_group.add_argument('-pin', dest='pin_memory', default=False, type=lambda x: (str(x).lower() == 'true'), help='Use pinned memory in the DataLoader.')
+        self.general_group.add_argument('-pw', dest='persistent_workers', default=True, type=lambda x: (str(x).lower() == 'true'), help='Keep the DataLoader workers alive across epochs.')
+        self.general_group.add_argument('-pf', dest='prefetch_factor', default=2, type=int, help='The number of batches prefetched by every DataLoader worker.')
+        self.general_group.add_argument('-ae', dest='async_eval', default=False, type=lambda x: (str(x).lower() == 'true'), help='Run the mini-tests on snapshots of the weights in a background process while the training continues.')
+        self.general_group.add_argument('-cks', dest='checkpoint_step', default=0, type=int, help='Write a resumable checkpoint every _ epochs in the background (0 disables the checkpoints).')
+        self.general_group.add_argument('-kc', dest='keep_checkpoints', default=3, type=int, help='The number of the most recent checkpoints to keep (0 keeps all of them).')
+        self.general_group.add_argument('-resume', dest='resume', default=None, type=str, help='Resume the training from a checkpoint file or from the latest checkpoint of a directory.')
+        self.general_group.add_argument('-prof', dest='profile', default=None, type=str, choices=['train', 'eval'], help='Profile a window of steps of the training or of the evaluation with torch.profiler (trace and table saved in the results folder).')
+        self.general_group.add_argument('-pe', dest='profile_epoch', default=0, type=int, help='The epoch whose training or evaluation is profiled.')
+        self.general_group.add_argument('-pwt', dest='profile_wait', default=1, type=int, help='The number of steps skipped before the profiled window.')
+        self.general_group.add_argument('-pwu', dest='profile_warmup', default=1, type=int, help='The number of warm-up steps before the profiled window.')
+        self.general_group.add_argument('-pst', dest='profile_steps', default=5, type=int, help='The number of steps recorded in the profiled window.')
         self.general_group.add_argument('-hpf', dest='hp_abs_file', default=None, type=str, help='The path to the hyperparameter configuration YAML file.')
         self.general_group.add_argument('-ssf', dest='ss_abs_file', default=None, type=str, help='The path to the search space configuration YAML file.')
         self.general_group.add_argument('-mt', dest='max_number_trials', default=100, type=int, help='The maximum times of trials for bayesian optimizer.')
@@ -12,6 +12,7 @@ across all the algorithms, and local parameters which are specific to the algori
 from pykg2vec.data.kgcontroller import KnowledgeGraph, KGMetaData
 from pykg2vec.utils.logger import Logger
 from pykg2vec.common import HyperparameterLoader
+from pykg2vec.utils.partition import partition_capacity
 
 
 class Config:
@@ -53,6 +54,13 @@ class Config:
         self.disp_result = False
         self.patience = 3 # should make this configurable as well.
 
+        # the shard of the training triples used by this process (Hogwild or distributed training).
+        self.shard_id = 0
+        self.num_shards = 1
+
+        # the split of the cores between the trainer, the samplers and the evaluator (see thread_plan).
+        self.resource_plan = None
+
         # Visualization related,
         # p.s. the visualizer is disable for most of the KGE methods for now.
         self.disp_triple_num = 20
@@ -64,6 +72,10 @@ class Config:
         for key in self.knowledge_graph.kg_meta.__dict__:
             self.__dict__[key] = self.knowledge_graph.kg_meta.__dict__[key]
 
+        if self.reciprocal:
+            # the relation r + tot_relation // 2 is the inverse of the relation r.
+            self.tot_relation *= 2
+
         # The results of training will be stored in the following folders
         # which are relative to the parent folder (the path of the dataset).
         dataset_path = self.knowledge_graph.dataset.dataset_path
@@ -81,6 +93,21 @@ class Config:
             for key, value in paper_params.items():
                 self.__dict__[key] = value # copy all the setting from the paper.
 
+    def get_model_params(self):
+        """Function to get the keyword arguments of the model definition.
+
+            With the partitioned training (num_partitions), the entity tables of the model
+            only hold the two partitions resident in memory.
+
+            Examples:
+                >>> config = config_def(args)
+                >>> model = model_def(**config.get_model_params())
+        """
+        params = dict(self.__dict__)
+        if self.num_partitions > 0:
+            params['tot_entity'] = 2 * partition_capacity(self.tot_entity, self.num_partitions)
+        return params
+
     def summary(self):
         """Function to print the summary."""
         summary = ["", "------------------Global Setting--------------------"]
@@ -3,22 +3,480 @@
 """
 This module is for generating the batch data for training and testing.
 """
+import os
+import time
 import torch
 import numpy as np
-from multiprocessing import Process, Queue
+from multiprocessing import Process, Queue, Semaphore
 from pykg2vec.common import TrainingStrategy
+from pykg2vec.data.kgcontroller import Triple
+from pykg2vec.utils.resources import pin, sampler_cores
+from pykg2vec.utils.logger import Logger
 
-def raw_data_generator(command_queue, raw_queue, config):
+class AliasTable:
+    """Alias tables (Vose's method) drawing from discrete distributions in O(1) per sample.
+
+        Several distributions (groups) are packed into flat numpy arrays, so the tables
+        are built once in the parent process and shared copy-on-write by the forked samplers.
+
+        Args:
+            groups (list): (values, weights) pairs, one per distribution.
+    """
+
+    def __init__(self, groups):
+        offsets = [0]
+        values = []
+        prob = []
+        alias = []
+        for group_values, weights in groups:
+            group_prob, group_alias = self.build(np.asarray(weights, dtype=np.float64))
+            values.append(np.asarray(group_values, dtype=np.int64))
+            prob.append(group_prob)
+            alias.append(group_alias + offsets[-1])
+            offsets.append(offsets[-1] + len(group_values))
+
+        self.values = np.concatenate(values)
+        self.prob = np.concatenate(prob)
+        self.alias = np.concatenate(alias)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @staticmethod
+    def build(weights):
+        """Function to build the probability and alias arrays of one distribution."""
+        num = len(weights)
+        prob = weights * num / weights.sum()
+        alias = np.arange(num, dtype=np.int64)
+
+        small = [i for i in range(num) if prob[i] < 1.0]
+        large = [i for i in range(num) if prob[i] >= 1.0]
+        while small and large:
+            idx_small = small.pop()
+            idx_large = large.pop()
+            alias[idx_small] = idx_large
+            prob[idx_large] = prob[idx_large] + prob[idx_small] - 1.0
+            if prob[idx_large] < 1.0:
+                small.append(idx_large)
+            else:
+                large.append(idx_large)
+        # the leftovers are only off by rounding errors.
+        for idx in small + large:
+            prob[idx] = 1.0
+
+        return prob, alias
+
+    def is_empty(self, group=0):
+        return self.offsets[group] == self.offsets[group + 1]
+
+    def draw(self, group=0):
+        """Function to draw one value of a group."""
+        idx = np.random.randint(self.offsets[group], self.offsets[group + 1])
+        if np.random.random() >= self.prob[idx]:
+            idx = self.alias[idx]
+        return self.values[idx]
+
+    def sample(self, size, group=0):
+        """Function to draw an array of values of a group."""
+        idx = np.random.randint(self.offsets[group], self.offsets[group + 1], size=size)
+        idx = np.where(np.random.random(size=size) < self.prob[idx], idx, self.alias[idx])
+        return self.values[idx]
+
+
+def read_train_triples(config):
+    """Function to read the training triples, followed by their inverses (t, r + tot_relation // 2, h) with config.reciprocal.
+
+        Returns:
+            list: the Triple objects of the training set.
+    """
+    data = config.knowledge_graph.read_cache_data('triplets_train')
+    if config.reciprocal:
+        offset = config.tot_relation // 2
+        data = data + [Triple(t.t, t.r + offset, t.h) for t in data]
+    return data
+
+
+def read_train_labels(config):
+    """Function to read the tails of every (h, r) and the heads of every (t, r) in the training set.
+
+        With config.reciprocal the tails of (t, r + tot_relation // 2) are the heads of (t, r) and
+        the heads of (h, r + tot_relation // 2) are the tails of (h, r).
+
+        Returns:
+            tuple: the hr_t_train and tr_h_train dicts.
+    """
+    hr_t_train = config.knowledge_graph.read_cache_data('hr_t_train')
+    tr_h_train = config.knowledge_graph.read_cache_data('tr_h_train')
+    if config.reciprocal:
+        offset = config.tot_relation // 2
+        inverse_hr_t = {(t, r + offset): heads for (t, r), heads in tr_h_train.items()}
+        inverse_tr_h = {(h, r + offset): tails for (h, r), tails in hr_t_train.items()}
+        hr_t_train.update(inverse_hr_t)
+        tr_h_train.update(inverse_tr_h)
+    return hr_t_train, tr_h_train
+
+
+class NegativeSampler:
+    """Entity sampler used to corrupt the positive triples.
+
+        The entities are drawn according to config.negative_distribution:
+
+        * uniform: every entity is equally likely (np.random.randint).
+        * degree: proportional to the entity degree in the training set raised to the power 0.75 (unigram^0.75).
+        * domain: the corrupted head (tail) is drawn from the heads (tails) observed with the relation
+          in tr_h_train (hr_t_train), weighted by their frequency raised to the power 0.75.
+
+        The tables are alias tables, so every draw is O(1) whatever the distribution.
+        As the weighted distributions can be concentrated on the positives, a corruption falls back
+        to the uniform draw after max_tries rejected candidates.
+
+        Args:
+            config (object): Configuration object (uses negative_distribution and tot_entity).
+            power (float): Exponent applied to the frequencies.
+            max_tries (int): Number of rejected draws before falling back to uniform sampling.
+    """
+
+    def __init__(self, config, power=0.75, max_tries=10):
+        self.tot_entity = config.tot_entity
+        self.distribution = config.negative_distribution
+        self.max_tries = max_tries
+
+        self.entity_table = None
+        self.head_tables = None
+        self.tail_tables = None
+
+        if self.distribution == "uniform":
+            return
+
+        data = read_train_triples(config)
+        degree = np.zeros(self.tot_entity, dtype=np.float64)
+        for t in data:
+            degree[t.h] += 1
+            degree[t.t] += 1
+        entities = np.nonzero(degree)[0]
+        self.entity_table = AliasTable([(entities, degree[entities] ** power)])
+
+        if self.distribution == "domain":
+            hr_t_train, tr_h_train = read_train_labels(config)
+            self.head_tables = self._build_relation_tables(tr_h_train, config.tot_relation, power)
+            self.tail_tables = self._build_relation_tables(hr_t_train, config.tot_relation, power)
+
+    @staticmethod
+    def _build_relation_tables(pairs, tot_relation, power):
+        """Function to build one table per relation from a {(entity, relation): set of entities} dict."""
+        counts = [{} for _ in range(tot_relation)]
+        for (_, r), entities in pairs.items():
+            for e in entities:
+                counts[r][e] = counts[r].get(e, 0) + 1
+        return AliasTable([(list(c.keys()), np.asarray(list(c.values()), dtype=np.float64) ** power) for c in counts])
+
+    def draw(self, tables=None, r=0):
+        if tables is not None and not tables.is_empty(r):
+            return tables.draw(r)
+        if self.entity_table is not None:
+            return self.entity_table.draw()
+        return np.random.randint(self.tot_entity)
+
+    def sample(self, size):
+        """Function to draw an array of entities (relation independent)."""
+        if self.entity_table is not None:
+            return self.entity_table.sample(size)
+        return np.random.randint(self.tot_entity, size=size)
+
+    def corrupt_head(self, h, r, t, positive_triplets):
+        """Function to draw a head such that (h', r, t) is not a positive triple."""
+        for _ in range(self.max_tries):
+            idx_replace_head = self.draw(self.head_tables, r)
+            if (idx_replace_head, r, t) not in positive_triplets:
+                return idx_replace_head
+
+        idx_replace_head = np.random.randint(self.tot_entity)
+        while (idx_replace_head, r, t) in positive_triplets:
+            idx_replace_head = np.random.randint(self.tot_entity)
+        return idx_replace_head
+
+    def corrupt_tail(self, h, r, t, positive_triplets):
+        """Function to draw a tail such that (h, r, t') is not a positive triple."""
+        for _ in range(self.max_tries):
+            idx_replace_tail = self.draw(self.tail_tables, r)
+            if (h, r, idx_replace_tail) not in positive_triplets:
+                return idx_replace_tail
+
+        idx_replace_tail = np.random.randint(self.tot_entity)
+        while (h, r, idx_replace_tail) in positive_triplets:
+            idx_replace_tail = np.random.randint(self.tot_entity)
+        return idx_replace_tail
+
+
+def sample_pairwise(pos_triples, positive_triplets, relation_property, negative_sampler, config):
+    """Function to corrupt a batch of positive triples for pairwise training.
+
+        Args:
+            pos_triples (array): [b, 3] array of positive (h, r, t) ids.
+            positive_triplets (dict): Lookup of all the positive triples in the training set.
+            relation_property (dict): Per-relation probability used by the bern sampling.
+            negative_sampler (NegativeSampler): Sampler drawing the corrupted entities.
+            config (object): Configuration object (uses neg_rate, sampling and reciprocal).
+
+        Returns:
+            list: [ph, pr, pt, nh, nr, nt] where every positive gets neg_rate corruptions.
+    """
+    ph = pos_triples[:, 0]
+    pr = pos_triples[:, 1]
+    pt = pos_triples[:, 2]
+
+    nh = []
+    nr = []
+    nt = []
+
+    for t in pos_triples:
+
+        if config.reciprocal:
+            # the heads are corrupted as the tails of the inverse triples.
+            prob = 0.0
+        else:
+            prob = relation_property[t[1]] if config.sampling == "bern" else 0.5
+
+        for _ in range(config.neg_rate):
+
+            if np.random.random() > prob:
+                idx_replace_tail = negative_sampler.corrupt_tail(t[0], t[1], t[2], positive_triplets)
+
+                nh.append(t[0])
+                nr.append(t[1])
+                nt.append(idx_replace_tail)
+
+            else:
+                idx_replace_head = negative_sampler.corrupt_head(t[0], t[1], t[2], positive_triplets)
+
+                nh.append(idx_replace_head)
+                nr.append(t[1])
+                nt.append(t[2])
+
+    return [ph, pr, pt, nh, nr, nt]
+
+
+def sample_pointwise(pos_triples, positive_triplets, relation_property, negative_sampler, config):
+    """Function to mix a batch of positive triples with labelled corruptions for pointwise training.
+
+        Args:
+            pos_triples (array): [b, 3] array of positive (h, r, t) ids.
+            positive_triplets (dict): Lookup of all the positive triples in the training set.
+            relation_property (dict): Per-relation probability used by the bern sampling.
+            negative_sampler (NegativeSampler): Sampler drawing the corrupted entities.
+            config (object): Configuration object (uses neg_rate, sampling and reciprocal).
+
+        Returns:
+            list: [h, r, t, y] with y being 1 for the positives and -1 for the corruptions.
+    """
+    point_h = []
+    point_r = []
+    point_t = []
+    point_y = []
+
+    for t in pos_triples:
+        # postive sample
+        point_h.append(t[0])
+        point_r.append(t[1])
+        point_t.append(t[2])
+        point_y.append(1)
+
+        if config.reciprocal:
+            # the heads are corrupted as the tails of the inverse triples.
+            prob = 0.0
+        else:
+            prob = relation_property[t[1]] if config.sampling == "bern" else 0.5
+
+        for _ in range(config.neg_rate):
+
+            if np.random.random() > prob:
+                idx_replace_tail = negative_sampler.corrupt_tail(t[0], t[1], t[2], positive_triplets)
+
+                point_h.append(t[0])
+                point_r.append(t[1])
+                point_t.append(idx_replace_tail)
+                point_y.append(-1)
+
+            else:
+                idx_replace_head = negative_sampler.corrupt_head(t[0], t[1], t[2], positive_triplets)
+
+                point_h.append(idx_replace_head)
+                point_r.append(t[1])
+                point_t.append(t[2])
+                point_y.append(-1)
+
+    return [point_h, point_r, point_t, point_y]
+
+
+def sample_shared(pos_triples, negative_sampler, config):
+    """Function to draw the shared negatives of a batch of positive triples.
+
+        The positives are split into chunks of neg_chunk_size and every chunk shares
+        neg_pool_size entities drawn by the negative sampler, which replace both its heads and its tails.
+        The false negatives are not filtered (as in PyTorch-BigGraph).
+
+        Args:
+            pos_triples (array): [b, 3] array of positive (h, r, t) ids.
+            negative_sampler (NegativeSampler): Sampler drawing the pools of entities.
+            config (object): Configuration object (uses neg_chunk_size and neg_pool_size).
+
+        Returns:
+            list: [h, r, t, neg] where neg is a [ceil(b / neg_chunk_size), neg_pool_size] array of entity ids.
+    """
+    num_chunks = (len(pos_triples) + config.neg_chunk_size - 1) // config.neg_chunk_size
+    neg = negative_sampler.sample((num_chunks, config.neg_pool_size))
+
+    return [pos_triples[:, 0], pos_triples[:, 1], pos_triples[:, 2], neg]
+
+
+def sample_multiclass(raw_data, hr_t_train, tr_h_train, config):
+    """Function to build the 1-N labels of a batch for projection based training.
+
+        Args:
+            raw_data (array): [b, 3] array of positive (h, r, t) ids.
+            hr_t_train (dict): Tails seen in the training set for every (h, r).
+            tr_h_train (dict): Heads seen in the training set for every (t, r).
+            config (object): Configuration object (uses neg_rate and tot_entity).
+
+        Returns:
+            list: [h, r, t, hr_t, tr_h] where hr_t and tr_h are dense [b, tot_entity] label tensors.
+    """
+
+    def _to_sparse_i(indices):
+        x = []
+        y = []
+        for index in indices:
+            x.append(index[0])
+            y.append(index[1])
+        return [x, y]
+
+    neg_rate = config.neg_rate
+
+    h = raw_data[:, 0]
+    r = raw_data[:, 1]
+    t = raw_data[:, 2]
+
+    shape = [len(h), config.tot_entity]
+
+    indices_hr_t = []
+    indices_tr_h = []
+    neg_indices_hr_t = []
+    neg_indices_tr_h = []
+
+    random_ids = np.random.permutation(config.tot_entity)
+
+    for i in range(len(h)):
+        hr_t = hr_t_train[(h[i], r[i])]
+        tr_h = tr_h_train[(t[i], r[i])]
+
+        for idx in hr_t:
+            indices_hr_t.append([i, idx])
+        for idx in tr_h:
+            indices_tr_h.append([i, idx])
+
+        if neg_rate > 0:
+            for idx in random_ids[0:100]:
+                if idx not in hr_t:
+                    neg_indices_hr_t.append([i, idx])
+            for idx in random_ids[0:100]:
+                if idx not in tr_h:
+                    neg_indices_tr_h.append([i, idx])
+
+    values_hr_t = torch.FloatTensor([1]).repeat([len(indices_hr_t)])
+    values_tr_h = torch.FloatTensor([1]).repeat([len(indices_tr_h)])
+
+    if neg_rate > 0:
+        neg_values_hr_t = torch.FloatTensor([-1]).repeat([len(neg_indices_hr_t)])
+        neg_values_tr_h = torch.FloatTensor([-1]).repeat([len(neg_indices_tr_h)])
+
+    # It looks Torch sparse tensor does not work in multi processing
+    # so they need to be converted to dense, which is not memory efficient
+    # https://github.com/pytorch/pytorch/pull/27062
+    # https://github.com/pytorch/pytorch/issues/20248
+    hr_t = torch.sparse.LongTensor(torch.LongTensor(_to_sparse_i(indices_hr_t)), values_hr_t, torch.Size(shape)).to_dense()
+    tr_h = torch.sparse.LongTensor(torch.LongTensor(_to_sparse_i(indices_tr_h)), values_tr_h, torch.Size(shape)).to_dense()
+
+    if neg_rate > 0:
+        neg_hr_t = torch.sparse.LongTensor(torch.LongTensor(_to_sparse_i(neg_indices_hr_t)), neg_values_hr_t, torch.Size(shape)).to_dense()
+        neg_tr_h = torch.sparse.LongTensor(torch.LongTensor(_to_sparse_i(neg_indices_tr_h)), neg_values_tr_h, torch.Size(shape)).to_dense()
+
+        hr_t = hr_t.add(neg_hr_t)
+        tr_h = tr_h.add(neg_tr_h)
+
+    return [h, r, t, hr_t, tr_h]
+
+
+def sample_one_to_n(raw_data, hr_t_train, tr_h_train, config):
+    """Function to build the sparse labels of a batch for the 1-N training of the pointwise models
+        (config.one_to_n) and for the chunked 1-N loss of the projection models (config.entity_chunk_size).
+
+        The labels are sparse: the known tails (heads) of row i are given as the flat indices
+        i * tot_entity + e of the [b, tot_entity] label matrix, which the trainer fills on the device.
+
+        Args:
+            raw_data (array): [b, 3] array of positive (h, r, t) ids.
+            hr_t_train (dict): Tails seen in the training set for every (h, r).
+            tr_h_train (dict): Heads seen in the training set for every (t, r).
+            config (object): Configuration object (uses one_to_n and tot_entity).
+
+        Returns:
+            list: [h, r, t, hr_t, tr_h] for kvsall (and the chunked loss), [h, r, t] for 1vsall (the true tail and head are the labels).
+    """
+    h = raw_data[:, 0]
+    r = raw_data[:, 1]
+    t = raw_data[:, 2]
+
+    if config.one_to_n == '1vsall':
+        return [h, r, t]
+
+    hr_t = []
+    tr_h = []
+    for i in range(len(h)):
+        offset = i * config.tot_entity
+        hr_t.extend(offset + idx for idx in hr_t_train[(h[i], r[i])])
+        tr_h.extend(offset + idx for idx in tr_h_train[(t[i], r[i])])
+
+    return [h, r, t, np.asarray(hr_t, dtype=np.int64), np.asarray(tr_h, dtype=np.int64)]
+
+
+def relation_bucketed_ids(relations, batch_size, random_state=np.random):
+    """Function to get an ordering of the triples in which every batch spans only a few relations.
+
+        The relations are visited in a random order and the triples of a relation are
+        shuffled and laid out contiguously, so every batch holds one relation or the
+        boundary of a few small ones. The batches are then shuffled as a whole.
+        Relation parameterized models (TransR, Rescal) can then apply one shared
+        matrix per relation instead of gathering a matrix for every sample.
+
+        Args:
+            relations (array): Relation id of every training triple.
+            batch_size (int): Size of each batch.
+            random_state (object): numpy RandomState (or the numpy.random module) to draw from.
+
+        Returns:
+            array: Indices of the triples, batch_size * (len(relations) // batch_size) of them.
+    """
+    relations = np.asarray(relations)
+    number_of_batch = len(relations) // batch_size
+
+    relation_order = random_state.permutation(relations.max() + 1)
+    random_ids = random_state.permutation(len(relations))
+    random_ids = random_ids[np.argsort(relation_order[relations[random_ids]], kind='stable')]
+
+    batches = random_ids[:number_of_batch * batch_size].reshape(number_of_batch, batch_size)
+    return batches[random_state.permutation(number_of_batch)].reshape(-1)
+
+
+def raw_data_generator(command_queue, raw_queue, config, credits=None):
     """Function to feed  triples to raw queue for multiprocessing.
 
         Args:
             raw_queue (Queue) : Multiprocessing Queue to put the raw data to be processed.
+            credits (Semaphore) : If given, one credit is taken per batch which bounds the prefetch depth.
             data (list) : List of integer ids denoting positive triples.
             batch_size (int) : Size of each batch.
             number_of_batch (int) : Total number of batch.
 
     """
-    data = config.knowledge_graph.read_cache_data('triplets_train')
+    data = read_train_triples(config)[config.shard_id::config.num_shards]
 
     number_of_batch = len(data) // config.batch_size
 
@@ -30,23 +488,27 @@ def raw_data_generator(command_queue, raw_queue, config):
 
         if command != "quit":
             number_of_batch = command
+            if config.relation_bucket:
+                random_ids = relation_bucketed_ids([t.r for t in data], config.batch_size)
             for batch_idx in range(number_of_batch):
                 pos_start = config.batch_size * batch_idx
                 pos_end = config.batch_size * (batch_idx + 1)
                 raw_data = np.asarray([[data[x].h, data[x].r, data[x].t] for x in random_ids[pos_start:pos_end]])
+                if credits is not None:
+                    credits.acquire()
                 raw_queue.put((batch_idx, raw_data))
         else:
-            raw_queue.put(None)
-            raw_queue.put(None)
+            # the sampler processes are stopped by the Generator, one sentinel each.
             return
 
 
-def process_function_pairwise(raw_queue, processed_queue, config):
+def process_function_pairwise(raw_queue, processed_queue, negative_sampler, config):
     """Function that puts the processed data in the queue.
 
         Args:
             raw_queue (Queue) : Multiprocessing Queue to put the raw data to be processed.
             processed_queue (Queue) : Multiprocessing Queue to put the processed data.
+            negative_sampler (NegativeSampler): Sampler drawing the corrupted entities.
             te (int): Total number of entities
             bs (int): Total size of each batch.
             positive_triplets (list) : List of positive triples.
@@ -54,10 +516,9 @@ def process_function_pairwise(raw_queue, processed_queue, config):
             lr (int): Id of the last processed relation.
             lt (int): Id of the last processed tail.
     """
-    data = config.knowledge_graph.read_cache_data('triplets_train')
+    data = read_train_triples(config)
     relation_property = config.knowledge_graph.read_cache_data('relationproperty')
     positive_triplets = {(t.h, t.r, t.t): 1 for t in data}
-    neg_rate = config.neg_rate
 
     del data # save memory space
 
@@ -67,48 +528,18 @@ def process_function_pairwise(raw_queue, processed_queue, config):
             return
         _, pos_triples = item
 
-        ph = pos_triples[:, 0]
-        pr = pos_triples[:, 1]
-        pt = pos_triples[:, 2]
-
-        nh = []
-        nr = []
-        nt = []
-
-        for t in pos_triples:
-
-            prob = relation_property[t[1]] if config.sampling == "bern" else 0.5
-
-            for _ in range(neg_rate):
-
-                if np.random.random() > prob:
-                    idx_replace_tail = np.random.randint(config.tot_entity)
-
-                    while (t[0], t[1], idx_replace_tail) in positive_triplets:
-                        idx_replace_tail = np.random.randint(config.tot_entity)
-
-                    nh.append(t[0])
-                    nr.append(t[1])
-                    nt.append(idx_replace_tail)
-
-                else:
-                    idx_replace_head = np.random.randint(config.tot_entity)
-
-                    while (idx_replace_head, t[1], t[2]) in positive_triplets:
-                        idx_replace_head = np.random.randint(config.tot_entity)
-
-                    nh.append(idx_replace_head)
-                    nr.append(t[1])
-                    nt.append(t[2])
-
-        processed_queue.put([ph, pr, pt, nh, nr, nt])
+        if config.neg_pool_size > 0:
+            processed_queue.put(sample_shared(pos_triples, negative_sampler, config))
+        else:
+            processed_queue.put(sample_pairwise(pos_triples, positive_triplets, relation_property, negative_sampler, config))
 
-def process_function_pointwise(raw_queue, processed_queue, config):
+def process_function_pointwise(raw_queue, processed_queue, negative_sampler, config):
     """Function that puts the processed data in the queue.
 
         Args:
             raw_queue (Queue) : Multiprocessing Queue to put the raw data to be processed.
             processed_queue (Queue) : Multiprocessing Queue to put the processed data.
+            negative_sampler (NegativeSampler): Sampler drawing the corrupted entities.
             te (int): Total number of entities
             bs (int): Total size of each batch.
             positive_triplets (list) : List of positive triples.
@@ -116,10 +547,9 @@ def process_function_pointwise(raw_queue, processed_queue, config):
             lr (int): Id of the last processed relation.
             lt (int): Id of the last processed tail.
     """
-    data = config.knowledge_graph.read_cache_data('triplets_train')
+    data = read_train_triples(config)
     relation_property = config.knowledge_graph.read_cache_data('relationproperty')
     positive_triplets = {(t.h, t.r, t.t): 1 for t in data}
-    neg_rate = config.neg_rate
 
     del data # save memory space
 
@@ -129,45 +559,10 @@ def process_function_pointwise(raw_queue, processed_queue, config):
             return
         _, pos_triples = item
 
-        point_h = []
-        point_r = []
-        point_t = []
-        point_y = []
-
-        for t in pos_triples:
-            # postive sample
-            point_h.append(t[0])
-            point_r.append(t[1])
-            point_t.append(t[2])
-            point_y.append(1)
-
-            prob = relation_property[t[1]] if config.sampling == "bern" else 0.5
-
-            for _ in range(neg_rate):
-
-                if np.random.random() > prob:
-                    idx_replace_tail = np.random.randint(config.tot_entity)
-
-                    while (t[0], t[1], idx_replace_tail) in positive_triplets:
-                        idx_replace_tail = np.random.randint(config.tot_entity)
-
-                    point_h.append(t[0])
-                    point_r.append(t[1])
-                    point_t.append(idx_replace_tail)
-                    point_y.append(-1)
-
-                else:
-                    idx_replace_head = np.random.randint(config.tot_entity)
-
-                    while (idx_replace_head, t[1], t[2]) in positive_triplets:
-                        idx_replace_head = np.random.randint(config.tot_entity)
-
-                    point_h.append(idx_replace_head)
-                    point_r.append(t[1])
-                    point_t.append(t[2])
-                    point_y.append(-1)
-
-        processed_queue.put([point_h, point_r, point_t, point_y])
+        if config.neg_pool_size > 0:
+            processed_queue.put(sample_shared(pos_triples, negative_sampler, config))
+        else:
+            processed_queue.put(sample_pointwise(pos_triples, positive_triplets, relation_property, negative_sampler, config))
 
 
 def process_function_multiclass(raw_queue, processed_queue, config):
@@ -180,79 +575,40 @@ def process_function_multiclass(raw_queue, processed_queue, config):
             bs (int): Total size of each batch.
             neg_rate (int): Ratio of negative to positive samples.
     """
-
-    def _to_sparse_i(indices):
-        x = []
-        y = []
-        for index in indices:
-            x.append(index[0])
-            y.append(index[1])
-        return [x, y]
-
-    hr_t_train = config.knowledge_graph.read_cache_data('hr_t_train')
-    tr_h_train = config.knowledge_graph.read_cache_data('tr_h_train')
-
-    neg_rate = config.neg_rate
-
-    shape = [config.batch_size, config.tot_entity]
+    hr_t_train, tr_h_train = read_train_labels(config)
 
     while True:
         item = raw_queue.get()
         if item is None:
             return
-        idx, raw_data = item
-
-        h = raw_data[:, 0]
-        r = raw_data[:, 1]
-        t = raw_data[:, 2]
-
-        indices_hr_t = []
-        indices_tr_h = []
-        neg_indices_hr_t = []
-        neg_indices_tr_h = []
-
-        random_ids = np.random.permutation(config.tot_entity)
-
-        for i in range(config.batch_size):
-            hr_t = hr_t_train[(h[i], r[i])]
-            tr_h = tr_h_train[(t[i], r[i])]
-
-            for idx in hr_t:
-                indices_hr_t.append([i, idx])
-            for idx in tr_h:
-                indices_tr_h.append([i, idx])
+        _, raw_data = item
 
-            if neg_rate > 0:
-                for idx in random_ids[0:100]:
-                    if idx not in hr_t:
-                        neg_indices_hr_t.append([i, idx])
-                for idx in random_ids[0:100]:
-                    if idx not in tr_h:
-                        neg_indices_tr_h.append([i, idx])
+        processed_queue.put(sample_multiclass(raw_data, hr_t_train, tr_h_train, config))
 
 
-        values_hr_t = torch.FloatTensor([1]).repeat([len(indices_hr_t)])
-        values_tr_h = torch.FloatTensor([1]).repeat([len(indices_tr_h)])
+def process_function_one_to_n(raw_queue, processed_queue, config):
+    """Function that puts the batches with their sparse 1-N labels (config.one_to_n or config.entity_chunk_size) in the queue.
 
-        if neg_rate > 0:
-            neg_values_hr_t = torch.FloatTensor([-1]).repeat([len(neg_indices_hr_t)])
-            neg_values_tr_h = torch.FloatTensor([-1]).repeat([len(neg_indices_tr_h)])
+        Args:
+            raw_queue (Queue) : Multiprocessing Queue to put the raw data to be processed.
+            processed_queue (Queue) : Multiprocessing Queue to put the processed data.
+            config (object): Configuration object.
+    """
+    hr_t_train, tr_h_train = read_train_labels(config)
 
-        # It looks Torch sparse tensor does not work in multi processing
-        # so they need to be converted to dense, which is not memory efficient
-        # https://github.com/pytorch/pytorch/pull/27062
-        # https://github.com/pytorch/pytorch/issues/20248
-        hr_t = torch.sparse.LongTensor(torch.LongTensor(_to_sparse_i(indices_hr_t)), values_hr_t, torch.Size(shape)).to_dense()
-        tr_h = torch.sparse.LongTensor(torch.LongTensor(_to_sparse_i(indices_tr_h)), values_tr_h, torch.Size(shape)).to_dense()
+    while True:
+        item = raw_queue.get()
+        if item is None:
+            return
+        _, raw_data = item
 
-        if neg_rate > 0:
-            neg_hr_t = torch.sparse.LongTensor(torch.LongTensor(_to_sparse_i(neg_indices_hr_t)), neg_values_hr_t, torch.Size(shape)).to_dense()
-            neg_tr_h = torch.sparse.LongTensor(torch.LongTensor(_to_sparse_i(neg_indices_tr_h)), neg_values_tr_h, torch.Size(shape)).to_dense()
+        processed_queue.put(sample_one_to_n(raw_data, hr_t_train, tr_h_train, config))
 
-            hr_t = hr_t.add(neg_hr_t)
-            tr_h = tr_h.add(neg_tr_h)
 
-        processed_queue.put([h, r, t, hr_t, tr_h])
+def run_sampler(process_function, num_threads, *args):
+    """Function run by the sampler processes of a resource plan: limits the intra-op threads before sampling."""
+    torch.set_num_threads(num_threads)
+    process_function(*args)
 
 
 class Generator:
@@ -270,21 +626,60 @@ class Generator:
             >>> from pykg2vec.models.TransE impor TransE
             >>> model = TransE()
             >>> gen_train = Generator(model.config, training_strategy=TrainingStrategy.PAIRWISE_BASED)
+
+        With config.generator_autotune the generator measures how long the trainer waits for
+        batches and how full the processed queue is, and every autotune_interval batches
+        it adds or removes sampler processes (up to the cpu budget left by the torch intra-op
+        threads) and adjusts the prefetch depth, i.e. the number of batches in flight.
+        The chosen steady state is kept in steady_state and logged at every epoch.
     """
+    _logger = Logger().get_logger(__name__)
 
-    def __init__(self, model, config):
+    def __init__(self, model, config, autotune_interval=20):
         self.model = model
         self.config = config
         self.training_strategy = model.training_strategy
 
         self.process_list = []
+        self.num_workers = 0
+
+        # the alias tables are built once here and inherited by the sampler processes.
+        self.negative_sampler = None
+        if self.training_strategy != TrainingStrategy.PROJECTION_BASED:
+            self.negative_sampler = NegativeSampler(config)
 
-        self.raw_queue_size = 10
-        self.processed_queue_size = 10
-        self.command_queue = Queue(self.raw_queue_size)
+        self.autotune = config.generator_autotune
+        self.autotune_interval = autotune_interval
+        self.steady_state = {}
+
+        if config.resource_plan is not None:
+            self.max_workers = max(1, config.resource_plan['sampler_processes'])
+        else:
+            cpu_budget = config.cpu_budget if config.cpu_budget > 0 else (os.cpu_count() or 1)
+            self.max_workers = max(1, cpu_budget - torch.get_num_threads())
+
+        self.raw_queue_size = config.generator_queue_size
+        self.processed_queue_size = config.generator_queue_size
+        self.credits = None
+        if self.autotune:
+            # the queues are sized for the deepest prefetch allowed,
+            # the effective depth is the number of credits handed to the feeder.
+            self.prefetch_depth = config.generator_queue_size
+            self.max_depth = 2 * config.generator_queue_size
+            self.raw_queue_size = self.max_depth
+            self.processed_queue_size = self.max_depth
+            self.credits = Semaphore(self.prefetch_depth)
+            self.debt = 0
+            self.worker_floor = 1
+            self.last_action = None
+
+        self.command_queue = Queue(10)
         self.raw_queue = Queue(self.raw_queue_size)
         self.processed_queue = Queue(self.processed_queue_size)
 
+        if self.autotune:
+            self.reset_stats()
+
         self.create_feeder_process()
         self.create_train_processor_process()
 
@@ -292,11 +687,34 @@ class Generator:
         return self
 
     def __next__(self):
-        return self.processed_queue.get()
+        if not self.autotune:
+            return self.processed_queue.get()
+
+        request_time = time.perf_counter()
+        if self.last_return is not None:
+            self.stats['busy'] += request_time - self.last_return
+        self.stats['occupancy'] += self.occupancy()
+
+        data = self.processed_queue.get()
+
+        self.stats['wait'] += time.perf_counter() - request_time
+        self.stats['batches'] += 1
+        if self.debt > 0:
+            self.debt -= 1
+        else:
+            self.credits.release()
+
+        if self.stats['batches'] >= self.autotune_interval:
+            self.tune()
+
+        self.last_return = time.perf_counter()
+        return data
 
     def stop(self):
         """Function to stop all the worker process."""
         self.command_queue.put("quit")
+        for _ in range(self.num_workers):
+            self.raw_queue.put(None)
         for worker_process in self.process_list:
             while True:
                 worker_process.join(1)
@@ -305,25 +723,114 @@ class Generator:
 
     def create_feeder_process(self):
         """Function create the feeder process."""
-        feeder_worker = Process(target=raw_data_generator, args=(self.command_queue, self.raw_queue, self.config))
+        feeder_worker = Process(target=raw_data_generator, args=(self.command_queue, self.raw_queue, self.config, self.credits))
         self.process_list.append(feeder_worker)
         feeder_worker.daemon = True
         feeder_worker.start()
 
     def create_train_processor_process(self):
         """Function ro create the process for generating training samples."""
-        for _ in range(self.config.num_process_gen):
-            if self.training_strategy == TrainingStrategy.PROJECTION_BASED:
-                process_worker = Process(target=process_function_multiclass, args=(self.raw_queue, self.processed_queue, self.config))
-            elif self.training_strategy == TrainingStrategy.PAIRWISE_BASED:
-                process_worker = Process(target=process_function_pairwise, args=(self.raw_queue, self.processed_queue, self.config))
-            elif self.training_strategy == TrainingStrategy.POINTWISE_BASED:
-                process_worker = Process(target=process_function_pointwise, args=(self.raw_queue, self.processed_queue, self.config))
+        num_process_gen = self.config.num_process_gen
+        if self.autotune:
+            num_process_gen = min(max(1, num_process_gen), self.max_workers)
+        for _ in range(num_process_gen):
+            self.add_worker()
+
+    def add_worker(self):
+        """Function to start one more process generating training samples."""
+        if self.config.one_to_n is not None or self.config.entity_chunk_size > 0:
+            target, args = process_function_one_to_n, (self.raw_queue, self.processed_queue, self.config)
+        elif self.training_strategy == TrainingStrategy.PROJECTION_BASED:
+            target, args = process_function_multiclass, (self.raw_queue, self.processed_queue, self.config)
+        elif self.training_strategy == TrainingStrategy.PAIRWISE_BASED:
+            target, args = process_function_pairwise, (self.raw_queue, self.processed_queue, self.negative_sampler, self.config)
+        elif self.training_strategy == TrainingStrategy.POINTWISE_BASED:
+            target, args = process_function_pointwise, (self.raw_queue, self.processed_queue, self.negative_sampler, self.config)
+        else:
+            raise NotImplementedError("This strategy is not supported.")
+
+        plan = self.config.resource_plan
+        if plan is not None:
+            target, args = run_sampler, (target, plan['sampler_threads']) + args
+        process_worker = Process(target=target, args=args)
+        self.process_list.append(process_worker)
+        process_worker.daemon = True
+        process_worker.start()
+        if plan is not None:
+            pin(sampler_cores(plan, self.num_workers), process_worker.pid)
+        self.num_workers += 1
+
+    def remove_worker(self):
+        """Function to retire one process generating training samples once it has drained its pending batches."""
+        self.raw_queue.put(None)
+        self.num_workers -= 1
+
+    def set_prefetch_depth(self, depth):
+        """Function to change the number of batches in flight between the feeder and the trainer."""
+        depth = min(max(depth, 1), self.max_depth)
+        for _ in range(depth - self.prefetch_depth):
+            if self.debt > 0:
+                self.debt -= 1
+            else:
+                self.credits.release()
+        if depth < self.prefetch_depth:
+            # the credits come back with the batches in flight, keep them instead.
+            self.debt += self.prefetch_depth - depth
+        self.prefetch_depth = depth
+
+    def occupancy(self):
+        try:
+            return self.processed_queue.qsize()
+        except NotImplementedError:
+            # qsize is not available on macOS.
+            return 0
+
+    def reset_stats(self):
+        self.stats = {'busy': 0.0, 'wait': 0.0, 'occupancy': 0, 'batches': 0, 'start': self.occupancy()}
+        self.last_return = None
+
+    def tune(self):
+        """Function to adapt the sampler processes and the prefetch depth to the measured rates."""
+        stats = self.stats
+        elapsed = stats['busy'] + stats['wait']
+        wait_fraction = stats['wait'] / elapsed if elapsed > 0 else 0.0
+        occupancy = stats['occupancy'] / stats['batches'] / self.prefetch_depth
+        produced = stats['batches'] + self.occupancy() - stats['start']
+
+        self.steady_state = {
+            'workers': self.num_workers,
+            'prefetch_depth': self.prefetch_depth,
+            'consumer_rate': stats['batches'] / stats['busy'] if stats['busy'] > 0 else float('inf'),
+            'producer_rate': produced / elapsed if elapsed > 0 else float('inf'),
+            'wait_fraction': wait_fraction,
+            'occupancy': occupancy,
+        }
+
+        if wait_fraction > 0.1:
+            # the trainer starves: more samplers if the budget allows, and a deeper prefetch to absorb jitter.
+            if self.last_action == 'remove':
+                self.worker_floor = self.num_workers + 1
+            if self.num_workers < self.max_workers:
+                self.add_worker()
+                self.last_action = 'add'
+            self.set_prefetch_depth(max(self.prefetch_depth + 1, 2 * self.num_workers))
+        elif wait_fraction < 0.01 and occupancy > 0.75:
+            # the samplers are ahead and idle on a full queue: give the cores back to torch.
+            if self.num_workers > self.worker_floor:
+                self.remove_worker()
+                self.last_action = 'remove'
             else:
-                raise NotImplementedError("This strategy is not supported.")
-            self.process_list.append(process_worker)
-            process_worker.daemon = True
-            process_worker.start()
+                self.set_prefetch_depth(max(self.prefetch_depth - 1, self.num_workers + 1))
+
+        self.reset_stats()
 
     def start_one_epoch(self, num_batch):
+        if self.autotune:
+            if self.steady_state:
+                self._logger.info("Generator autotune: %d sampler processes, prefetch depth %d, "
+                                  "consumer %.1f batch/s, producer %.1f batch/s, wait %.1f%%, occupancy %.1f%%"
+                                  % (self.steady_state['workers'], self.steady_state['prefetch_depth'],
+                                     self.steady_state['consumer_rate'], self.steady_state['producer_rate'],
+                                     100 * self.steady_state['wait_fraction'], 100 * self.steady_state['occupancy']))
+            self.last_return = None
         self.command_queue.put(num_batch)
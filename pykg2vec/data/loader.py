@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module provides torch.utils.data compatible datasets and collate functions,
+so the training batches can be produced by a standard torch DataLoader
+(pinned memory, persistent workers, worker seeding and prefetching) instead of
+the hand-rolled queues of the Generator.
+"""
+import torch
+import numpy as np
+from functools import partial
+from torch.utils.data import Dataset, IterableDataset, Sampler, DataLoader, get_worker_info
+from pykg2vec.common import TrainingStrategy
+from pykg2vec.utils.resources import pin, sampler_cores
+from pykg2vec.data.generator import NegativeSampler, read_train_triples, read_train_labels, sample_pairwise, sample_pointwise, sample_multiclass, sample_one_to_n, sample_shared, relation_bucketed_ids
+
+
+class TripletDataset(Dataset):
+    """Map-style dataset over the training triples.
+
+        Every item is a numpy array holding the (h, r, t) ids of one positive triple,
+        the negative sampling is left to the collate functions. Only the shard
+        config.shard_id out of config.num_shards of the triples is kept.
+
+        Args:
+            config (object): Configuration object holding the knowledge graph.
+
+        Examples:
+            >>> from pykg2vec.data.loader import TripletDataset, PairwiseCollator
+            >>> from torch.utils.data import DataLoader
+            >>> loader = DataLoader(TripletDataset(config), batch_size=128, collate_fn=PairwiseCollator(config))
+    """
+
+    def __init__(self, config):
+        data = read_train_triples(config)
+        self.triples = np.asarray([[t.h, t.r, t.t] for t in data], dtype=np.int64)[config.shard_id::config.num_shards]
+
+    def __len__(self):
+        return len(self.triples)
+
+    def __getitem__(self, idx):
+        return self.triples[idx]
+
+
+class TripletIterableDataset(IterableDataset):
+    """Iterable dataset yielding already collated batches of one epoch.
+
+        The triples are shuffled with a new permutation in every epoch and the batches
+        are split across the DataLoader workers, so it has to be used with batch_size=None.
+
+        Args:
+            config (object): Configuration object holding the knowledge graph.
+            collate_fn (callable): One of the collators defined in this module.
+    """
+
+    def __init__(self, config, collate_fn):
+        self.triples = TripletDataset(config).triples
+        self.batch_size = config.batch_size
+        self.relation_bucket = config.relation_bucket
+        self.collate_fn = collate_fn
+        self.seed = np.random.randint(2**31)
+        self.epoch = 0
+        self._num_iterations = 0
+
+    def __len__(self):
+        return len(self.triples) // self.batch_size
+
+    def set_epoch(self, epoch):
+        """Function to set the epoch used to draw the permutation (needed without persistent workers)."""
+        self.epoch = epoch
+
+    def __iter__(self):
+        worker_info = get_worker_info()
+        worker_id, num_workers = (0, 1) if worker_info is None else (worker_info.id, worker_info.num_workers)
+
+        # every worker draws the same permutation and keeps its own stride of batches.
+        # persistent workers keep their copy of the dataset, so they count the epochs themselves.
+        seed = (self.seed + self.epoch + self._num_iterations) % 2**32
+        if self.relation_bucket:
+            random_ids = relation_bucketed_ids(self.triples[:, 1], self.batch_size, np.random.RandomState(seed))
+        else:
+            random_ids = np.random.RandomState(seed).permutation(len(self.triples))
+        self._num_iterations += 1
+
+        for batch_idx in range(worker_id, len(self), num_workers):
+            pos_start = self.batch_size * batch_idx
+            pos_end = self.batch_size * (batch_idx + 1)
+            yield self.collate_fn(self.triples[random_ids[pos_start:pos_end]])
+
+
+class RelationBucketBatchSampler(Sampler):
+    """Batch sampler yielding batches of the TripletDataset grouped by relation.
+
+        Args:
+            relations (array): Relation id of every training triple.
+            batch_size (int): Size of each batch.
+    """
+
+    def __init__(self, relations, batch_size):
+        self.relations = relations
+        self.batch_size = batch_size
+
+    def __len__(self):
+        return len(self.relations) // self.batch_size
+
+    def __iter__(self):
+        random_ids = relation_bucketed_ids(self.relations, self.batch_size)
+        for batch_idx in range(len(self)):
+            yield random_ids[self.batch_size * batch_idx:self.batch_size * (batch_idx + 1)].tolist()
+
+
+class PairwiseCollator:
+    """Collate function corrupting a batch of positive triples for pairwise training.
+
+        Args:
+            config (object): Configuration object holding the knowledge graph.
+
+        Returns:
+            list: [ph, pr, pt, nh, nr, nt] LongTensors, or [h, r, t, neg] with shared negatives.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        data = read_train_triples(config)
+        self.relation_property = config.knowledge_graph.read_cache_data('relationproperty')
+        self.positive_triplets = {(t.h, t.r, t.t): 1 for t in data}
+        self.negative_sampler = NegativeSampler(config)
+
+    def __call__(self, batch):
+        pos_triples = np.stack(batch) if isinstance(batch, list) else batch
+        if self.config.neg_pool_size > 0:
+            data = sample_shared(pos_triples, self.negative_sampler, self.config)
+        else:
+            data = sample_pairwise(pos_triples, self.positive_triplets, self.relation_property, self.negative_sampler, self.config)
+        return [torch.as_tensor(np.asarray(x, dtype=np.int64)) for x in data]
+
+
+class PointwiseCollator(PairwiseCollator):
+    """Collate function mixing a batch of positive triples with labelled corruptions for pointwise training.
+
+        Args:
+            config (object): Configuration object holding the knowledge graph.
+
+        Returns:
+            list: [h, r, t, y] LongTensors, or [h, r, t, neg] with shared negatives.
+    """
+
+    def __call__(self, batch):
+        pos_triples = np.stack(batch) if isinstance(batch, list) else batch
+        if self.config.neg_pool_size > 0:
+            data = sample_shared(pos_triples, self.negative_sampler, self.config)
+        else:
+            data = sample_pointwise(pos_triples, self.positive_triplets, self.relation_property, self.negative_sampler, self.config)
+        return [torch.as_tensor(np.asarray(x, dtype=np.int64)) for x in data]
+
+
+class MulticlassCollator:
+    """Collate function building the 1-N labels of a batch for projection based training.
+
+        Args:
+            config (object): Configuration object holding the knowledge graph.
+
+        Returns:
+            list: [h, r, t] LongTensors followed by the dense [b, tot_entity] hr_t and tr_h labels.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.hr_t_train, self.tr_h_train = read_train_labels(config)
+
+    def __call__(self, batch):
+        raw_data = np.stack(batch) if isinstance(batch, list) else batch
+        h, r, t, hr_t, tr_h = sample_multiclass(raw_data, self.hr_t_train, self.tr_h_train, self.config)
+        return [torch.as_tensor(h), torch.as_tensor(r), torch.as_tensor(t), hr_t, tr_h]
+
+
+class OneToNCollator(MulticlassCollator):
+    """Collate function building the sparse 1-N labels of a batch (config.one_to_n or config.entity_chunk_size).
+
+        Args:
+            config (object): Configuration object holding the knowledge graph.
+
+        Returns:
+            list: [h, r, t] LongTensors followed by the flat indices of the hr_t and tr_h labels for kvsall.
+    """
+
+    def __call__(self, batch):
+        raw_data = np.stack(batch) if isinstance(batch, list) else batch
+        data = sample_one_to_n(raw_data, self.hr_t_train, self.tr_h_train, self.config)
+        return [torch.as_tensor(np.asarray(x, dtype=np.int64)) for x in data]
+
+
+def seed_worker(worker_id, resource_plan=None):
+    """Function to seed the numpy RNG of every DataLoader worker from its torch seed,
+       otherwise the forked workers would share the same numpy state and draw identical negatives.
+       With a resource plan the worker also gets the threads and the cores of a sampler process."""
+    np.random.seed(torch.initial_seed() % 2**32)
+    if resource_plan is not None:
+        torch.set_num_threads(resource_plan['sampler_threads'])
+        pin(sampler_cores(resource_plan, worker_id))
+
+
+def get_collator(training_strategy, config):
+    """Function to get the collate function matching the training strategy of a model."""
+    if config.one_to_n is not None or config.entity_chunk_size > 0:
+        return OneToNCollator(config)
+    if training_strategy == TrainingStrategy.PROJECTION_BASED:
+        return MulticlassCollator(config)
+    if training_strategy == TrainingStrategy.PAIRWISE_BASED:
+        return PairwiseCollator(config)
+    if training_strategy == TrainingStrategy.POINTWISE_BASED:
+        return PointwiseCollator(config)
+    raise NotImplementedError("This strategy is not supported.")
+
+
+def build_data_loader(model, config, iterable=False):
+    """Function to create a torch DataLoader producing the training batches of a model.
+
+        The standard DataLoader knobs are taken from the configuration:
+        num_process_gen (workers), pin_memory, persistent_workers and prefetch_factor.
+
+        Args:
+            model (object): KGE model object, its training strategy selects the collate function.
+            config (object): Configuration object.
+            iterable (bool): If True, use TripletIterableDataset which collates inside the workers
+                and yields whole batches, otherwise a map-style TripletDataset with a shuffled sampler.
+
+        Returns:
+            DataLoader: the loader which can be consumed by Trainer.train_model_epoch.
+    """
+    collate_fn = get_collator(model.training_strategy, config)
+    num_workers = config.num_process_gen
+
+    kwargs = {
+        'num_workers': num_workers,
+        'pin_memory': config.pin_memory,
+        'worker_init_fn': seed_worker if config.resource_plan is None else partial(seed_worker, resource_plan=config.resource_plan),
+    }
+    if num_workers > 0:
+        kwargs['persistent_workers'] = config.persistent_workers
+        kwargs['prefetch_factor'] = config.prefetch_factor
+
+    if iterable:
+        return DataLoader(TripletIterableDataset(config, collate_fn), batch_size=None, **kwargs)
+
+    dataset = TripletDataset(config)
+    if config.relation_bucket:
+        batch_sampler = RelationBucketBatchSampler(dataset.triples[:, 1], config.batch_size)
+        return DataLoader(dataset, batch_sampler=batch_sampler, collate_fn=collate_fn, **kwargs)
+
+    return DataLoader(dataset, batch_size=config.batch_size, shuffle=True,
+                      drop_last=True, collate_fn=collate_fn, **kwargs)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for staging the training batches: converting the sampled lists and
+arrays to tensors and moving them to the training device on a background thread,
+so that the preparation of the next batches overlaps with the current training step.
+"""
+import threading
+import queue
+import time
+import torch
+import numpy as np
+
+
+class BatchStager:
+    """Iterator over the staged batches of one epoch.
+
+        Every batch produced by the Generator (or a DataLoader) is converted into a list of
+        tensors on config.device: the integer fields become LongTensors and the label tensors
+        keep their dtype. On cpu the tensors share the memory of the sampled arrays, on cuda
+        they are copied into a ring of reused pinned buffers so that no new storage is
+        allocated per step and the transfers are asynchronous.
+
+        With depth > 0 a background thread stages up to depth batches ahead of the trainer,
+        with depth == 0 the batches are staged synchronously on the calling thread. close()
+        stops the thread of an epoch left early.
+
+        Args:
+            batches (iterator): The source of the raw batches.
+            num_batch (int): The number of batches to stage.
+            config (object): Configuration object (uses device).
+            depth (int): The number of batches staged ahead.
+
+        Examples:
+            >>> from pykg2vec.data.staging import BatchStager
+            >>> staged_batches = BatchStager(generator, num_batch, config, depth=2)
+            >>> try:
+            >>>     for h, r, t, hr_t, tr_h in staged_batches:
+            >>>         loss = trainer.train_step_projection(h, r, t, hr_t, tr_h)
+            >>> finally:
+            >>>     staged_batches.close()
+    """
+
+    def __init__(self, batches, num_batch, config, depth=2):
+        self.batches = batches
+        self.num_batch = num_batch
+        self.device = torch.device(config.device)
+        self.pin_memory = self.device.type == 'cuda'
+        self.depth = depth
+
+        # a slot is only reused once the trainer is done with it: depth queued,
+        # one being staged and one being trained on.
+        self.slots = [[] for _ in range(depth + 2)]
+        self.events = [None] * len(self.slots)
+        self.num_staged = 0
+        self.num_returned = 0
+        # the time spent converting and copying the batches (excluding the wait for the source).
+        self.stage_time = 0.0
+
+        self.queue = None
+        self.stop_event = threading.Event()
+        if depth > 0:
+            self.queue = queue.Queue(depth)
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.num_returned >= self.num_batch:
+            raise StopIteration
+        self.num_returned += 1
+
+        if self.queue is None:
+            return self.stage(next(self.batches))
+
+        staged = self.queue.get()
+        if isinstance(staged, Exception):
+            raise staged
+        return staged
+
+    def __len__(self):
+        return self.num_batch
+
+    def _run(self):
+        try:
+            for _ in range(self.num_batch):
+                if self.stop_event.is_set() or not self._put(self.stage(next(self.batches))):
+                    return
+        except Exception as e:  # forwarded to the trainer.
+            self._put(e)
+
+    def _put(self, item):
+        """Function to queue an item for the trainer, False if the stager was closed meanwhile."""
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def close(self):
+        """Function to stop the staging thread and to drop the batches staged ahead."""
+        if self.queue is None:
+            return
+        self.stop_event.set()
+        while self.thread.is_alive() or not self.queue.empty():
+            try:
+                self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        self.thread.join()
+
+    def stage(self, data):
+        """Function to convert a raw batch into tensors on the training device."""
+        start_time = time.perf_counter()
+        if not self.pin_memory:
+            staged = [self.to_tensor(field).to(self.device) for field in data]
+            self.stage_time += time.perf_counter() - start_time
+            return staged
+
+        slot_idx = self.num_staged % len(self.slots)
+        self.num_staged += 1
+
+        slot = self.slots[slot_idx]
+        if self.events[slot_idx] is not None:
+            # the previous copies out of this slot must be over before it is overwritten.
+            self.events[slot_idx].synchronize()
+
+        staged = []
+        for field_idx, field in enumerate(data):
+            host = self.to_tensor(field)
+
+            if field_idx >= len(slot):
+                slot.append(None)
+            buffer = slot[field_idx]
+            if buffer is None or buffer.shape != host.shape or buffer.dtype != host.dtype:
+                buffer = torch.empty(host.shape, dtype=host.dtype, pin_memory=self.pin_memory)
+                slot[field_idx] = buffer
+            buffer.copy_(host)
+
+            staged.append(buffer.to(self.device, non_blocking=True))
+
+        self.events[slot_idx] = torch.cuda.Event()
+        self.events[slot_idx].record()
+
+        self.stage_time += time.perf_counter() - start_time
+        return staged
+
+    @staticmethod
+    def to_tensor(field):
+        """Function to get a field of a raw batch as a host tensor, sharing the memory of int64 arrays."""
+        return field if isinstance(field, torch.Tensor) else torch.from_numpy(np.asarray(field, dtype=np.int64))
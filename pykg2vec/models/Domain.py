@@ -3,6 +3,7 @@
 """
 Domain module for building Knowledge Graphs
 """
+import torch
 from torch.nn import Embedding
 
 class NamedEmbedding(Embedding):
@@ -15,3 +16,39 @@ class NamedEmbedding(Embedding):
     @property
     def name(self):
         return self._name
+
+
+def group_by_relation(r, min_group_size=8):
+    """Function to group the samples of a batch by their relation.
+
+        Args:
+            r (Tensor): Relation ids of the batch.
+            min_group_size (int): The minimal average number of samples per relation
+                for the grouping to pay off against per-sample batched matmuls.
+
+        Returns:
+            tuple: (unique relations, inverse indices) or None if the batch touches too many relations.
+    """
+    relations, inverse = torch.unique(r, return_inverse=True)
+    if relations.shape[0] * min_group_size > r.shape[0]:
+        return None
+    return relations, inverse
+
+
+def grouped_matmul(x, inverse, weights):
+    """Function to multiply every sample by the matrix of its group with one matmul per group.
+
+        Args:
+            x (Tensor): Input vectors of shape [b, k].
+            inverse (Tensor): Group index of every sample, shape [b].
+            weights (Tensor): Matrices of the groups of shape [g, k, d].
+
+        Returns:
+            Tensor: The products of shape [b, d].
+    """
+    order = torch.argsort(inverse)
+    counts = torch.bincount(inverse, minlength=weights.shape[0]).tolist()
+    products = [torch.matmul(x_g, weights[g]) for g, x_g in enumerate(torch.split(x[order], counts))]
+    restore = torch.empty_like(order)
+    restore[order] = torch.arange(order.shape[0], device=order.device)
+    return torch.cat(products)[restore]
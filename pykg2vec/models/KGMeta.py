@@ -8,12 +8,18 @@ It provides Abstract class for the Knowledge graph models.
 
 from pykg2vec.common import TrainingStrategy
 from abc import ABCMeta
+import torch
 import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.checkpoint import checkpoint
 
 
 class Model:
     """ Meta Class for knowledge graph embedding models"""
 
+    # set by the Trainer from config.activation_checkpointing.
+    activation_checkpointing = False
+
     def __init__(self):
         self.database = None
 
@@ -25,6 +31,109 @@ class Model:
         """Function to get the embedding value"""
         raise NotImplementedError
 
+    def score_tails(self, h, r, candidates):
+        """Function to score chunks of (h, r) pairs against the candidate tails shared by each chunk.
+
+            The default implementation expands the candidates and calls forward,
+            models with a decomposable score override it with a dense kernel.
+
+            Args:
+                h (Tensor): Head entity ids of shape [c, m].
+                r (Tensor): Relation ids of shape [c, m].
+                candidates (Tensor): Candidate tail entity ids of shape [c, n].
+
+            Returns:
+                Tensor: The scores of shape [c, m, n], in the same convention as forward.
+        """
+        c, m = h.shape
+        n = candidates.shape[-1]
+        h = h.unsqueeze(-1).expand(c, m, n)
+        r = r.unsqueeze(-1).expand(c, m, n)
+        t = candidates.unsqueeze(1).expand(c, m, n)
+        return self.forward(h.reshape(-1), r.reshape(-1), t.reshape(-1)).view(c, m, n)
+
+    def score_heads(self, candidates, r, t):
+        """Function to score chunks of (r, t) pairs against the candidate heads shared by each chunk.
+
+            Args:
+                candidates (Tensor): Candidate head entity ids of shape [c, n].
+                r (Tensor): Relation ids of shape [c, m].
+                t (Tensor): Tail entity ids of shape [c, m].
+
+            Returns:
+                Tensor: The scores of shape [c, m, n], in the same convention as forward.
+        """
+        c, m = t.shape
+        n = candidates.shape[-1]
+        h = candidates.unsqueeze(1).expand(c, m, n)
+        r = r.unsqueeze(-1).expand(c, m, n)
+        t = t.unsqueeze(-1).expand(c, m, n)
+        return self.forward(h.reshape(-1), r.reshape(-1), t.reshape(-1)).view(c, m, n)
+
+    def get_embedding_tables(self):
+        """Function to get the embedding tables indexed by the entity ids and by the relation ids.
+
+            The sparse-gradient, Hogwild!, partitioned and online training modes update (or grow)
+            these tables row by row, every other weight (e.g. the projection matrices of NTN or SME)
+            is handled as a dense layer. The default covers the models with a single
+            ent_embeddings and rel_embeddings, the others override it.
+
+            Returns:
+                dict: the NamedEmbedding tables under 'entity' and 'relation'.
+        """
+        return {'entity': [self.ent_embeddings], 'relation': [self.rel_embeddings]}
+
+    def get_constrained_tables(self):
+        """Function to get the embedding tables whose looked-up rows are normalized by the model.
+
+            With config.constraint set, the trainer keeps these tables normalized by projecting the
+            rows touched by every optimizer step (see pykg2vec.utils.constraint) and
+            normalize_embedding reads the rows as they are.
+
+            Returns:
+                list: the NamedEmbedding tables, empty for the models without a norm constraint.
+        """
+        return []
+
+    def normalize_embedding(self, e):
+        """Function to normalize looked-up rows of a constrained table, a no-op when the table is kept normalized."""
+        if getattr(self, 'constraint', None) is not None:
+            return e
+        return F.normalize(e, p=2, dim=-1)
+
+    def checkpoint_block(self, function, *args):
+        """Function to run a memory-heavy block of the forward pass, with activation checkpointing if enabled.
+
+            With activation_checkpointing set, the activations of the block are not kept for the
+            backward pass but recomputed from its inputs (with the same dropout masks), trading
+            one more forward of the block for the memory of larger batches. The batch norm layers
+            do not update their running statistics a second time during the recomputation.
+
+            Args:
+                function (callable): The block, a method of the model.
+                *args (Tensor): The inputs of the block.
+        """
+        if not (self.activation_checkpointing and self.training and torch.is_grad_enabled()):
+            return function(*args)
+
+        recomputing = []
+
+        def run(*inputs):
+            if not recomputing:
+                recomputing.append(True)
+                return function(*inputs)
+            batch_norms = [m for m in self.modules() if isinstance(m, nn.modules.batchnorm._BatchNorm)]
+            momentums = [m.momentum for m in batch_norms]
+            for m in batch_norms:
+                m.momentum = 0.0
+            try:
+                return function(*inputs)
+            finally:
+                for m, momentum in zip(batch_norms, momentums):
+                    m.momentum = momentum
+
+        return checkpoint(run, *args, use_reentrant=False)
+
     def load_params(self, param_list, kwargs):
         for param_name in param_list:
             if param_name not in kwargs:
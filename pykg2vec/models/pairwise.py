@@ -5,7 +5,7 @@ import torch.nn as nn
 import torch.nn.functional as F
 import numpy as np
 from pykg2vec.models.KGMeta import PairwiseModel
-from pykg2vec.models.Domain import NamedEmbedding
+from pykg2vec.models.Domain import NamedEmbedding, group_by_relation, grouped_matmul
 
 
 class TransE(PairwiseModel):
@@ -71,9 +71,9 @@ class TransE(PairwiseModel):
         """
         h_e, r_e, t_e = self.embed(h, r, t)
 
-        norm_h_e = F.normalize(h_e, p=2, dim=-1)
-        norm_r_e = F.normalize(r_e, p=2, dim=-1)
-        norm_t_e = F.normalize(t_e, p=2, dim=-1)
+        norm_h_e = self.normalize_embedding(h_e)
+        norm_r_e = self.normalize_embedding(r_e)
+        norm_t_e = self.normalize_embedding(t_e)
 
         if self.l1_flag:
             return torch.norm(norm_h_e + norm_r_e - norm_t_e, p=1, dim=-1)
@@ -97,6 +97,21 @@ class TransE(PairwiseModel):
 
         return h_e, r_e, t_e
 
+    def score_tails(self, h, r, candidates):
+        h_e, r_e, t_e = self.embed(h, r, candidates)
+        # [c, m, k] against [c, n, k]
+        query = self.normalize_embedding(h_e) + self.normalize_embedding(r_e)
+        return torch.cdist(query, self.normalize_embedding(t_e), p=1 if self.l1_flag else 2)
+
+    def score_heads(self, candidates, r, t):
+        h_e, r_e, t_e = self.embed(candidates, r, t)
+        # ||h + r - t|| = ||h - (t - r)||
+        query = self.normalize_embedding(t_e) - self.normalize_embedding(r_e)
+        return torch.cdist(query, self.normalize_embedding(h_e), p=1 if self.l1_flag else 2)
+
+    def get_constrained_tables(self):
+        return [self.ent_embeddings, self.rel_embeddings]
+
 
 class TransH(PairwiseModel):
     """
@@ -155,7 +170,7 @@ class TransH(PairwiseModel):
         h_e, r_e, t_e = self.embed(h, r, t)
 
         norm_h_e = F.normalize(h_e, p=2, dim=-1)
-        norm_r_e = F.normalize(r_e, p=2, dim=-1)
+        norm_r_e = self.normalize_embedding(r_e)
         norm_t_e = F.normalize(t_e, p=2, dim=-1)
 
         if self.l1_flag:
@@ -192,6 +207,13 @@ class TransH(PairwiseModel):
         # [b, k], [b, k]
         return emb_e - torch.sum(emb_e * proj_vec, dim=-1, keepdims=True) * proj_vec
 
+    def get_constrained_tables(self):
+        # the projected entities are still normalized on every forward.
+        return [self.rel_embeddings]
+
+    def get_embedding_tables(self):
+        return {'entity': [self.ent_embeddings], 'relation': [self.rel_embeddings, self.w]}
+
 
 class TransD(PairwiseModel):
     r"""
@@ -281,7 +303,7 @@ class TransD(PairwiseModel):
         h_e, r_e, t_e = self.embed(h, r, t)
 
         norm_h_e = F.normalize(h_e, p=2, dim=-1)
-        norm_r_e = F.normalize(r_e, p=2, dim=-1)
+        norm_r_e = self.normalize_embedding(r_e)
         norm_t_e = F.normalize(t_e, p=2, dim=-1)
 
         if self.l1_flag:
@@ -294,6 +316,13 @@ class TransD(PairwiseModel):
         # [b, k] + sigma ([b, k] * [b, k]) * [b, k]
         return emb_e + torch.sum(emb_e * emb_m, axis=-1, keepdims=True) * proj_vec
 
+    def get_constrained_tables(self):
+        # the projected entities are still normalized on every forward.
+        return [self.rel_embeddings]
+
+    def get_embedding_tables(self):
+        return {'entity': [self.ent_embeddings, self.ent_mappings], 'relation': [self.rel_embeddings, self.rel_mappings]}
+
 
 class TransM(PairwiseModel):
     """
@@ -358,9 +387,9 @@ class TransM(PairwiseModel):
         """
         h_e, r_e, t_e = self.embed(h, r, t)
 
-        norm_h_e = F.normalize(h_e, p=2, dim=-1)
-        norm_r_e = F.normalize(r_e, p=2, dim=-1)
-        norm_t_e = F.normalize(t_e, p=2, dim=-1)
+        norm_h_e = self.normalize_embedding(h_e)
+        norm_r_e = self.normalize_embedding(r_e)
+        norm_t_e = self.normalize_embedding(t_e)
 
         r_theta = self.theta[r]
 
@@ -386,6 +415,9 @@ class TransM(PairwiseModel):
 
         return emb_h, emb_r, emb_t
 
+    def get_constrained_tables(self):
+        return [self.ent_embeddings, self.rel_embeddings]
+
 
 class TransR(PairwiseModel):
     """
@@ -456,9 +488,17 @@ class TransR(PairwiseModel):
         r_e = self.rel_embeddings(r)
         t_e = self.ent_embeddings(t)
 
-        h_e = F.normalize(h_e, p=2, dim=-1)
-        r_e = F.normalize(r_e, p=2, dim=-1)
-        t_e = F.normalize(t_e, p=2, dim=-1)
+        h_e = self.normalize_embedding(h_e)
+        r_e = self.normalize_embedding(r_e)
+        t_e = self.normalize_embedding(t_e)
+
+        groups = group_by_relation(r) if h_e.shape[0] == r.shape[0] == t_e.shape[0] else None
+        if groups is not None:
+            # batch bucketed by relation: one shared [k, d] matmul per relation.
+            relations, inverse = groups
+            matrix = self.rel_matrix(relations).view(-1, self.ent_hidden_size, self.rel_hidden_size)
+            # [g, k, d]
+            return grouped_matmul(h_e, inverse, matrix), r_e, grouped_matmul(t_e, inverse, matrix)
 
         h_e = torch.unsqueeze(h_e, 1)
         t_e = torch.unsqueeze(t_e, 1)
@@ -490,7 +530,7 @@ class TransR(PairwiseModel):
         h_e, r_e, t_e = self.embed(h, r, t)
 
         norm_h_e = F.normalize(h_e, p=2, dim=-1)
-        norm_r_e = F.normalize(r_e, p=2, dim=-1)
+        norm_r_e = self.normalize_embedding(r_e)
         norm_t_e = F.normalize(t_e, p=2, dim=-1)
 
         if self.l1_flag:
@@ -498,6 +538,12 @@ class TransR(PairwiseModel):
 
         return torch.norm(norm_h_e + norm_r_e - norm_t_e, p=2, dim=-1)
 
+    def get_constrained_tables(self):
+        return [self.ent_embeddings, self.rel_embeddings]
+
+    def get_embedding_tables(self):
+        return {'entity': [self.ent_embeddings], 'relation': [self.rel_embeddings, self.rel_matrix]}
+
 
 class SLM(PairwiseModel):
     """
@@ -849,6 +895,25 @@ class RotatE(PairwiseModel):
         score_i = h_e_r * r_e_i + h_e_i * r_e_r - t_e_i
         return -(self.margin - torch.sum(score_r**2 + score_i**2, axis=-1))
 
+    def score_tails(self, h, r, candidates):
+        h_e_r, h_e_i, r_e_r, r_e_i, t_e_r, t_e_i = self.embed(h, r, candidates)
+        query = torch.cat([h_e_r * r_e_r - h_e_i * r_e_i, h_e_r * r_e_i + h_e_i * r_e_r], -1)
+        return self._squared_distance(query, torch.cat([t_e_r, t_e_i], -1)) - self.margin
+
+    def score_heads(self, candidates, r, t):
+        h_e_r, h_e_i, r_e_r, r_e_i, t_e_r, t_e_i = self.embed(candidates, r, t)
+        # the rotation has unit modulus, so |h * r - t| = |h - t * conj(r)|
+        query = torch.cat([t_e_r * r_e_r + t_e_i * r_e_i, t_e_i * r_e_r - t_e_r * r_e_i], -1)
+        return self._squared_distance(query, torch.cat([h_e_r, h_e_i], -1)) - self.margin
+
+    @staticmethod
+    def _squared_distance(x, y):
+        # [c, m, k] and [c, n, k] -> [c, m, n]
+        return torch.sum(x**2, -1).unsqueeze(-1) + torch.sum(y**2, -1).unsqueeze(1) - 2 * torch.matmul(x, y.transpose(1, 2))
+
+    def get_embedding_tables(self):
+        return {'entity': [self.ent_embeddings, self.ent_embeddings_imag], 'relation': [self.rel_embeddings]}
+
 
 class Rescal(PairwiseModel):
     """
@@ -918,6 +983,18 @@ class Rescal(PairwiseModel):
         return emb_h, emb_r, emb_t
 
     def forward(self, h, r, t):
+        groups = group_by_relation(r) if h.shape[0] == r.shape[0] == t.shape[0] else None
+        if groups is not None:
+            # batch bucketed by relation: one shared [k, k] matmul per relation.
+            relations, inverse = groups
+            h_e, r_e, t_e = self.embed(h, relations, t)
+            # dim of h: [m, k, 1]
+            #        r: [g, k, k]
+            #        t: [m, k, 1]
+            # M_r * t is computed as t^T * M_r^T.
+            r_t = grouped_matmul(t_e.view(-1, self.hidden_size), inverse, r_e.transpose(1, 2))
+            return -torch.sum(h_e.view(-1, self.hidden_size) * r_t, -1)
+
         h_e, r_e, t_e = self.embed(h, r, t)
         # dim of h: [m, k, 1]
         #        r: [m, k, k]
@@ -929,6 +1006,9 @@ class Rescal(PairwiseModel):
         norms = torch.norm(embedding.weight, p, dim).data
         return embedding.weight.data.div(norms.view(num_embeddings, 1).expand_as(embedding.weight))
 
+    def get_embedding_tables(self):
+        return {'entity': [self.ent_embeddings], 'relation': [self.rel_matrices]}
+
 
 class NTN(PairwiseModel):
     """
@@ -1028,7 +1108,7 @@ class NTN(PairwiseModel):
         norm_h = F.normalize(h_e, p=2, dim=-1)
         norm_r = F.normalize(r_e, p=2, dim=-1)
         norm_t = F.normalize(t_e, p=2, dim=-1)
-        return -torch.sum(norm_r*self.train_layer(norm_h, norm_t), -1)
+        return -torch.sum(norm_r*self.checkpoint_block(self.train_layer, norm_h, norm_t), -1)
 
     def get_reg(self):
         return self.lmbda*torch.sqrt(sum([torch.sum(torch.pow(var.weight, 2)) for var in self.parameter_list]))
@@ -1160,6 +1240,9 @@ class KG2E(PairwiseModel):
         det_fac = (torch.log(t_sigma) - torch.log(comp_sigma)).sum(-1)
         return trace_fac + mul_fac + det_fac - self.hidden_size
 
+    def get_embedding_tables(self):
+        return {'entity': [self.ent_embeddings_mu, self.ent_embeddings_sigma], 'relation': [self.rel_embeddings_mu, self.rel_embeddings_sigma]}
+
 
 class HoLE(PairwiseModel):
     """
@@ -1202,9 +1285,9 @@ class HoLE(PairwiseModel):
     def forward(self, h, r, t):
         h_e, r_e, t_e = self.embed(h, r, t)
         r_e = F.normalize(r_e, p=2, dim=-1)
-        h_e = torch.stack((h_e, torch.zeros_like(h_e)), -1)
-        t_e = torch.stack((t_e, torch.zeros_like(t_e)), -1)
-        e, _ = torch.unbind(torch.ifft(torch.conj(torch.fft(h_e, 1)) * torch.fft(t_e, 1), 1), -1)
+        # circular correlation of h and t.
+        e = torch.fft.irfft(torch.conj(torch.fft.rfft(h_e.float(), dim=-1)) * torch.fft.rfft(t_e.float(), dim=-1),
+                            n=h_e.shape[-1], dim=-1).to(h_e.dtype)
         return -F.sigmoid(torch.sum(r_e * e, 1))
 
     def embed(self, h, r, t):
@@ -106,6 +106,18 @@ class ANALOGY(PointwiseModel):
 
         return complex_loss + distmult_loss
 
+    def score_tails(self, h, r, candidates):
+        h_e, r_e, t_e = self.embed(h, r, candidates)
+        h_e_real, h_e_img, r_e_real, r_e_img, t_e_real, t_e_img = self.embed_complex(h, r, candidates)
+        query = torch.cat([h_e_real * r_e_real - h_e_img * r_e_img, h_e_img * r_e_real + h_e_real * r_e_img, h_e * r_e], -1)
+        return -torch.matmul(query, torch.cat([t_e_real, t_e_img, t_e], -1).transpose(1, 2))
+
+    def score_heads(self, candidates, r, t):
+        h_e, r_e, t_e = self.embed(candidates, r, t)
+        h_e_real, h_e_img, r_e_real, r_e_img, t_e_real, t_e_img = self.embed_complex(candidates, r, t)
+        query = torch.cat([t_e_real * r_e_real + t_e_img * r_e_img, t_e_img * r_e_real - t_e_real * r_e_img, t_e * r_e], -1)
+        return -torch.matmul(query, torch.cat([h_e_real, h_e_img, h_e], -1).transpose(1, 2))
+
     def get_reg(self, h, r, t):
         h_e, r_e, t_e = self.embed(h, r, t)
         h_e_real, h_e_img, r_e_real, r_e_img, t_e_real, t_e_img = self.embed_complex(h, r, t)
@@ -114,6 +126,9 @@ class ANALOGY(PointwiseModel):
         regul_term += (h_e**2+r_e**2+t_e**2).sum(axis=-1).mean()
         return self.lmbda*regul_term
 
+    def get_embedding_tables(self):
+        return {'entity': [self.ent_embeddings, self.ent_embeddings_real, self.ent_embeddings_img], 'relation': [self.rel_embeddings, self.rel_embeddings_real, self.rel_embeddings_img]}
+
 
 class Complex(PointwiseModel):
     """
@@ -188,12 +203,25 @@ class Complex(PointwiseModel):
         return -torch.sum(h_e_real * t_e_real * r_e_real + h_e_img * t_e_img * r_e_real +
                           h_e_real * t_e_img * r_e_img - h_e_img * t_e_real * r_e_img, -1)
 
+    def score_tails(self, h, r, candidates):
+        h_e_real, h_e_img, r_e_real, r_e_img, t_e_real, t_e_img = self.embed(h, r, candidates)
+        query = torch.cat([h_e_real * r_e_real - h_e_img * r_e_img, h_e_img * r_e_real + h_e_real * r_e_img], -1)
+        return -torch.matmul(query, torch.cat([t_e_real, t_e_img], -1).transpose(1, 2))
+
+    def score_heads(self, candidates, r, t):
+        h_e_real, h_e_img, r_e_real, r_e_img, t_e_real, t_e_img = self.embed(candidates, r, t)
+        query = torch.cat([t_e_real * r_e_real + t_e_img * r_e_img, t_e_img * r_e_real - t_e_real * r_e_img], -1)
+        return -torch.matmul(query, torch.cat([h_e_real, h_e_img], -1).transpose(1, 2))
+
     def get_reg(self, h, r, t):
         h_e_real, h_e_img, r_e_real, r_e_img, t_e_real, t_e_img = self.embed(h, r, t)
         regul_term = torch.mean(torch.sum(h_e_real**2, -1) + torch.sum(h_e_img**2, -1) + torch.sum(r_e_real**2, -1) +
                                 torch.sum(r_e_img**2, -1) + torch.sum(t_e_real**2, -1) + torch.sum(t_e_img**2, -1))
         return self.lmbda*regul_term
 
+    def get_embedding_tables(self):
+        return {'entity': [self.ent_embeddings_real, self.ent_embeddings_img], 'relation': [self.rel_embeddings_real, self.rel_embeddings_img]}
+
 
 class ComplexN3(Complex):
     """
@@ -307,6 +335,10 @@ class ConvKB(PointwiseModel):
         stacked_hrt = torch.cat([stacked_h, stacked_r, stacked_t], dim=1)
         stacked_hrt = torch.unsqueeze(stacked_hrt, dim=1)  # [b, 1, 3, k]
 
+        return self.checkpoint_block(self.inner_forward, stacked_hrt, first_dimen)
+
+    def inner_forward(self, stacked_hrt, first_dimen):
+        """Implements the convolution and the dense layers of the algorithm."""
         stacked_hrt = [conv_layer(stacked_hrt) for conv_layer in self.conv_list]
         stacked_hrt = torch.cat(stacked_hrt, dim=3)
         stacked_hrt = stacked_hrt.view(first_dimen, -1)
@@ -378,6 +410,14 @@ class CP(PointwiseModel):
         h_e, r_e, t_e = self.embed(h, r, t)
         return -torch.sum(h_e * r_e * t_e, -1)
 
+    def score_tails(self, h, r, candidates):
+        h_e, r_e, t_e = self.embed(h, r, candidates)
+        return -torch.matmul(h_e * r_e, t_e.transpose(1, 2))
+
+    def score_heads(self, candidates, r, t):
+        h_e, r_e, t_e = self.embed(candidates, r, t)
+        return -torch.matmul(t_e * r_e, h_e.transpose(1, 2))
+
     def get_reg(self, h, r, t, reg_type='N3'):
         h_e, r_e, t_e = self.embed(h, r, t)
         if reg_type.lower() == 'f2':
@@ -389,6 +429,9 @@ class CP(PointwiseModel):
 
         return self.lmbda * regul_term
 
+    def get_embedding_tables(self):
+        return {'entity': [self.sub_embeddings, self.obj_embeddings], 'relation': [self.rel_embeddings]}
+
 
 class DistMult(PointwiseModel):
     """
@@ -453,6 +496,14 @@ class DistMult(PointwiseModel):
         h_e, r_e, t_e = self.embed(h, r, t)
         return -torch.sum(h_e*r_e*t_e, -1)
 
+    def score_tails(self, h, r, candidates):
+        h_e, r_e, t_e = self.embed(h, r, candidates)
+        return -torch.matmul(h_e*r_e, t_e.transpose(1, 2))
+
+    def score_heads(self, candidates, r, t):
+        h_e, r_e, t_e = self.embed(candidates, r, t)
+        return -torch.matmul(t_e*r_e, h_e.transpose(1, 2))
+
     def get_reg(self, h, r, t):
         h_e, r_e, t_e = self.embed(h, r, t)
         regul_term = torch.mean(torch.sum(h_e**2, -1) + torch.sum(r_e**2, -1) + torch.sum(t_e**2, -1))
@@ -478,6 +529,9 @@ class SimplE(PointwiseModel):
                https://papers.nips.cc/paper/7682-simple-embedding-for-link-prediction-in-knowledge-graphs.pdf
 
     """
+    # the weight of the inverse relation term of the score.
+    inverse_weight = 0.5
+
     def __init__(self, **kwargs):
         super(SimplE, self).__init__(self.__class__.__name__.lower())
         param_list = ["tot_entity", "tot_relation", "hidden_size", "lmbda"]
@@ -533,10 +587,24 @@ class SimplE(PointwiseModel):
         init = torch.sum(h1_e*r1_e*t1_e, 1) + torch.sum(h2_e*r2_e*t2_e, 1) / 2.0
         return -torch.clamp(init, -20, 20)
 
+    def score_tails(self, h, r, candidates):
+        # [c, m, k] against [c, n, k]: the head and tail roles of the candidates.
+        init = torch.matmul(self.ent_head_embeddings(h) * self.rel_embeddings(r), self.ent_tail_embeddings(candidates).transpose(1, 2))
+        init = init + torch.matmul(self.ent_tail_embeddings(h) * self.rel_inv_embeddings(r), self.ent_head_embeddings(candidates).transpose(1, 2)) * self.inverse_weight
+        return -torch.clamp(init, -20, 20)
+
+    def score_heads(self, candidates, r, t):
+        init = torch.matmul(self.ent_tail_embeddings(t) * self.rel_embeddings(r), self.ent_head_embeddings(candidates).transpose(1, 2))
+        init = init + torch.matmul(self.ent_head_embeddings(t) * self.rel_inv_embeddings(r), self.ent_tail_embeddings(candidates).transpose(1, 2)) * self.inverse_weight
+        return -torch.clamp(init, -20, 20)
+
     def get_reg(self, h, r, t):
         regul_term = torch.mean(torch.sum(h.type(torch.FloatTensor) ** 2, -1) + torch.sum(r.type(torch.FloatTensor) ** 2, -1) + torch.sum(t.type(torch.FloatTensor) ** 2, -1))
         return self.lmbda * regul_term
 
+    def get_embedding_tables(self):
+        return {'entity': [self.ent_head_embeddings, self.ent_tail_embeddings], 'relation': [self.rel_embeddings, self.rel_inv_embeddings]}
+
 
 class SimplE_ignr(SimplE):
     """
@@ -558,6 +626,8 @@ class SimplE_ignr(SimplE):
 
     """
 
+    inverse_weight = 1.0
+
     def __init__(self, **kwargs):
         super(SimplE_ignr, self).__init__(**kwargs)
         self.model_name = 'simple_ignr'
@@ -100,12 +100,10 @@ class ConvE(ProjectionModel):
         x = self.hidden_drop(x)
         if self.training:
             x = self.bn2(x) # batch normalization across the last axis
-        x = torch.relu(x)
-        x = torch.matmul(x, self.transpose(self.ent_embeddings.weight)) # [b, k] * [k, tot_ent] => [b, tot_ent]
-        x = torch.add(x, self.b.weight) # add a bias value
-        return torch.sigmoid(x) # sigmoid activation
+        return torch.relu(x)
 
-    def forward(self, e, r, direction="tail"):
+    def project(self, e, r, direction="tail"):
+        """Function to get the [b, k] projections of (e, r), scored against every entity by the output layer."""
         assert direction in ("head", "tail"), "Unknown forward direction"
         if direction == "head":
             e_emb, r_emb = self.embed2(e, r + self.tot_relation)
@@ -116,9 +114,18 @@ class ConvE(ProjectionModel):
         stacked_r = r_emb.view(-1, 1, self.hidden_size_2, self.hidden_size_1)
         stacked_er = torch.cat([stacked_e, stacked_r], 2)
 
-        preds = self.inner_forward(stacked_er, list(e.shape)[0])
+        return self.checkpoint_block(self.inner_forward, stacked_er, list(e.shape)[0])
 
-        return preds
+    def output_layer(self):
+        """Function to get the [tot_ent, k] weight and the [tot_ent] bias of the logits of the entities."""
+        return self.ent_embeddings.weight, self.b.weight[0]
+
+    def forward(self, e, r, direction="tail"):
+        x = self.project(e, r, direction=direction)
+        weight, bias = self.output_layer()
+        x = torch.matmul(x, self.transpose(weight)) # [b, k] * [k, tot_ent] => [b, tot_ent]
+        x = torch.add(x, bias) # add a bias value
+        return torch.sigmoid(x) # sigmoid activation
 
     def predict_tail_rank(self, e, r, topk=-1):
         _, rank = torch.topk(-self.forward(e, r, direction="tail"), k=topk)
@@ -217,6 +224,7 @@ class ProjE_pointwise(ProjectionModel):
         else:
             ere2_sigmoid = self.g(torch.dropout(self.f2(emb_hr_e, emb_hr_r), p=self.hidden_dropout, train=True), self.ent_embeddings.weight)
 
+        ere2_sigmoid = ere2_sigmoid.float() # the loss stays in fp32 under bf16 autocast.
         ere2_loss_left = -torch.sum((torch.log(torch.clamp(ere2_sigmoid, 1e-10, 1.0)) * torch.max(torch.FloatTensor([0]).to(self.device), er_e2)))
         ere2_loss_right = -torch.sum((torch.log(torch.clamp(1 - ere2_sigmoid, 1e-10, 1.0)) * torch.max(torch.FloatTensor([0]).to(self.device), torch.neg(er_e2))))
 
@@ -343,6 +351,13 @@ class TuckER(ProjectionModel):
             Returns:
                 Tensors: Returns the activation values.
         """
+        x = self.project(e1, r, direction=direction)
+        weight, _ = self.output_layer()
+        x = torch.matmul(x, self.transpose(weight))
+        return F.sigmoid(x)
+
+    def project(self, e1, r, direction="head"):
+        """Function to get the [b, d1] projections of (e1, r), scored against every entity by the output layer."""
         assert direction in ("head", "tail"), "Unknown forward direction"
         e1 = self.ent_embeddings(e1)
         e1 = F.normalize(e1, p=2, dim=1)
@@ -356,10 +371,12 @@ class TuckER(ProjectionModel):
 
         x = torch.matmul(e1, W_mat)
         x = x.view(-1, self.d1)
-        x = F.normalize(x, p=2, dim=1)
-        x = self.hidden_dropout2(x)
-        x = torch.matmul(x, self.transpose(self.ent_embeddings.weight))
-        return F.sigmoid(x)
+        x = F.normalize(x.float(), p=2, dim=1) # normalized in fp32 under bf16 autocast.
+        return self.hidden_dropout2(x)
+
+    def output_layer(self):
+        """Function to get the [tot_ent, d1] weight of the logits of the entities (no bias)."""
+        return self.ent_embeddings.weight, None
 
     def predict_tail_rank(self, e, r, topk=-1):
         _, rank = torch.topk(-self.forward(e, r, direction="tail"), k=topk)
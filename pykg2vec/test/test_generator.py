@@ -3,8 +3,12 @@
 """
 This module is for testing unit functions of generator
 """
+import pytest
 import torch
-from pykg2vec.data.generator import Generator
+import numpy as np
+from pykg2vec.data.generator import Generator, AliasTable, NegativeSampler, read_train_triples, read_train_labels
+from pykg2vec.data.loader import build_data_loader, TripletDataset
+from pykg2vec.data.staging import BatchStager
 from pykg2vec.common import Importer, KGEArgParser
 from pykg2vec.data.kgcontroller import KnowledgeGraph
 
@@ -82,3 +86,251 @@ def test_generator_pairwise():
         assert len(ph) == len(nt)
 
     generator.stop()
+
+@pytest.mark.parametrize("model_name, num_items, data_loader", [
+    ("proje_pointwise", 5, "map"),
+    ("complex", 4, "map"),
+    ("transe", 6, "map"),
+    ("transe", 6, "iterable"),
+])
+def test_data_loader(model_name, num_items, data_loader):
+    """Function to test the torch DataLoader replacement of the generator."""
+    knowledge_graph = KnowledgeGraph(dataset="freebase15k")
+    knowledge_graph.prepare_data()
+
+    config_def, model_def = Importer().import_model_config(model_name)
+    config = config_def(KGEArgParser().get_args(['-dl', data_loader, '-npg', '1']))
+    loader = build_data_loader(model_def(**config.__dict__), config, iterable=data_loader == 'iterable')
+    batches = iter(loader)
+    for _ in range(3):
+        data = list(next(batches))
+        assert len(data) == num_items
+        assert all(isinstance(x, torch.Tensor) for x in data)
+        assert len(data[0]) == len(data[1])
+        assert len(data[0]) == len(data[2])
+
+
+@pytest.mark.parametrize("data_loader", [None, "map", "iterable"])
+def test_relation_bucketed_batches(data_loader):
+    """Function to test that the relation bucketed batches only span a few relations."""
+    knowledge_graph = KnowledgeGraph(dataset="freebase15k")
+    knowledge_graph.prepare_data()
+
+    args = ['-rb', 'true', '-npg', '1', '-b', '64']
+    if data_loader is not None:
+        args += ['-dl', data_loader]
+    config_def, model_def = Importer().import_model_config("transr")
+    config = config_def(KGEArgParser().get_args(args))
+    model = model_def(**config.__dict__)
+
+    num_batch = config.tot_train_triples // config.batch_size
+    if data_loader is None:
+        gen = Generator(model, config)
+        gen.start_one_epoch(num_batch)
+    else:
+        gen = iter(build_data_loader(model, config, iterable=data_loader == 'iterable'))
+
+    # every relation boundary falls into at most one batch.
+    boundaries = 0
+    for _ in range(num_batch):
+        data = list(next(gen))
+        boundaries += len(np.unique(np.asarray(data[1]))) - 1
+    assert boundaries < config.tot_relation
+
+    if data_loader is None:
+        gen.stop()
+
+
+@pytest.mark.parametrize("model_name", ["transe", "complex"])
+def test_shared_negatives(model_name):
+    """Function to test the shape of the batches with shared negatives."""
+    knowledge_graph = KnowledgeGraph(dataset="freebase15k")
+    knowledge_graph.prepare_data()
+
+    config_def, model_def = Importer().import_model_config(model_name)
+    config = config_def(KGEArgParser().get_args(['-nps', '16', '-ncs', '50', '-npg', '1']))
+
+    gen = Generator(model_def(**config.__dict__), config)
+    gen.start_one_epoch(3)
+    for _ in range(3):
+        h, r, t, neg = list(next(gen))
+        assert len(h) == config.batch_size
+        assert len(r) == len(h) and len(t) == len(h)
+        assert np.asarray(neg).shape == ((config.batch_size + 49) // 50, 16)
+    gen.stop()
+
+
+def test_alias_table():
+    """Function to test that the alias tables draw from their distributions."""
+    np.random.seed(0)
+    table = AliasTable([([10, 11, 12, 13], [1, 2, 3, 4]), ([7, 8], [0, 1])])
+
+    samples = table.sample(100000)
+    freq = np.bincount(samples - 10, minlength=4) / len(samples)
+    assert np.allclose(freq, [0.1, 0.2, 0.3, 0.4], atol=0.01)
+    assert all(table.draw(1) == 8 for _ in range(100))
+
+
+@pytest.mark.parametrize("distribution", ["degree", "domain"])
+def test_negative_sampler(distribution):
+    """Function to test the weighted negative samplers."""
+    knowledge_graph = KnowledgeGraph(dataset="freebase15k")
+    knowledge_graph.prepare_data()
+
+    config_def, _ = Importer().import_model_config("transe")
+    config = config_def(KGEArgParser().get_args(['-nd', distribution]))
+    sampler = NegativeSampler(config)
+
+    data = knowledge_graph.read_cache_data('triplets_train')
+    positive_triplets = {(t.h, t.r, t.t): 1 for t in data}
+    hr_t_train = knowledge_graph.read_cache_data('hr_t_train')
+    tails = {}
+    for (_, r), entities in hr_t_train.items():
+        tails.setdefault(r, set()).update(entities)
+
+    in_range = 0
+    for t in data[:200]:
+        tail = sampler.corrupt_tail(t.h, t.r, t.t, positive_triplets)
+        head = sampler.corrupt_head(t.h, t.r, t.t, positive_triplets)
+        assert (t.h, t.r, tail) not in positive_triplets
+        assert (head, t.r, t.t) not in positive_triplets
+        in_range += tail in tails[t.r]
+
+    if distribution == "domain":
+        # only the relations with an exhausted range fall back to uniform corruptions.
+        assert in_range >= 180
+
+    assert sampler.sample((4, 5)).shape == (4, 5)
+
+
+@pytest.mark.parametrize("args", [['-npg', '3'], ['-gat', 'true', '-npg', '1', '-cb', '4']])
+def test_generator_workers(args):
+    """Function to test that the generator (autotuned or not) stops all its processes."""
+    knowledge_graph = KnowledgeGraph(dataset="freebase15k")
+    knowledge_graph.prepare_data()
+
+    config_def, model_def = Importer().import_model_config("transe")
+    config = config_def(KGEArgParser().get_args(args + ['-b', '32']))
+
+    gen = Generator(model_def(**config.__dict__), config, autotune_interval=5)
+    for _ in range(2):
+        gen.start_one_epoch(20)
+        for _ in range(20):
+            data = list(next(gen))
+            assert len(data[0]) == config.batch_size
+
+    if config.generator_autotune:
+        assert 1 <= gen.steady_state['workers'] <= gen.max_workers
+        assert 1 <= gen.steady_state['prefetch_depth'] <= gen.max_depth
+
+    gen.stop()
+    assert not any(process.is_alive() for process in gen.process_list)
+
+
+def test_generator_tune():
+    """Function to test that the autotuning adds samplers to a starved trainer and removes them from a saturated queue."""
+    knowledge_graph = KnowledgeGraph(dataset="freebase15k")
+    knowledge_graph.prepare_data()
+
+    config_def, model_def = Importer().import_model_config("transe")
+    config = config_def(KGEArgParser().get_args(['-gat', 'true', '-npg', '1', '-b', '32']))
+
+    gen = Generator(model_def(**config.__dict__), config, autotune_interval=5)
+    # a budget of two sampler processes.
+    gen.max_workers = 2
+    depth = gen.prefetch_depth
+
+    def measure(wait, occupancy):
+        gen.stats.update({'busy': 1.0 - wait, 'wait': wait, 'batches': 5, 'occupancy': occupancy * 5 * gen.prefetch_depth})
+        gen.tune()
+
+    # the trainer waits for the batches: one more sampler and a deeper prefetch.
+    measure(0.5, 0.0)
+    assert (gen.num_workers, gen.prefetch_depth) == (2, depth + 1)
+    # still starved, but the budget is spent: only the prefetch gets deeper.
+    measure(0.5, 0.0)
+    assert (gen.num_workers, gen.prefetch_depth) == (2, depth + 2)
+    assert gen.steady_state['wait_fraction'] == 0.5
+
+    # the samplers are ahead on a full queue: one sampler less, then a shallower prefetch.
+    measure(0.0, 1.0)
+    assert (gen.num_workers, gen.prefetch_depth) == (1, depth + 2)
+    measure(0.0, 1.0)
+    assert (gen.num_workers, gen.prefetch_depth) == (1, depth + 1)
+
+    gen.stop()
+    assert not any(process.is_alive() for process in gen.process_list)
+
+
+@pytest.mark.parametrize("depth", [0, 2])
+def test_batch_stager(depth):
+    """Function to test that the staged batches match the raw ones and share the memory of the int64 arrays on cpu."""
+    raw_batches = [[np.arange(i, i + 8), list(range(8)), torch.ones(8, 4) * i] for i in range(10)]
+    config = type("Config", (), {"device": "cpu"})()
+
+    stager = BatchStager(iter(raw_batches), len(raw_batches), config, depth=depth)
+    for i, staged in enumerate(stager):
+        assert staged[0].dtype == torch.int64
+        assert torch.equal(staged[0], torch.arange(i, i + 8))
+        assert torch.equal(staged[1], torch.arange(8))
+        assert torch.equal(staged[2], torch.ones(8, 4) * i)
+        assert staged[0].data_ptr() == raw_batches[i][0].ctypes.data
+        assert staged[2] is raw_batches[i][2]
+
+    assert i == len(raw_batches) - 1
+
+
+def test_batch_stager_close():
+    """Function to test that closing an epoch left early stops the staging thread."""
+    raw_batches = ([np.arange(8)] for _ in range(100))
+    config = type("Config", (), {"device": "cpu"})()
+
+    stager = BatchStager(raw_batches, 100, config, depth=2)
+    next(stager)
+    stager.close()
+
+    assert not stager.thread.is_alive()
+    assert stager.queue.empty()
+
+
+def test_triplet_dataset_shards():
+    """Function to test that the shards of the training triples are disjoint and complete."""
+    knowledge_graph = KnowledgeGraph(dataset="freebase15k")
+    knowledge_graph.prepare_data()
+
+    config_def, _ = Importer().import_model_config("transe")
+    config = config_def(KGEArgParser().get_args([]))
+    triples = TripletDataset(config).triples
+
+    config.num_shards = 3
+    shards = []
+    for shard_id in range(3):
+        config.shard_id = shard_id
+        shards.append(TripletDataset(config).triples)
+
+    assert sum(len(shard) for shard in shards) == len(triples)
+    assert sorted(map(tuple, np.concatenate(shards))) == sorted(map(tuple, triples))
+
+
+def test_reciprocal_triples():
+    """Function to test the inverse triples and labels of the reciprocal relations."""
+    knowledge_graph = KnowledgeGraph(dataset="freebase15k")
+    knowledge_graph.prepare_data()
+
+    config_def, _ = Importer().import_model_config("transe")
+    config = config_def(KGEArgParser().get_args(['-rcp', 'True']))
+    num_relation = knowledge_graph.kg_meta.tot_relation
+    assert config.tot_relation == 2 * num_relation
+
+    data = knowledge_graph.read_cache_data('triplets_train')
+    triples = read_train_triples(config)
+    assert len(triples) == 2 * len(data)
+    assert all((i.h, i.r, i.t) == (t.t, t.r + num_relation, t.h) for t, i in zip(data[:100], triples[len(data):]))
+
+    hr_t_train, tr_h_train = read_train_labels(config)
+    for t in data[:100]:
+        assert t.h in hr_t_train[(t.t, t.r + num_relation)]
+        assert t.t in tr_h_train[(t.h, t.r + num_relation)]
+
+    dataset = TripletDataset(config)
+    assert dataset.triples[:, 1].max() >= num_relation
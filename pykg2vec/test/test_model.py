@@ -4,6 +4,7 @@
 This module is for testing unit functions of model
 """
 import pytest
+import torch
 
 from pykg2vec.common import KGEArgParser, Importer
 from pykg2vec.utils.trainer import Trainer
@@ -39,6 +40,78 @@ def test_kge_methods(model_name):
     """Function to test a set of KGE algorithsm."""
     testing_function(model_name)
 
+@pytest.mark.parametrize("model_name", ['transr', 'rescal'])
+def test_relation_grouped_forward(model_name):
+    """Function to test that the relation grouped matmul matches the per-sample one."""
+    args = KGEArgParser().get_args([])
+    knowledge_graph = KnowledgeGraph(dataset=args.dataset_name)
+    knowledge_graph.prepare_data()
+
+    config_def, model_def = Importer().import_model_config(model_name)
+    config = config_def(args)
+    model = model_def(**config.__dict__)
+
+    h = torch.randint(config.tot_entity, (64,))
+    t = torch.randint(config.tot_entity, (64,))
+    r = torch.randint(2, (64,))
+    # one relation per sample falls back to the per-sample matmul.
+    r_ungrouped = torch.arange(64) % config.tot_relation
+
+    with torch.no_grad():
+        grouped = model(h, r, t)
+        for i in range(64):
+            expected = model(h[i:i+1], r[i:i+1], t[i:i+1])
+            assert torch.allclose(grouped[i], expected[0], atol=1e-5)
+        assert model(h, r_ungrouped, t).shape == (64,)
+
+
+@pytest.mark.parametrize("model_name", ['transe', 'rotate', 'distmult', 'complex', 'complexn3', 'cp', 'simple', 'simple_ignr', 'analogy'])
+def test_score_candidates(model_name):
+    """Function to test the dense candidate scoring kernels against the forward of the expanded triples."""
+    args = KGEArgParser().get_args([])
+    knowledge_graph = KnowledgeGraph(dataset=args.dataset_name)
+    knowledge_graph.prepare_data()
+
+    config_def, model_def = Importer().import_model_config(model_name)
+    config = config_def(args)
+    model = model_def(**config.__dict__)
+
+    h = torch.randint(config.tot_entity, (3, 7))
+    r = torch.randint(config.tot_relation, (3, 7))
+    t = torch.randint(config.tot_entity, (3, 7))
+    candidates = torch.randint(config.tot_entity, (3, 11))
+
+    with torch.no_grad():
+        tails = model.score_tails(h, r, candidates)
+        heads = model.score_heads(candidates, r, t)
+        assert tails.shape == (3, 7, 11)
+        assert heads.shape == (3, 7, 11)
+        for c in range(3):
+            for n in range(11):
+                assert torch.allclose(tails[c, :, n], model(h[c], r[c], candidates[c, n].repeat(7)), atol=1e-4)
+                assert torch.allclose(heads[c, :, n], model(candidates[c, n].repeat(7), r[c], t[c]), atol=1e-4)
+
+
+@pytest.mark.parametrize("model_name", ['analogy', 'complex', 'conve', 'cp', 'kg2e', 'ntn', 'proje_pointwise', 'rescal',
+                                        'rotate', 'simple', 'sme', 'transd', 'transh', 'transr', 'tucker'])
+def test_embedding_tables(model_name):
+    """Function to test that the models declare the tables indexed by the entities and by the relations."""
+    args = KGEArgParser().get_args([])
+    knowledge_graph = KnowledgeGraph(dataset=args.dataset_name)
+    knowledge_graph.prepare_data()
+
+    config_def, model_def = Importer().import_model_config(model_name)
+    config = config_def(args)
+    model = model_def(**config.__dict__)
+
+    tables = model.get_embedding_tables()
+    assert tables['entity'] and tables['relation']
+    for table in tables['entity']:
+        assert table.num_embeddings == config.tot_entity
+    for table in tables['relation']:
+        assert table.num_embeddings in (config.tot_relation, 2 * config.tot_relation)
+
+
 def test_error_on_importing_model():
     with pytest.raises(ValueError) as e:
         Importer().import_model_config("unknown")
@@ -3,15 +3,29 @@
 """
 This module is for testing unit functions of training
 """
+import json
+from collections import Counter
 import pytest
+import torch
+import numpy as np
+import torch.distributed as dist
+import torch.nn.functional as F
+from pathlib import Path
 
-from pykg2vec.common import KGEArgParser, Importer, Monitor
+from pykg2vec.common import KGEArgParser, Importer, Monitor, TrainingStrategy
 from pykg2vec.utils.trainer import Trainer
+from pykg2vec.utils.distributed import launch_local, all_reduce_gradients
+from pykg2vec.utils.precision import measure_precision_drift
+from pykg2vec.utils.compiler import CompiledStep
+from pykg2vec.utils.hogwild import HogwildTrainer
+from pykg2vec.utils.partition import partition_capacity
+from pykg2vec.utils.resources import plan_resources, available_cores, pin
+from pykg2vec.utils.chunked_loss import chunked_one_to_n_loss
 from pykg2vec.data.kgcontroller import KnowledgeGraph
 
 @pytest.mark.skip(reason="This is a functional method.")
-def get_model(result_path_dir, configured_epochs, patience, config_key):
-    args = KGEArgParser().get_args([])
+def get_model(result_path_dir, configured_epochs, patience, config_key, cli_args=None):
+    args = KGEArgParser().get_args(cli_args or [])
 
     knowledge_graph = KnowledgeGraph(dataset="Freebase15k")
     knowledge_graph.prepare_data()
@@ -28,7 +42,7 @@ def get_model(result_path_dir, configured_epochs, patience, config_key):
     config.debug = True
     config.patience = patience
 
-    return model_def(**config.__dict__), config
+    return model_def(**config.get_model_params()), config
 
 @pytest.mark.parametrize("config_key", list(Importer().modelMap.keys()))
 def test_full_epochs(tmpdir, config_key):
@@ -58,3 +72,840 @@ def test_early_stopping_on_ranks(tmpdir, monitor):
     actual_epochs = trainer.train_model()
 
     assert actual_epochs < configured_epochs - 1
+
+@pytest.mark.parametrize("data_loader", ["map", "iterable"])
+def test_epoch_with_data_loader(tmpdir, data_loader):
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, "transe", ["-dl", data_loader, "-npg", "0"])
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    trainer.generator = trainer.create_generator()
+    train_triples = Counter((t.h, t.r, t.t) for t in config.knowledge_graph.read_cache_data('triplets_train'))
+
+    # the batches of one epoch for a fixed seed, as drawn by the DataLoader itself.
+    torch.manual_seed(0)
+    np.random.seed(0)
+    expected, _ = trainer.stage_epoch(0)
+    expected = [[x.clone() for x in data] for data in expected]
+
+    # the epoch draws the training triples without replacement.
+    positives = Counter(triple for data in expected for triple in zip(*(x.tolist() for x in data[:3])))
+    assert sum(positives.values()) == 10 * config.batch_size
+    assert all(count <= train_triples[triple] for triple, count in positives.items())
+    for ph, pr, pt, nh, nr, nt in expected:
+        # every positive gets one corruption of its head or of its tail which is not a known triple.
+        assert torch.equal(pr, nr)
+        assert torch.all((ph == nh) ^ (pt == nt))
+        assert not any(triple in train_triples for triple in zip(nh.tolist(), nr.tolist(), nt.tolist()))
+
+    # the trainer consumes the same batches for the same seed.
+    trained = []
+    train_batch = trainer.train_batch
+    trainer.train_batch = lambda data: trained.append([x.clone() for x in data]) or train_batch(data)
+    if data_loader == "iterable":
+        # the iterable dataset draws a new permutation at every pass, replay the first one.
+        trainer.generator.dataset._num_iterations = 0
+    torch.manual_seed(0)
+    np.random.seed(0)
+    trainer.train_model_epoch(0)
+
+    assert len(trained) == len(expected)
+    assert all(torch.equal(x, y) for data, expected_data in zip(trained, expected) for x, y in zip(data, expected_data))
+
+@pytest.mark.parametrize("config_key", ["transr", "rescal"])
+def test_full_epochs_with_relation_bucket(tmpdir, config_key):
+    result_path_dir = tmpdir.mkdir("result_path")
+    configured_epochs = 2
+    model, config = get_model(result_path_dir, configured_epochs, -1, config_key)
+    config.relation_bucket = True
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    actual_epochs = trainer.train_model()
+
+    assert actual_epochs == configured_epochs - 1
+
+@pytest.mark.parametrize("config_key", ["transe", "rotate", "transh", "complex", "distmult"])
+def test_shared_negatives_loss(tmpdir, config_key):
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, config_key, ["-nps", "4", "-ncs", "3"])
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+
+    # 7 positives in chunks of 3, the last chunk is padded.
+    h, r, t = torch.arange(7), torch.arange(7) % config.tot_relation, torch.arange(7, 14)
+    neg = torch.randint(config.tot_entity, (3, 4))
+    with torch.no_grad():
+        loss = trainer.train_step_shared(h, r, t, neg)
+
+        # every positive against the pool of its chunk, as corrupted tails and as corrupted heads.
+        pos_preds = model(h, r, t)
+        neg_preds = torch.stack([torch.cat([model(h[i].repeat(4), r[i].repeat(4), neg[i // 3]),
+                                            model(neg[i // 3], r[i].repeat(4), t[i].repeat(4))]) for i in range(7)])
+        if model.training_strategy == TrainingStrategy.POINTWISE_BASED:
+            expected = F.softplus(pos_preds).mean() + F.softplus(-neg_preds).mean() + model.get_reg(h, r, t)
+        elif config.sampling == 'adversarial_negative_sampling':
+            softmax = torch.softmax(-neg_preds * config.alpha, dim=1)
+            expected = -(softmax * F.logsigmoid(neg_preds)).sum(-1).mean() - F.logsigmoid(-pos_preds).mean()
+        else:
+            expected = torch.clamp(pos_preds.unsqueeze(-1) + config.margin - neg_preds, min=0).mean(-1).sum()
+
+    assert torch.allclose(loss, expected, atol=1e-5)
+
+@pytest.mark.parametrize("config_key,distribution", [("transe", "degree"), ("transe", "domain"), ("complex", "domain")])
+def test_full_epochs_with_negative_distribution(tmpdir, config_key, distribution):
+    result_path_dir = tmpdir.mkdir("result_path")
+    configured_epochs = 2
+    model, config = get_model(result_path_dir, configured_epochs, -1, config_key)
+    config.negative_distribution = distribution
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    actual_epochs = trainer.train_model()
+
+    assert actual_epochs == configured_epochs - 1
+
+@pytest.mark.parametrize("config_key", ["transe", "complex", "proje_pointwise"])
+def test_full_epochs_with_generator_autotune(tmpdir, config_key):
+    result_path_dir = tmpdir.mkdir("result_path")
+    configured_epochs = 2
+    model, config = get_model(result_path_dir, configured_epochs, -1, config_key)
+    config.generator_autotune = True
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    actual_epochs = trainer.train_model()
+
+    assert actual_epochs == configured_epochs - 1
+
+@pytest.mark.parametrize("staging_depth", [0, 2])
+def test_epoch_trains_staged_batches(tmpdir, staging_depth):
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, "transe")
+    config.staging_depth = staging_depth
+
+    class Batches:
+        """Source of the raw batches of an epoch, as sampled by the Generator."""
+        def __init__(self, batches):
+            self.batches = batches
+
+        def start_one_epoch(self, num_batch):
+            self.iterator = iter(self.batches[:num_batch])
+
+        def __next__(self):
+            return next(self.iterator)
+
+    raw_batches = [[np.arange(i, i + 8), [0] * 8, np.arange(i + 8, i + 16), list(range(8)), [0] * 8, [9] * 8] for i in range(10)]
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    trainer.generator = Batches(raw_batches)
+    trained = []
+    train_batch = trainer.train_batch
+    trainer.train_batch = lambda data: trained.append([x.clone() for x in data]) or train_batch(data)
+    trainer.train_model_epoch(0)
+
+    # the trainer gets every raw batch, in order, as LongTensors.
+    assert len(trained) == len(raw_batches)
+    for data, raw_data in zip(trained, raw_batches):
+        assert all(x.dtype == torch.long and torch.equal(x, torch.as_tensor(np.asarray(y))) for x, y in zip(data, raw_data))
+
+@pytest.mark.parametrize("config_key", ["transe", "complex", "ntn", "convkb"])
+def test_sparse_step_matches_dense_step(tmpdir, config_key):
+    import copy
+
+    def get_trainer(model, sparse_grad):
+        model, config = copy.deepcopy(model), copy.copy(base_config)
+        config.sparse_grad = sparse_grad
+        trainer = Trainer(model, config)
+        trainer.build_model()
+        return trainer
+
+    model, base_config = get_model(tmpdir.mkdir("result_path"), 1, -1, config_key, ["-opt", "sgd"])
+    dense_trainer = get_trainer(model, False)
+    sparse_trainer = get_trainer(model, True)
+
+    h, r, t = torch.arange(4), torch.arange(4) % base_config.tot_relation, torch.arange(4, 8)
+    if model.training_strategy == TrainingStrategy.PAIRWISE_BASED:
+        data = [h, r, t, torch.arange(8, 12), r, t]
+    else:
+        data = [torch.cat([h, h]), torch.cat([r, r]), torch.cat([t, torch.arange(8, 12)]), torch.LongTensor([1] * 4 + [-1] * 4)]
+
+    # the sparse gradients give the update of the dense ones, the dense layers keep their dense gradients.
+    dense_trainer.train_batch(data)
+    sparse_trainer.train_batch(data)
+    assert any(p.grad is not None and p.grad.is_sparse for p in sparse_trainer.model.parameters())
+    for (name, dense), sparse in zip(dense_trainer.model.named_parameters(), sparse_trainer.model.parameters()):
+        assert torch.allclose(dense, sparse, atol=1e-6), name
+    assert not torch.equal(model.get_embedding_tables()['entity'][0].weight, sparse_trainer.model.get_embedding_tables()['entity'][0].weight)
+
+@pytest.mark.parametrize("optimizer", ["adam", "adagrad", "sgd"])
+def test_sparse_step_only_updates_touched_rows(tmpdir, optimizer):
+    result_path_dir = tmpdir.mkdir("result_path")
+    model, config = get_model(result_path_dir, 1, -1, "distmult")
+    config.sparse_grad = True
+    config.optimizer = optimizer
+    config.lmbda = 0.0
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+
+    before = model.ent_embeddings.weight.detach().clone()
+    h, r, t, y = torch.LongTensor([0, 1]), torch.LongTensor([0, 0]), torch.LongTensor([2, 3]), torch.LongTensor([1, -1])
+    trainer.optimizer.zero_grad()
+    trainer.train_step_pointwise(h, r, t, y).backward()
+    assert model.ent_embeddings.weight.grad.is_sparse
+    trainer.optimizer.step()
+
+    changed = (model.ent_embeddings.weight.detach() != before).any(-1).nonzero().view(-1).tolist()
+    assert set(changed) == {0, 1, 2, 3}
+
+@pytest.mark.parametrize("config_key", ["transe", "complex"])
+def test_full_epochs_with_hogwild(tmpdir, config_key):
+    result_path_dir = tmpdir.mkdir("result_path")
+    configured_epochs = 2
+    model, config = get_model(result_path_dir, configured_epochs, -1, config_key)
+    config.hogwild_workers = 2
+
+    before = model.ent_embeddings.weight.detach().clone() if config_key == "transe" else None
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    actual_epochs = trainer.train_model()
+
+    assert actual_epochs == configured_epochs - 1
+    assert len(trainer.training_results) == configured_epochs
+    if before is not None:
+        # the updates of the workers are visible to the coordinator.
+        assert not torch.equal(before, model.ent_embeddings.weight.detach())
+    # the telemetry of the workers is forwarded to the coordinator.
+    assert all(record['batches_per_sec'] > 0 and record['forward_time'] > 0 for record in trainer.telemetry.records)
+
+def test_hogwild_rejects_checkpoints(tmpdir):
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, "transe", ["-cks", "1"])
+    config.hogwild_workers = 2
+
+    with pytest.raises(NotImplementedError):
+        Trainer(model, config).build_model()
+
+def test_hogwild_rejects_dense_optimizers(tmpdir):
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, "transe", ["-opt", "rms"])
+    config.hogwild_workers = 2
+
+    with pytest.raises(NotImplementedError):
+        Trainer(model, config).build_model()
+
+def test_hogwild_worker_failures(tmpdir):
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, "transe", ["-opt", "rms"])
+    config.hogwild_workers = 2
+
+    # the traceback of a worker failing to set up is sent back.
+    workers = HogwildTrainer(model, config)
+    with pytest.raises(RuntimeError, match="No sparse support for rms optimizer"):
+        workers.train_epoch(0)
+    workers.stop()
+
+    # a worker dying without a result raises instead of hanging.
+    config.optimizer = "sgd"
+    workers = HogwildTrainer(model, config)
+    workers.process_list[0].kill()
+    with pytest.raises(RuntimeError, match="exited"):
+        workers.train_epoch(0)
+    workers.stop()
+
+def run_distributed(rank, world_size, init_method, result_path_dir, config_key, sparse_grad):
+    model, config = get_model(result_path_dir, 2, -1, config_key)
+    config.world_size = world_size
+    config.rank = rank
+    config.init_method = init_method
+    config.sparse_grad = sparse_grad
+    config.num_process_gen = 1
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    assert (config.shard_id, config.num_shards) == (rank, world_size)
+    actual_epochs = trainer.train_model()
+    assert actual_epochs == 1
+
+    # the ranks take the same averaged steps so they hold the same parameters.
+    ent_weight = model.parameter_list[0].weight.detach()
+    weights = [torch.zeros_like(ent_weight) for _ in range(world_size)]
+    dist.all_gather(weights, ent_weight)
+    assert all(torch.allclose(weights[0], w) for w in weights[1:])
+    dist.destroy_process_group()
+
+@pytest.mark.parametrize("config_key,sparse_grad", [("transe", False), ("complex", True)])
+def test_full_epochs_with_distributed(tmpdir, config_key, sparse_grad):
+    result_path_dir = tmpdir.mkdir("result_path")
+    launch_local(run_distributed, 2, args=(result_path_dir, config_key, sparse_grad))
+
+def run_all_reduce_gradients(rank, world_size, init_method):
+    dist.init_process_group('gloo', init_method=init_method, rank=rank, world_size=world_size)
+    model, _ = get_model("", 1, -1, "transe")
+    # the entity table gets a gradient on rank 0 only, the relation table on no rank.
+    if rank == 0:
+        model.ent_embeddings(torch.LongTensor([0, 1])).sum().backward()
+
+    all_reduce_gradients(model)
+    assert model.ent_embeddings.weight.grad is not None
+    assert torch.allclose(model.ent_embeddings.weight.grad[:2], torch.full_like(model.ent_embeddings.weight.grad[:2], 0.5))
+    assert model.rel_embeddings.weight.grad is None
+    dist.destroy_process_group()
+
+def test_all_reduce_gradients_keeps_missing_gradients():
+    launch_local(run_all_reduce_gradients, 2)
+
+@pytest.mark.parametrize("config_key", ["transe", "transr", "distmult", "convkb"])
+def test_bf16_step(tmpdir, config_key):
+    import copy
+
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, config_key)
+    bf16_config = copy.copy(config)
+    bf16_config.precision = 'bf16'
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    bf16_trainer = Trainer(copy.deepcopy(model), bf16_config)
+    bf16_trainer.build_model()
+
+    h, r, t = torch.arange(8), torch.arange(8) % config.tot_relation, torch.arange(8, 16)
+    if model.training_strategy == TrainingStrategy.PAIRWISE_BASED:
+        data = [h, r, t, torch.arange(16, 24), r, t]
+    else:
+        data = [torch.cat([h, h]), torch.cat([r, r]), torch.cat([t, torch.arange(16, 24)]), torch.LongTensor([1] * 8 + [-1] * 8)]
+
+    loss = trainer.train_batch(data)
+    bf16_loss = bf16_trainer.train_batch(data)
+
+    # the forward runs in bf16, the loss stays within its precision and the parameters stay in fp32.
+    assert bf16_loss.dtype == torch.float32
+    assert torch.allclose(bf16_loss, loss, rtol=2e-2)
+    assert all(p.dtype == torch.float32 for p in bf16_trainer.model.parameters())
+    if config_key in ["transr", "convkb"]:
+        # the matmuls lose precision.
+        assert not torch.equal(bf16_loss, loss)
+
+def test_bf16_losses_outside_autocast(tmpdir, monkeypatch):
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, "tucker")
+    config.precision = 'bf16'
+    trainer = Trainer(model, config)
+    trainer.build_model()
+
+    binary_cross_entropy = F.binary_cross_entropy
+
+    def checked_binary_cross_entropy(*args, **kwargs):
+        # a matmul under autocast would come out in bfloat16.
+        assert torch.matmul(torch.ones(2, 2), torch.ones(2, 2)).dtype == torch.float32
+        return binary_cross_entropy(*args, **kwargs)
+
+    monkeypatch.setattr(F, "binary_cross_entropy", checked_binary_cross_entropy)
+
+    h, r, t = torch.arange(4), torch.arange(4) % config.tot_relation, torch.arange(4, 8)
+    hr_t = torch.zeros(4, config.tot_entity)
+    hr_t[torch.arange(4), t] = 1.0
+    tr_h = torch.zeros(4, config.tot_entity)
+    tr_h[torch.arange(4), h] = 1.0
+
+    assert torch.isfinite(trainer.train_batch([h, r, t, hr_t, tr_h]))
+
+def test_precision_drift(tmpdir):
+    result_path_dir = tmpdir.mkdir("result_path")
+    model, config = get_model(result_path_dir, 1, -1, "distmult")
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    trainer.train_model()
+
+    drift = measure_precision_drift(model, config, num_of_test=5)
+
+    assert config.precision == 'fp32'
+    assert set(drift) == {'mr', 'fmr', 'mrr', 'fmrr', 'time'} | {'%shit%d' % (f, hit) for f in ['', 'f'] for hit in config.hits}
+    assert drift['fmrr']['drift'] == pytest.approx(drift['fmrr']['bf16'] - drift['fmrr']['fp32'])
+
+@pytest.mark.parametrize("config_key", ["transe", "convkb"])
+def test_compiled_step_matches_eager_step(tmpdir, config_key):
+    import copy
+
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, config_key)
+    compiled_config = copy.copy(config)
+    compiled_config.compile_mode = 'default'
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    compiled_trainer = Trainer(copy.deepcopy(model), compiled_config)
+    compiled_trainer.build_model()
+
+    h, r, t = torch.arange(8), torch.arange(8) % config.tot_relation, torch.arange(8, 16)
+    if model.training_strategy == TrainingStrategy.PAIRWISE_BASED:
+        data = [h, r, t, torch.arange(16, 24), r, t]
+    else:
+        data = [torch.cat([h, h]), torch.cat([r, r]), torch.cat([t, torch.arange(16, 24)]), torch.LongTensor([1] * 8 + [-1] * 8)]
+
+    for _ in range(2):
+        assert torch.allclose(compiled_trainer.train_batch(data), trainer.train_batch(data), atol=1e-5)
+
+    # the steps ran compiled, without falling back to eager.
+    assert len(compiled_trainer.compiled_steps) == 1
+    assert all(step.is_compiled for step in compiled_trainer.compiled_steps.values())
+    for eager, compiled in zip(trainer.model.parameters(), compiled_trainer.model.parameters()):
+        assert torch.allclose(eager, compiled, atol=1e-5)
+
+def test_compiled_step_falls_back_to_eager(monkeypatch):
+    def compiled_step(x):
+        raise RuntimeError("not supported by the compiler")
+
+    monkeypatch.setattr(torch, "compile", lambda step, mode: compiled_step)
+
+    step = CompiledStep(lambda x: x * 2)
+    assert torch.equal(step(torch.ones(2)), 2 * torch.ones(2))
+    assert not step.is_compiled
+
+def test_resume_from_checkpoint(tmpdir):
+    def get_trainer(resume=None):
+        model, config = get_model(tmpdir.join("result_path"), 4, -1, "transe")
+        config.path_tmp = Path(str(tmpdir))
+        config.data_loader = 'map'
+        config.num_process_gen = 0
+        config.staging_depth = 0
+        config.checkpoint_step = 1
+        config.keep_checkpoints = 2
+        config.resume = resume
+
+        trainer = Trainer(model, config)
+        trainer.build_model()
+        return trainer
+
+    tmpdir.mkdir("result_path")
+    trainer = get_trainer()
+    trainer.train_model()
+
+    checkpoint_path = Path(str(tmpdir)) / "transe" / "checkpoints"
+    assert sorted(p.name for p in checkpoint_path.iterdir()) == ["checkpoint_000002.pt", "checkpoint_000003.pt"]
+
+    resumed_trainer = get_trainer(resume=str(checkpoint_path / "checkpoint_000002.pt"))
+    resumed_trainer.train_model()
+
+    assert resumed_trainer.training_results == trainer.training_results
+    for name, tensor in trainer.model.state_dict().items():
+        assert torch.equal(tensor, resumed_trainer.model.state_dict()[name])
+
+@pytest.mark.parametrize("config_key", ["transe", "complex"])
+def test_epoch_telemetry(tmpdir, config_key):
+    result_path_dir = tmpdir.mkdir("result_path")
+    configured_epochs = 2
+    model, config = get_model(result_path_dir, configured_epochs, -1, config_key)
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    trainer.train_model()
+
+    # one row per epoch, appended as the epochs end.
+    lines = result_path_dir.join("%s_Telemetry_0.jsonl" % model.model_name).read().splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record['epoch'] for record in records] == list(range(configured_epochs))
+    for record in records:
+        assert record['triples_per_sec'] > 0 and record['negatives_per_sec'] > 0
+        assert record['forward_time'] > 0 and record['loss_time'] > 0 and record['evaluation_time'] > 0
+        assert record['train_time'] == pytest.approx(record['time'] - record['evaluation_time'])
+        assert 0 <= record['queue_occupancy'] <= 1
+    assert len(result_path_dir.join("%s_Telemetry_0.csv" % model.model_name).readlines()) == configured_epochs + 1
+
+@pytest.mark.parametrize("stage", ["train", "eval"])
+def test_profile_window(tmpdir, stage):
+    result_path_dir = tmpdir.mkdir("result_path")
+    model, config = get_model(result_path_dir, 1, -1, "transe")
+    config.profile = stage
+    config.profile_steps = 2
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    trainer.train_model()
+
+    trace = json.loads(result_path_dir.join("transe_%s_trace_0.json" % stage).read())
+    names = {event.get('name') for event in trace['traceEvents']}
+    expected = {'sampling', 'forward', 'loss', 'backward', 'optimizer'} if stage == 'train' else {'rank', 'filter'}
+    assert expected <= names
+    assert result_path_dir.join("transe_%s_profile_0.txt" % stage).check()
+
+def test_full_epochs_with_async_eval(tmpdir):
+    result_path_dir = tmpdir.mkdir("result_path")
+    configured_epochs = 3
+    model, config = get_model(result_path_dir, configured_epochs, -1, "transe")
+    config.async_eval = True
+    config.save_model = True
+    config.path_tmp = Path(str(tmpdir))
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    actual_epochs = trainer.train_model()
+
+    assert actual_epochs == configured_epochs - 1
+    assert not trainer.async_evaluator.process.is_alive()
+    # the metrics of every background mini-test made it into the history.
+    assert set(range(configured_epochs)) <= set(trainer.evaluator.metric_calculator.fmr)
+    assert trainer.best_metric is not None
+    assert (Path(str(tmpdir)) / "transe" / Trainer.TRAINED_MODEL_FILE_NAME).exists()
+
+@pytest.mark.parametrize("config_key", ["transe", "distmult", "complex", "rotate"])
+def test_full_epochs_with_partitions(tmpdir, config_key):
+    result_path_dir = tmpdir.mkdir("result_path")
+    configured_epochs = 2
+    model, config = get_model(result_path_dir, configured_epochs, -1, config_key, ["-np", "4", "-nps", "50", "-opt", "adagrad"])
+    config.path_tmp = Path(str(tmpdir))
+
+    # the model is built with the entity tables of two partitions.
+    for table in model.get_embedding_tables()['entity']:
+        assert table.weight.shape[0] == 2 * partition_capacity(config.tot_entity, 4) < config.tot_entity
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    actual_epochs = trainer.train_model()
+
+    assert actual_epochs == configured_epochs - 1
+    assert len(trainer.training_results) == configured_epochs
+    partitions = trainer.generator
+    partition_path = Path(str(tmpdir)) / model.model_name / "partitions"
+    for table in partitions.entity_tables:
+        assert (partition_path / ("%s_weight_1.npy" % table.name)).exists()
+        # the full tables are never assembled.
+        assert table.weight.shape[0] == 2 * partitions.capacity
+
+    # the ranks computed partition by partition are the ranks against the full tables.
+    metric_calculator = trainer.evaluator.metric_calculator
+    test_triples = config.knowledge_graph.read_cache_data('triplets_test')[:5]
+    partitions.rank_triples(test_triples, metric_calculator)
+    partitioned_ranks = [metric_calculator.rank_tail, metric_calculator.rank_head,
+                         metric_calculator.f_rank_tail, metric_calculator.f_rank_head]
+    for table in partitions.entity_tables:
+        table.weight.data = torch.from_numpy(np.stack(list(partitions.iter_rows(table))))
+    trainer.evaluator.partitions = None
+    trainer.evaluator.rank_triples(test_triples, len(test_triples))
+    assert partitioned_ranks == [metric_calculator.rank_tail, metric_calculator.rank_head,
+                                 metric_calculator.f_rank_tail, metric_calculator.f_rank_head]
+
+def test_partitions_require_shared_negatives(tmpdir):
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, "transe", ["-np", "2", "-opt", "adagrad"])
+
+    with pytest.raises(NotImplementedError):
+        Trainer(model, config).build_model()
+
+def test_partitions_require_partition_sized_tables(tmpdir):
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, "transe", ["-nps", "50", "-opt", "adagrad"])
+    config.num_partitions = 4
+    config.path_tmp = Path(str(tmpdir))
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    with pytest.raises(ValueError):
+        trainer.create_generator()
+
+@pytest.mark.parametrize("config_key,one_to_n", [("distmult", "kvsall"), ("complex", "kvsall"), ("complexn3", "1vsall"),
+                                                  ("cp", "kvsall"), ("simple", "1vsall"), ("analogy", "kvsall")])
+def test_full_epochs_with_one_to_n(tmpdir, config_key, one_to_n):
+    result_path_dir = tmpdir.mkdir("result_path")
+    configured_epochs = 2
+    model, config = get_model(result_path_dir, configured_epochs, -1, config_key)
+    config.one_to_n = one_to_n
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    actual_epochs = trainer.train_model()
+
+    assert actual_epochs == configured_epochs - 1
+    assert trainer.get_train_step() == trainer.train_step_one_to_n
+
+
+def test_one_to_n_rejects_models_without_kernels(tmpdir):
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, "ntn")
+    config.one_to_n = "kvsall"
+
+    with pytest.raises(NotImplementedError):
+        Trainer(model, config).build_model()
+
+
+@pytest.mark.parametrize("config_key,extra_args", [("transe", []), ("complex", []), ("proje_pointwise", []),
+                                                    ("distmult", ["-on", "kvsall"]), ("rotate", ["-nps", "20"])])
+def test_full_epochs_with_reciprocal(tmpdir, config_key, extra_args):
+    model, config = get_model(tmpdir.mkdir("result_path"), 2, -1, config_key, ["-rcp", "True"] + extra_args)
+    assert config.tot_relation == 2 * config.knowledge_graph.kg_meta.tot_relation
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    assert trainer.train_model() == 1
+
+    # the head queries are answered as tail queries on the inverse relations.
+    tail_queries = []
+    test_tail_rank = trainer.evaluator.test_tail_rank
+    trainer.evaluator.test_tail_rank = lambda h, r, topk=-1: tail_queries.append((int(h), int(r))) or test_tail_rank(h, r, topk)
+    trainer.evaluator.test_head_rank(torch.LongTensor([1]), torch.LongTensor([2]), 5)
+    assert tail_queries == [(2, 1 + config.tot_relation // 2)]
+
+
+@pytest.mark.parametrize("config_key", ["transe", "transh", "transd", "transm", "transr"])
+def test_full_epochs_with_constraint_projection(tmpdir, config_key):
+    result_path_dir = tmpdir.mkdir("result_path")
+    configured_epochs = 2
+    model, config = get_model(result_path_dir, configured_epochs, -1, config_key)
+    config.constraint = 'unit'
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    actual_epochs = trainer.train_model()
+
+    assert actual_epochs == configured_epochs - 1
+    tables = model.get_constrained_tables()
+    assert tables
+    for table in tables:
+        assert torch.allclose(table.weight.detach().norm(dim=-1), torch.ones(table.num_embeddings), atol=1e-5)
+
+    # the pre-normalized tables give the scores of the per-forward normalization.
+    h, r, t = torch.arange(5), torch.arange(5) % config.tot_relation, torch.arange(5, 10)
+    with torch.no_grad():
+        scores = model(h, r, t)
+        model.constraint = None
+        assert torch.allclose(scores, model(h, r, t), atol=1e-5)
+
+@pytest.mark.parametrize("constraint", ["unit", "max"])
+def test_constraint_projection_only_touches_batch_rows(tmpdir, constraint):
+    from pykg2vec.utils.constraint import ConstraintProjector
+
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, "transe")
+    config.constraint = constraint
+    projector = ConstraintProjector(model, config)
+    with torch.no_grad():
+        model.ent_embeddings.weight.mul_(3)
+    before = model.ent_embeddings.weight.detach().clone()
+
+    pos_h, pos_t, neg_h, neg_t = (torch.LongTensor([i]) for i in range(4))
+    rel = torch.LongTensor([0])
+    projector.project_batch([pos_h, rel, pos_t, neg_h, rel, neg_t])
+
+    norms = model.ent_embeddings.weight.detach().norm(dim=-1)
+    assert torch.allclose(norms[:4], torch.ones(4), atol=1e-5)
+    assert torch.equal(model.ent_embeddings.weight.detach()[4:], before[4:])
+
+    # the tables rebuilt by a re-initialization of the model (as in load_model) are projected.
+    model.__init__(**config.__dict__)
+    with torch.no_grad():
+        model.ent_embeddings.weight.mul_(3)
+    projector.project()
+    assert model.ent_embeddings.weight.detach().norm(dim=-1).max() <= 1 + 1e-5
+
+def test_constraint_projection_with_dense_adam(tmpdir):
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, "transe", ["-opt", "adam"])
+    config.constraint = 'unit'
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+
+    rel = torch.LongTensor([0, 1])
+    for rows in [(0, 1, 2, 3), (4, 5, 6, 7)]:
+        pos_h, pos_t, neg_h, neg_t = (torch.LongTensor([i, i + 8]) for i in rows)
+        trainer.train_batch([pos_h, rel, pos_t, neg_h, rel, neg_t])
+
+    # the rows of the first batch moved by the Adam moments in the second step are projected too.
+    for table in model.get_constrained_tables():
+        assert torch.allclose(table.weight.detach().norm(dim=-1), torch.ones(table.num_embeddings), atol=1e-5)
+
+def test_multi_model_trainer(tmpdir):
+    from pykg2vec.utils.multi_trainer import MultiModelTrainer
+
+    result_path_dir = tmpdir.mkdir("result_path")
+    configured_epochs = 2
+    trainers = []
+    for config_key in ["transe", "transh", "transr"]:
+        model, config = get_model(result_path_dir, configured_epochs, -1, config_key)
+        trainer = Trainer(model, config)
+        trainer.build_model()
+        trainers.append(trainer)
+
+    actual_epochs = MultiModelTrainer(trainers).train_model()
+
+    assert actual_epochs == [configured_epochs - 1] * 3
+    for trainer in trainers:
+        assert len(trainer.training_results) == configured_epochs
+        assert set(range(configured_epochs)) <= set(trainer.evaluator.metric_calculator.fmr)
+        # the batches come from the generator of the first trainer.
+        assert trainer.generator is trainers[0].generator
+
+@pytest.mark.parametrize("setting,values", [("batch_size", [128, 64]), ("reciprocal", [True, False])])
+def test_multi_model_trainer_rejects_different_sampling(tmpdir, setting, values):
+    from pykg2vec.utils.multi_trainer import MultiModelTrainer
+
+    result_path_dir = tmpdir.mkdir("result_path")
+    trainers = []
+    for value in values:
+        cli_args = ["-b", str(value)] if setting == "batch_size" else ["-rcp", str(value)]
+        model, config = get_model(result_path_dir, 1, -1, "transe", cli_args)
+        trainer = Trainer(model, config)
+        trainer.build_model()
+        trainers.append(trainer)
+
+    with pytest.raises(ValueError):
+        MultiModelTrainer(trainers)
+    # the settings of the built trainers are left as they are.
+    assert getattr(trainers[1].config, setting) == values[1]
+
+@pytest.mark.parametrize("config_key", ["conve", "convkb", "ntn"])
+def test_activation_checkpointing_matches_gradients(tmpdir, config_key):
+    import copy
+
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, config_key)
+    h, r, t = torch.arange(8), torch.arange(8) % config.tot_relation, torch.arange(8, 16)
+
+    grads, running_means = [], []
+    for activation_checkpointing in [False, True]:
+        copied = copy.deepcopy(model)
+        copied.activation_checkpointing = activation_checkpointing
+        copied.train()
+        torch.manual_seed(0)
+        preds = copied(h, r) if config_key == "conve" else copied(h, r, t)
+        preds.sum().backward()
+        grads.append([p.grad.to_dense() for p in copied.parameters() if p.grad is not None])
+        running_means.append([m.running_mean.clone() for m in copied.modules() if isinstance(m, torch.nn.BatchNorm2d)])
+
+    assert len(grads[0]) == len(grads[1]) > 0
+    for grad, checkpointed_grad in zip(*grads):
+        assert torch.allclose(grad, checkpointed_grad, atol=1e-6)
+    # the recomputation does not update the batch norm statistics a second time.
+    for running_mean, checkpointed_running_mean in zip(*running_means):
+        assert torch.allclose(running_mean, checkpointed_running_mean)
+
+def test_find_batch_size(tmpdir):
+    from pykg2vec.utils.batch_size import find_batch_size
+
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, "transe")
+    config.optimizer = "sgd"
+    initial_batch_size, initial_learning_rate = config.batch_size, config.learning_rate
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    before = {name: tensor.clone() for name, tensor in model.state_dict().items()}
+
+    found = find_batch_size(trainer, batch_sizes=[32, 64, 128], scale_learning_rate=True, num_batches=2)
+
+    assert [result['batch_size'] for result in found['results']] == [32, 64, 128]
+    assert all(result['triples_per_sec'] > 0 and result['peak_memory'] > 0 for result in found['results'])
+    assert config.batch_size == found['batch_size'] in [32, 64, 128]
+    assert config.learning_rate == pytest.approx(initial_learning_rate * config.batch_size / initial_batch_size)
+    # the calibration bursts do not change the model.
+    for name, tensor in model.state_dict().items():
+        assert torch.equal(tensor, before[name])
+
+    # a cap below the memory already in use keeps the configured batch size.
+    config.batch_size = initial_batch_size
+    assert find_batch_size(trainer, batch_sizes=[32, 64], memory_cap=1)['batch_size'] == initial_batch_size
+
+@pytest.mark.parametrize("config_key,optimizer", [("transe", "adam"), ("complex", "adagrad")])
+def test_online_training(tmpdir, config_key, optimizer):
+    from pykg2vec.utils.online import OnlineTrainer, follow_file
+
+    model, config = get_model(tmpdir.mkdir("result_path"), 1, -1, config_key)
+    config.optimizer = optimizer
+    config.online_update_size = 3
+    tot_entity, tot_relation = config.tot_entity, config.tot_relation
+    trainer = Trainer(model, config)
+    trainer.build_model()
+    trainer.train_model()
+
+    online_trainer = OnlineTrainer(trainer)
+    idx2entity = config.knowledge_graph.read_cache_data('idx2entity')
+    idx2relation = config.knowledge_graph.read_cache_data('idx2relation')
+    new_facts = tmpdir.join("new_facts.txt")
+    new_facts.write("".join("%s\t%s\t%s\n" % triple for triple in [
+        (idx2entity[0], idx2relation[0], "new_entity_1"),
+        ("new_entity_1", "new_relation", idx2entity[1]),
+        (idx2entity[2], idx2relation[1], idx2entity[3]),
+        ("new_entity_2", idx2relation[0], "new_entity_1"),
+    ]))
+
+    losses = online_trainer.run(follow_file(str(new_facts), poll_interval=0.01, idle_limit=1))
+
+    # 3 triples fill the first update, the last one is flushed at the end of the file.
+    assert len(losses) == 2 and all(np.isfinite(losses))
+    assert config.tot_entity == tot_entity + 2 and config.tot_relation == tot_relation + 1
+    assert online_trainer.entity2idx["new_entity_2"] == tot_entity + 1
+    tables = model.get_embedding_tables()
+    assert all(table.weight.shape[0] == tot_entity + 2 for table in tables['entity'])
+    assert all(table.weight.shape[0] == tot_relation + 1 for table in tables['relation'])
+    for optimizer_state in trainer.optimizer.state.values():
+        for value in optimizer_state.values():
+            if isinstance(value, torch.Tensor) and value.dim() > 0:
+                assert value.shape[0] in (tot_entity + 2, tot_relation + 1)
+
+    with torch.no_grad():
+        scores = model(torch.LongTensor([tot_entity]), torch.LongTensor([tot_relation]), torch.LongTensor([1]))
+    assert torch.isfinite(scores).all()
+
+
+@pytest.mark.parametrize("overrides,expected", [
+    ({}, (20, 4, 8, 0)),
+    ({"trainer_threads": 6, "sampler_processes": 2, "eval_threads": 3}, (6, 2, 3, 0)),
+    ({"hogwild_workers": 4, "async_eval": False}, (32, 0, 0, 8)),
+    ({"world_size": 2, "rank": 1}, (8, 4, 4, 0)),
+])
+def test_plan_resources(tmpdir, overrides, expected):
+    _, config = get_model(tmpdir.mkdir("result_path"), 1, -1, "transe",
+                          ["-cb", "32", "-npg", "4", "-ae", "True", "-caf", "True"])
+    for key, value in overrides.items():
+        setattr(config, key, value)
+
+    plan = plan_resources(config)
+
+    assert (plan['trainer_threads'], plan['sampler_processes'], plan['eval_threads'], plan['hogwild_threads']) == expected
+    assert len(plan['trainer_cores']) == plan['trainer_threads']
+    assert len(plan['sampler_cores']) == plan['sampler_processes']
+    assert len(plan['eval_cores']) == plan['eval_threads']
+
+
+@pytest.mark.parametrize("data_loader", [None, "map"])
+def test_full_epochs_with_thread_plan(tmpdir, data_loader):
+    model, config = get_model(tmpdir.mkdir("result_path"), 2, -1, "transe",
+                              ["-tpl", "True", "-cb", "4", "-caf", "True", "-npg", "1", "-ae", "True"])
+    config.data_loader = data_loader
+    config.path_tmp = Path(str(tmpdir))
+    num_threads = torch.get_num_threads()
+    cores = available_cores()
+
+    try:
+        trainer = Trainer(model, config)
+        trainer.build_model()
+        assert trainer.train_model() == 1
+        assert torch.get_num_threads() == config.resource_plan['trainer_threads']
+    finally:
+        torch.set_num_threads(num_threads)
+        pin(cores)
+
+
+@pytest.mark.parametrize("chunk_size,use_bias", [(7, True), (100, True), (7, False)])
+def test_chunked_one_to_n_loss_matches_dense(chunk_size, use_bias):
+    torch.manual_seed(0)
+    x = torch.randn(5, 8, requires_grad=True)
+    weight = torch.randn(37, 8, requires_grad=True)
+    bias = torch.randn(37, requires_grad=True) if use_bias else None
+    labels = torch.tensor([0, 3, 40, 41, 80, 150, 184])
+
+    loss = chunked_one_to_n_loss(x, weight, bias, labels, label_smoothing=0.1, chunk_size=chunk_size)
+    loss.backward()
+    grads = [x.grad.clone(), weight.grad.clone()] + ([bias.grad.clone()] if use_bias else [])
+
+    x.grad, weight.grad = None, None
+    if use_bias:
+        bias.grad = None
+    logits = torch.matmul(x, weight.t()) + (bias if use_bias else 0)
+    dense_labels = torch.zeros(5 * 37).index_fill_(0, labels, 1.0).view(5, 37) * 0.9 + 1.0 / 37
+    expected = torch.nn.functional.binary_cross_entropy_with_logits(logits, dense_labels)
+    expected.backward()
+    expected_grads = [x.grad, weight.grad] + ([bias.grad] if use_bias else [])
+
+    assert torch.allclose(loss, expected, atol=1e-6)
+    for grad, expected_grad in zip(grads, expected_grads):
+        assert torch.allclose(grad, expected_grad, atol=1e-6)
+
+
+@pytest.mark.parametrize("config_key,reciprocal", [("conve", False), ("tucker", False), ("conve", True)])
+def test_full_epochs_with_chunked_loss(tmpdir, config_key, reciprocal):
+    model, config = get_model(tmpdir.mkdir("result_path"), 2, -1, config_key,
+                              ["-ecs", "1000", "-rcp", str(reciprocal)])
+
+    trainer = Trainer(model, config)
+    trainer.build_model()
+
+    assert trainer.train_model() == 1
+    assert trainer.get_train_step() == trainer.train_step_chunked
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for running the evaluation concurrently with the training: the trainer
+hands snapshots of the weights to a background evaluator process and keeps training,
+the metrics are collected as they arrive.
+"""
+import copy
+import os
+import queue
+import traceback
+import torch
+import torch.multiprocessing as mp
+from pykg2vec.utils.checkpoint import snapshot
+from pykg2vec.utils.resources import pin
+from pykg2vec.utils.logger import Logger
+
+HISTORY_NAMES = ['mr', 'fmr', 'mrr', 'fmrr', 'hit', 'fhit']
+
+
+def evaluation_worker(model, config, request_queue, result_queue, num_threads):
+    """Function run by the evaluator process.
+
+        Args:
+            model (object): KGE model, copied so that the snapshots never touch the trained weights.
+            config (object): Configuration object.
+            request_queue (Queue): Queue to receive the (epoch, state_dict) to evaluate (None to quit).
+            result_queue (Queue): Queue to send back the (epoch, metrics, history) of every evaluation
+                (or the traceback of a failure).
+            num_threads (int): The number of intra-op threads of the evaluator.
+    """
+    from pykg2vec.utils.evaluator import Evaluator
+
+    torch.set_num_threads(num_threads)
+    model = copy.deepcopy(model)
+    model.eval()
+    evaluator = Evaluator(model, config)
+
+    while True:
+        request = request_queue.get()
+        if request is None:
+            return
+        epoch, state_dict = request
+        try:
+            model.load_state_dict(state_dict)
+            with torch.no_grad():
+                metrics = evaluator.mini_test(epoch)
+            metric_calculator = evaluator.metric_calculator
+            history = {name: {key: value for key, value in getattr(metric_calculator, name).items()
+                              if key == epoch or (isinstance(key, tuple) and key[0] == epoch)}
+                       for name in HISTORY_NAMES}
+            result_queue.put((epoch, metrics, history))
+        except Exception:
+            result_queue.put(traceback.format_exc())
+
+
+class AsyncEvaluator:
+    """Evaluator process running the mini-tests of the snapshots of the model in the background.
+
+        The snapshots are kept until their metrics arrive, so that the best model can be saved
+        with the weights it was evaluated with even though the training has moved on.
+
+        Args:
+            model (object): KGE model.
+            config (object): Configuration object (uses cpu_budget and resource_plan).
+
+        Examples:
+            >>> from pykg2vec.utils.async_evaluator import AsyncEvaluator
+            >>> async_evaluator = AsyncEvaluator(model, config)
+            >>> async_evaluator.submit(0)
+            >>> for epoch, metrics, history, state_dict in async_evaluator.poll():
+            >>>     print(epoch, metrics)
+            >>> async_evaluator.stop()
+    """
+    _logger = Logger().get_logger(__name__)
+
+    def __init__(self, model, config):
+        self.model = model
+        self.snapshots = {}
+
+        plan = config.resource_plan
+        if plan is not None:
+            num_threads = max(1, plan['eval_threads'])
+        else:
+            cpu_budget = config.cpu_budget if config.cpu_budget > 0 else (os.cpu_count() or 1)
+            num_threads = max(1, cpu_budget - torch.get_num_threads())
+        self._logger.info("Evaluating in a background process with %d threads." % num_threads)
+
+        self.request_queue = mp.Queue()
+        self.result_queue = mp.Queue()
+        self.process = mp.Process(target=evaluation_worker,
+                                  args=(model, config, self.request_queue, self.result_queue, num_threads))
+        self.process.daemon = True
+        self.process.start()
+        if plan is not None:
+            pin(plan['eval_cores'], self.process.pid)
+
+    def submit(self, epoch):
+        """Function to snapshot the current weights and queue their evaluation."""
+        state_dict = snapshot(self.model.state_dict())
+        self.snapshots[epoch] = state_dict
+        self.request_queue.put((epoch, state_dict))
+
+    def _get(self, block):
+        result = self.result_queue.get(block=block)
+        if isinstance(result, str):
+            raise RuntimeError("Background evaluation failed:\n%s" % result)
+        epoch, metrics, history = result
+        return epoch, metrics, history, self.snapshots.pop(epoch)
+
+    def poll(self):
+        """Function to get the results which have arrived, without waiting.
+
+            Returns:
+                list: (epoch, metrics, history, state_dict) of every finished evaluation, in order.
+        """
+        results = []
+        while self.snapshots:
+            try:
+                results.append(self._get(block=False))
+            except queue.Empty:
+                break
+        return results
+
+    def drain(self):
+        """Function to wait for all the pending evaluations.
+
+            Returns:
+                list: (epoch, metrics, history, state_dict) of the remaining evaluations, in order.
+        """
+        return [self._get(block=True) for _ in range(len(self.snapshots))]
+
+    def stop(self):
+        """Function to stop the evaluator process."""
+        self.request_queue.put(None)
+        self.process.join()
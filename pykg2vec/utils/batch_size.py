@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for choosing the batch size before the training: short calibration bursts
+are trained at increasing batch sizes, measuring the throughput and the peak memory, and
+the fastest batch size within the memory cap is kept.
+"""
+import math
+import os
+import threading
+import time
+import torch
+from pykg2vec.utils.checkpoint import snapshot, get_rng_state, set_rng_state
+from pykg2vec.utils.telemetry import count_triples
+from pykg2vec.utils.logger import Logger
+
+_logger = Logger().get_logger(__name__)
+
+
+def current_rss():
+    """Function to get the resident set size of the process in bytes (its peak where /proc is not available)."""
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        # kilobytes on linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryMonitor:
+    """Thread sampling the memory of the training device while its block runs.
+
+        On cpu the peak is the peak RSS of the process, on cuda the peak memory allocated by torch.
+
+        Args:
+            device (str): The training device.
+            interval (float): The sampling interval of the RSS in seconds.
+
+        Examples:
+            >>> from pykg2vec.utils.batch_size import MemoryMonitor
+            >>> with MemoryMonitor('cpu') as monitor:
+            >>>     trainer.train_batch(data)
+            >>> print(monitor.peak)
+    """
+
+    def __init__(self, device, interval=0.005):
+        self.device = torch.device(device)
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        if self.device.type == 'cuda':
+            torch.cuda.reset_peak_memory_stats(self.device)
+        else:
+            self.peak = current_rss()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.device.type == 'cuda':
+            self.peak = torch.cuda.max_memory_allocated(self.device)
+        else:
+            self.stopped.set()
+            self.thread.join()
+            self.peak = max(self.peak, current_rss())
+        return False
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+
+def calibrate(trainer, batch_size, num_batches=5, warmup_batches=1):
+    """Function to train a burst of batches of a batch size.
+
+        Args:
+            trainer (Trainer): The built trainer, its model and optimizer are updated by the burst.
+            batch_size (int): The batch size of the burst.
+            num_batches (int): The number of measured batches.
+            warmup_batches (int): The number of batches trained before the measure.
+
+        Returns:
+            dict: the batch size, the triples (positives) per second and the peak memory in MB.
+    """
+    config = trainer.config
+    config.batch_size = batch_size
+    trainer.generator = trainer.create_generator()
+    staged_batches = None
+    try:
+        staged_batches, num_batch = trainer.stage_epoch(0, num_batch=warmup_batches + num_batches)
+        for _ in range(min(warmup_batches, num_batch - 1)):
+            trainer.train_batch(next(staged_batches))
+
+        num_triples = 0
+        with MemoryMonitor(config.device) as monitor:
+            start_time = time.perf_counter()
+            for data in staged_batches:
+                trainer.train_batch(data)
+                num_triples += count_triples(data, trainer.model.training_strategy, config)[0]
+            elapsed = time.perf_counter() - start_time
+    finally:
+        if staged_batches is not None:
+            staged_batches.close()
+        trainer.stop_generator()
+        trainer.generator = None
+
+    return {'batch_size': batch_size,
+            'triples_per_sec': num_triples / elapsed if elapsed > 0 else 0.0,
+            'peak_memory': monitor.peak / 2**20}
+
+
+def find_batch_size(trainer, batch_sizes=None, memory_cap=0, scale_learning_rate=False, num_batches=5, patience=2):
+    """Function to pick the batch size with the highest throughput within a memory cap.
+
+        The batch sizes are calibrated in increasing order until the memory cap is exceeded (or
+        the device runs out of memory) or the throughput has not improved for patience sizes.
+        The model, the optimizer and the random number generators are restored afterwards.
+        With scale_learning_rate the learning rate follows the batch size, linearly for sgd and
+        with the square root for the adaptive optimizers.
+
+        Args:
+            trainer (Trainer): The built trainer, whose config.batch_size (and learning_rate) are set.
+            batch_sizes (list): The batch sizes to try, by default the powers of 2 from 32 to the number of training triples.
+            memory_cap (float): The peak memory allowed in MB, 0 for no cap.
+            scale_learning_rate (bool): Scale the learning rate with the batch size.
+            num_batches (int): The number of measured batches of every calibration burst.
+            patience (int): The number of larger batch sizes tried without a throughput gain.
+
+        Returns:
+            dict: the chosen batch size and learning rate and the results of the calibration.
+
+        Examples:
+            >>> from pykg2vec.utils.batch_size import find_batch_size
+            >>> trainer.build_model()
+            >>> find_batch_size(trainer, memory_cap=4096)
+            >>> trainer.train_model()
+    """
+    config = trainer.config
+    if config.hogwild_workers > 0 or config.num_partitions > 0 or config.world_size > 1:
+        raise NotImplementedError("The batch size finder does not support Hogwild, partitioned and distributed training.")
+    if batch_sizes is None:
+        batch_sizes = [2**i for i in range(5, 31) if 2**i <= config.tot_train_triples]
+
+    initial_batch_size = config.batch_size
+    model_state = snapshot(trainer.model.state_dict())
+    optimizer_state = snapshot(trainer.optimizer.state_dict())
+    rng_state = get_rng_state()
+
+    results = []
+    best = None
+    try:
+        for batch_size in sorted(batch_sizes):
+            try:
+                result = calibrate(trainer, batch_size, num_batches=num_batches)
+            except RuntimeError as e:
+                if 'out of memory' not in str(e):
+                    raise
+                _logger.info("batch size %d: out of memory" % batch_size)
+                break
+            result['fits'] = memory_cap <= 0 or result['peak_memory'] <= memory_cap
+            results.append(result)
+            _logger.info("batch size %d: %.1f triples/s, peak memory %.1f MB"
+                         % (batch_size, result['triples_per_sec'], result['peak_memory']))
+
+            if not result['fits']:
+                break
+            if best is None or result['triples_per_sec'] > best['triples_per_sec']:
+                best = result
+            elif sum(r['batch_size'] > best['batch_size'] for r in results) >= patience:
+                break
+    finally:
+        trainer.model.load_state_dict(model_state)
+        trainer.optimizer.load_state_dict(optimizer_state)
+        set_rng_state(rng_state)
+        if torch.device(config.device).type == 'cuda':
+            torch.cuda.empty_cache()
+
+    config.batch_size = best['batch_size'] if best is not None else initial_batch_size
+    if scale_learning_rate and config.batch_size != initial_batch_size:
+        ratio = config.batch_size / initial_batch_size
+        config.learning_rate *= ratio if config.optimizer == 'sgd' else math.sqrt(ratio)
+        for group in trainer.optimizer.param_groups:
+            group['lr'] = config.learning_rate
+
+    _logger.info("Using batch size %d (learning rate %g)." % (config.batch_size, config.learning_rate))
+    return {'batch_size': config.batch_size, 'learning_rate': config.learning_rate, 'results': results}
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for the resumable checkpoints of the training: the complete state of a
+Trainer (model, optimizer, epoch, RNG states, early stopper and results) is snapshotted
+in the training loop and written to disk by a background thread.
+"""
+import os
+import random
+import threading
+import queue
+import torch
+import numpy as np
+from pathlib import Path
+from pykg2vec.utils.logger import Logger
+
+CHECKPOINT_PATTERN = "checkpoint_*.pt"
+
+
+def snapshot(state):
+    """Function to copy all the tensors of a (nested) state to host memory,
+       so that the training can keep updating them while the copy is written."""
+    if isinstance(state, torch.Tensor):
+        return state.detach().to('cpu', copy=True)
+    if isinstance(state, dict):
+        return {key: snapshot(value) for key, value in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(snapshot(value) for value in state)
+    return state
+
+
+def get_rng_state():
+    """Function to get the states of the python, numpy and torch random number generators."""
+    state = {'python': random.getstate(), 'numpy': np.random.get_state(), 'torch': torch.get_rng_state()}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state):
+    """Function to restore the random number generators from the states returned by get_rng_state."""
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+def latest_checkpoint(path):
+    """Function to get the checkpoint to resume from.
+
+        Args:
+            path (str): A checkpoint file, or a directory in which the latest checkpoint is used.
+
+        Returns:
+            Path: the path of the checkpoint file.
+    """
+    path = Path(path)
+    if path.is_dir():
+        checkpoints = sorted(path.glob(CHECKPOINT_PATTERN))
+        if not checkpoints:
+            raise ValueError("No checkpoint found in %s" % path)
+        return checkpoints[-1]
+    if not path.exists():
+        raise ValueError("Cannot resume from %s" % path)
+    return path
+
+
+class CheckpointWriter:
+    """Writer saving the checkpoints on a background thread and keeping only the last ones.
+
+        write() snapshots the state on the calling thread and returns, the thread then saves
+        it to a temporary file which is renamed once complete, so a crash never leaves a
+        truncated checkpoint behind. At most one snapshot waits to be written.
+
+        Args:
+            path (Path): The directory of the checkpoints.
+            keep (int): The number of the most recent checkpoints to keep (0 keeps them all).
+
+        Examples:
+            >>> from pykg2vec.utils.checkpoint import CheckpointWriter
+            >>> writer = CheckpointWriter(config.path_tmp / 'transe' / 'checkpoints', keep=3)
+            >>> writer.write(trainer.get_checkpoint_state(epoch), epoch)
+            >>> writer.close()
+    """
+    _logger = Logger().get_logger(__name__)
+
+    def __init__(self, path, keep=3):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.keep = keep
+        self.error = None
+
+        self.queue = queue.Queue(1)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            state, epoch = item
+            try:
+                self.save(state, epoch)
+            except Exception as e:  # raised on the training thread by the next call.
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def _check(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError("Writing the checkpoint failed: %s" % error)
+
+    def save(self, state, epoch):
+        """Function to save a checkpoint and remove the old ones (run by the writer thread)."""
+        checkpoint_path = self.path / ("checkpoint_%06d.pt" % epoch)
+        tmp_path = checkpoint_path.with_suffix('.tmp')
+        torch.save(state, str(tmp_path))
+        os.replace(str(tmp_path), str(checkpoint_path))
+        self._logger.info("Saved the checkpoint of epoch %d to %s" % (epoch, checkpoint_path))
+
+        if self.keep > 0:
+            for old_path in sorted(self.path.glob(CHECKPOINT_PATTERN))[:-self.keep]:
+                old_path.unlink()
+
+    def write(self, state, epoch):
+        """Function to snapshot a state and queue it to be saved as the checkpoint of an epoch."""
+        self._check()
+        self.queue.put((snapshot(state), epoch))
+
+    def wait(self):
+        """Function to wait until all the queued checkpoints are saved."""
+        self.queue.join()
+        self._check()
+
+    def close(self):
+        """Function to save the queued checkpoints and stop the writer thread."""
+        self.queue.put(None)
+        self.thread.join()
+        self._check()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for the 1-N binary cross entropy of the projection models (ConvE, TuckER)
+computed chunk by chunk of entities: neither the [b, tot_entity] logits nor the label matrix
+are materialized, so the memory of the loss does not grow with the number of entities.
+"""
+import torch
+import torch.nn.functional as F
+
+
+class ChunkedSoftplusSum(torch.autograd.Function):
+    """Autograd function summing softplus(x @ weight^T + bias) over chunks of the rows of weight.
+
+        The forward pass keeps one [b, chunk_size] block of logits at a time and the backward
+        pass recomputes every block to accumulate the gradients of x, weight and bias.
+    """
+
+    @staticmethod
+    def forward(ctx, x, weight, bias, chunk_size):
+        ctx.save_for_backward(x, weight, bias)
+        ctx.chunk_size = chunk_size
+
+        total = x.new_zeros((), dtype=torch.float32)
+        for start in range(0, weight.shape[0], chunk_size):
+            total += F.softplus(ChunkedSoftplusSum.logits(x, weight, bias, start, chunk_size)).sum()
+        return total
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        x, weight, bias = ctx.saved_tensors
+        chunk_size = ctx.chunk_size
+
+        grad_x = torch.zeros_like(x, dtype=torch.float32)
+        grad_weight = torch.zeros_like(weight, dtype=torch.float32)
+        grad_bias = torch.zeros_like(bias, dtype=torch.float32) if bias is not None else None
+        for start in range(0, weight.shape[0], chunk_size):
+            # d softplus(z) / dz = sigmoid(z)
+            grad_logits = torch.sigmoid(ChunkedSoftplusSum.logits(x, weight, bias, start, chunk_size)) * grad_output
+            grad_x += torch.matmul(grad_logits, weight[start:start + chunk_size].float())
+            grad_weight[start:start + chunk_size] = torch.matmul(grad_logits.t(), x.float())
+            if grad_bias is not None:
+                grad_bias[start:start + chunk_size] = grad_logits.sum(0)
+
+        return (grad_x.to(x.dtype), grad_weight.to(weight.dtype),
+                grad_bias.to(bias.dtype) if grad_bias is not None else None, None)
+
+    @staticmethod
+    def logits(x, weight, bias, start, chunk_size):
+        """Function to get the [b, chunk_size] logits of the entities start to start + chunk_size, in fp32."""
+        logits = torch.matmul(x.float(), weight[start:start + chunk_size].float().t())
+        if bias is not None:
+            logits = logits + bias[start:start + chunk_size].float()
+        return logits
+
+
+def chunked_one_to_n_loss(x, weight, bias, labels, label_smoothing=0.0, chunk_size=4096):
+    """Function to get the mean 1-N binary cross entropy of projections against every entity, chunk by chunk.
+
+        The labels are the known entities of every row, smoothed into y * (1 - label_smoothing) + 1 / tot_entity
+        as the dense labels of the projection models. With z the logits, the sum of the binary cross entropy
+        softplus(z) - y * z splits into the sum of softplus(z), computed by chunks of entities, and the
+        linear terms, computed analytically from the positive logits and the sum of the rows of weight.
+
+        Args:
+            x (Tensor): The [b, k] projections of the queries (e.g. ConvE.project).
+            weight (Tensor): The [tot_entity, k] weight of the output layer.
+            bias (Tensor): The [tot_entity] bias of the output layer, or None.
+            labels (Tensor): Flat indices row * tot_entity + entity of the known entities of every row.
+            label_smoothing (float): The label smoothing of the projection models.
+            chunk_size (int): The number of entities scored at a time.
+
+        Returns:
+            Tensor: the binary cross entropy averaged over the [b, tot_entity] labels.
+
+        Examples:
+            >>> from pykg2vec.utils.chunked_loss import chunked_one_to_n_loss
+            >>> weight, bias = model.output_layer()
+            >>> loss = chunked_one_to_n_loss(model.project(h, r, direction="tail"), weight, bias, hr_t, 0.1)
+    """
+    num_rows = x.shape[0]
+    tot_entity = weight.shape[0]
+
+    softplus_sum = ChunkedSoftplusSum.apply(x, weight, bias, chunk_size)
+
+    rows = torch.div(labels, tot_entity, rounding_mode='floor')
+    entities = labels % tot_entity
+    positive_logits = (x[rows].float() * weight[entities].float()).sum(-1)
+    if bias is not None:
+        positive_logits = positive_logits + bias[entities].float()
+
+    # the sum of all the logits, every label gets 1 / tot_entity.
+    logits_sum = torch.matmul(x.float().sum(0), weight.float().sum(0))
+    if bias is not None:
+        logits_sum = logits_sum + num_rows * bias.float().sum()
+
+    loss = softplus_sum - (1.0 - label_smoothing) * positive_logits.sum() - logits_sum / tot_entity
+    return loss / (num_rows * tot_entity)
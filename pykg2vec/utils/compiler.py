@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for the compiled training mode: the forward pass of the model and the
+loss of a training strategy are captured by torch.compile as one graph, so that the
+many small element-wise ops of the steps are fused and run without the Python overhead.
+"""
+import torch
+from pykg2vec.utils.logger import Logger
+
+
+class CompiledStep:
+    """Train step function compiled with torch.compile, falling back to eager execution.
+
+        If torch.compile is not available, or if compiling or running the compiled
+        function fails (e.g. an op not supported by the compiler), a warning is logged
+        and the step runs eagerly from then on.
+
+        Args:
+            step (callable): The train step function (e.g. Trainer.train_step_pairwise).
+            mode (str): The torch.compile mode: default, reduce-overhead or max-autotune.
+
+        Examples:
+            >>> from pykg2vec.utils.compiler import CompiledStep
+            >>> step = CompiledStep(trainer.train_step_pairwise, 'default')
+            >>> loss = step(pos_h, pos_r, pos_t, neg_h, neg_r, neg_t)
+    """
+    _logger = Logger().get_logger(__name__)
+
+    def __init__(self, step, mode='default'):
+        self.step = step
+        self.compiled_step = None
+        self.is_compiled = False
+
+        if not hasattr(torch, 'compile'):
+            self._logger.warning("torch.compile is not available, %s runs eagerly." % step.__name__)
+            return
+
+        try:
+            self.compiled_step = torch.compile(step, mode=mode)
+            self.is_compiled = True
+        except Exception as e:
+            self._logger.warning("Cannot compile %s, it runs eagerly: %s" % (step.__name__, e))
+
+    def __call__(self, *args):
+        if self.is_compiled:
+            try:
+                return self.compiled_step(*args)
+            except Exception as e:
+                self.is_compiled = False
+                self._logger.warning("The compiled %s failed, it runs eagerly from now on: %s" % (self.step.__name__, e))
+        return self.step(*args)
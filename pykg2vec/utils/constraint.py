@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for the constraint projection mode of the translational models: instead of
+normalizing the looked-up embeddings on every forward, the tables are kept at unit norm
+(or inside the unit ball) by renormalizing the rows touched by every optimizer step.
+"""
+import torch
+import torch.optim as optim
+from pykg2vec.utils.optimizer import MultiOptimizer
+
+
+def project_rows(weight, rows, constraint):
+    """Function to project rows of an embedding table onto the unit sphere or into the unit ball.
+
+        Args:
+            weight (Tensor): The weight of the embedding table.
+            rows (Tensor): The ids of the rows to project, None for the whole table.
+            constraint (str): unit (the rows get unit norm) or max (the rows longer than 1 are scaled down).
+    """
+    with torch.no_grad():
+        values = weight if rows is None else weight[rows]
+        # the same eps as F.normalize.
+        norms = values.norm(p=2, dim=-1, keepdim=True).clamp_min(1.0 if constraint == 'max' else 1e-12)
+        if rows is None:
+            weight.div_(norms)
+        else:
+            weight[rows] = values / norms
+
+
+class ConstraintProjector:
+    """Projector keeping the constrained tables of a model normalized.
+
+        The rows of the tables returned by model.get_constrained_tables() are renormalized after
+        every optimizer step, so that the forward passes (and the evaluation against all the
+        entities) read pre-normalized tables. The sparse optimizers (sparse_grad) and plain SGD
+        only move the entities and the relations of the batch, which are the only rows projected,
+        the other optimizers move every row with non-zero moments and the whole tables are projected.
+
+        Args:
+            model (object): KGE model, switched to the constraint projection mode.
+            config (object): Configuration object (uses constraint, tot_entity and neg_pool_size).
+
+        Examples:
+            >>> from pykg2vec.utils.constraint import ConstraintProjector
+            >>> projector = ConstraintProjector(model, config)
+            >>> projector.project()
+            >>> trainer.optimizer.step()
+            >>> projector.project_step(data, trainer.optimizer)
+    """
+
+    def __init__(self, model, config):
+        self.model = model
+        self.config = config
+        self.constraint = config.constraint
+        model.constraint = config.constraint
+
+    @property
+    def tables(self):
+        """The constrained tables, looked up on every call as the model may rebuild them (load_model, online growth)."""
+        return self.model.get_constrained_tables()
+
+    def project(self):
+        """Function to project all the rows of the constrained tables."""
+        for table in self.tables:
+            project_rows(table.weight, None, self.constraint)
+
+    def project_step(self, data, optimizer):
+        """Function to project the rows of the constrained tables moved by an optimizer step on a staged batch."""
+        if isinstance(optimizer, (MultiOptimizer, optim.SGD)):
+            self.project_batch(data)
+        else:
+            self.project()
+
+    def project_batch(self, data):
+        """Function to project the rows of the constrained tables touched by a staged batch."""
+        tables = self.tables
+        if not tables:
+            return
+
+        if len(data) == 6:
+            # pos_h, pos_r, pos_t, neg_h, neg_r, neg_t
+            entities = torch.cat([data[0], data[2], data[3], data[5]])
+            relations = torch.cat([data[1], data[4]])
+        else:
+            # h, r, t and the shared negatives (or the labels of the pointwise training).
+            entities = torch.cat([data[0], data[2]] + ([data[3].reshape(-1)] if self.config.neg_pool_size > 0 else []))
+            relations = data[1]
+
+        entity_tables = {id(table) for table in self.model.get_embedding_tables()['entity']}
+        for table in tables:
+            rows = entities if id(table) in entity_tables else relations
+            project_rows(table.weight, rows, self.constraint)
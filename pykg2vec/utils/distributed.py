@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for data-parallel distributed training over torch.distributed with
+the gloo backend: every rank trains on its own shard of the training triples, the
+gradients are averaged after every step and the evaluation is sharded across the ranks.
+"""
+import socket
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from pykg2vec.utils.logger import Logger
+
+_logger = Logger().get_logger(__name__)
+
+
+def is_distributed():
+    """Function to check if the process belongs to an initialized process group."""
+    return dist.is_available() and dist.is_initialized()
+
+
+def get_rank():
+    """Function to get the rank of the process (0 if not distributed)."""
+    return dist.get_rank() if is_distributed() else 0
+
+
+def get_world_size():
+    """Function to get the number of processes in the group (1 if not distributed)."""
+    return dist.get_world_size() if is_distributed() else 1
+
+
+def is_main_process():
+    """Function to check if the process is in charge of the checkpoints and the result files."""
+    return get_rank() == 0
+
+
+def init_distributed(config):
+    """Function to join the gloo process group and to select the shard of the triples of this rank.
+
+        Args:
+            config (object): Configuration object (uses world_size, rank and init_method).
+    """
+    if not is_distributed():
+        dist.init_process_group('gloo', init_method=config.init_method,
+                                rank=config.rank, world_size=config.world_size)
+        _logger.info("Joined the process group as rank %d of %d." % (config.rank, config.world_size))
+
+    config.shard_id = get_rank()
+    config.num_shards = get_world_size()
+
+
+def broadcast_parameters(model):
+    """Function to make every rank start from the parameters of rank 0."""
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        dist.broadcast(tensor.data, 0)
+
+
+def all_reduce_gradients(model):
+    """Function to average the gradients of a model over all the ranks.
+
+        The dense gradients are flattened into a single buffer reduced in one call. The sparse
+        gradients of the embedding tables are coalesced and reduced as sparse tensors, so only
+        the rows touched by the batches of the ranks are exchanged.
+        A parameter without a gradient on any rank (e.g. a table not used by the batches)
+        keeps grad None, so that the optimizers skip it as in the single process training.
+        A gradient missing on some of the ranks only is reduced as zeros.
+
+        Args:
+            model (object): KGE model after the backward pass.
+    """
+    world_size = get_world_size()
+    sparse_params = {id(table.weight) for tables in model.get_embedding_tables().values() for table in tables if table.sparse}
+
+    params = [p for p in model.parameters() if p.requires_grad]
+    # the number of ranks holding a gradient of every parameter.
+    has_grad = torch.tensor([float(p.grad is not None) for p in params])
+    dist.all_reduce(has_grad)
+
+    dense_params = []
+    for p, num_grads in zip(params, has_grad.tolist()):
+        if num_grads == 0:
+            continue
+
+        if id(p) in sparse_params:
+            grad = p.grad
+            if grad is None:
+                grad = torch.sparse_coo_tensor(torch.zeros((1, 0), dtype=torch.long, device=p.device),
+                                               torch.zeros((0,) + p.shape[1:], dtype=p.dtype, device=p.device), p.shape)
+            elif not grad.is_sparse:
+                grad = grad.to_sparse(sparse_dim=1)
+            grad = grad.coalesce()
+            dist.all_reduce(grad)
+            p.grad = grad.coalesce() / world_size
+        else:
+            if p.grad is None:
+                p.grad = torch.zeros_like(p)
+            elif p.grad.is_sparse:
+                p.grad = p.grad.to_dense()
+            dense_params.append(p)
+
+    if dense_params:
+        flat = torch.cat([p.grad.view(-1) for p in dense_params])
+        dist.all_reduce(flat)
+        flat /= world_size
+
+        offset = 0
+        for p in dense_params:
+            p.grad.copy_(flat[offset:offset + p.numel()].view_as(p.grad))
+            offset += p.numel()
+
+
+def all_reduce_sum(value):
+    """Function to sum a python number over all the ranks."""
+    tensor = torch.tensor(float(value), dtype=torch.float64)
+    dist.all_reduce(tensor)
+    return tensor.item()
+
+
+def all_gather_lists(values):
+    """Function to concatenate the python lists held by all the ranks, in the order of the ranks."""
+    gathered = [None] * get_world_size()
+    dist.all_gather_object(gathered, values)
+    return [value for rank_values in gathered for value in rank_values]
+
+
+def _local_worker(rank, fn, world_size, init_method, args):
+    fn(rank, world_size, init_method, *args)
+
+
+def launch_local(fn, world_size, args=(), start_method='fork'):
+    """Function to run a distributed job with world_size processes on the local machine.
+
+        Every process calls fn(rank, world_size, init_method, *args), where init_method is a
+        tcp:// address on a free local port which can be given to the Config (-im).
+
+        Args:
+            fn (callable): Function run by every rank.
+            world_size (int): The number of processes.
+            args (tuple): The extra arguments of fn.
+            start_method (str): The multiprocessing start method.
+
+        Examples:
+            >>> from pykg2vec.utils.distributed import launch_local
+            >>> def main(rank, world_size, init_method):
+            >>>     args = KGEArgParser().get_args(['-mn', 'TransE', '-ws', str(world_size),
+            >>>                                     '-rk', str(rank), '-im', init_method])
+            >>>     ...
+            >>> launch_local(main, 2)
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    init_method = "tcp://127.0.0.1:%d" % port
+
+    mp.start_processes(_local_worker, args=(fn, world_size, init_method, args),
+                       nprocs=world_size, start_method=start_method)
@@ -9,6 +9,9 @@ import torch
 import numpy as np
 import pandas as pd
 from pykg2vec.utils.logger import Logger
+from pykg2vec.utils.precision import autocast
+from pykg2vec.utils.profiler import build_profiler, record
+from pykg2vec.utils.distributed import is_distributed, get_rank, get_world_size, is_main_process, all_gather_lists
 from tqdm import tqdm
 
 
@@ -51,6 +54,14 @@ class MetricCalculator:
         self.epoch = None
         self.start_time = timeit.default_timer()
 
+    def gather(self, epoch):
+        """Function to collect the ranks computed by all the processes of a distributed evaluation."""
+        self.rank_head = all_gather_lists(self.rank_head)
+        self.rank_tail = all_gather_lists(self.rank_tail)
+        self.f_rank_head = all_gather_lists(self.f_rank_head)
+        self.f_rank_tail = all_gather_lists(self.f_rank_tail)
+        self.epoch = epoch
+
     def append_result(self, result):
         predict_tail = result[0]
         predict_head = result[1]
@@ -245,6 +256,8 @@ class Evaluator:
         self.test_data = self.config.knowledge_graph.read_cache_data('triplets_test')
         self.eval_data = self.config.knowledge_graph.read_cache_data('triplets_valid')
         self.metric_calculator = MetricCalculator(self.config)
+        # set by the Trainer to the PartitionedTrainer holding the entity tables on disk.
+        self.partitions = None
 
     def test_tail_rank(self, h, r, topk=-1):
         if hasattr(self.model, 'predict_tail_rank'):
@@ -260,6 +273,10 @@ class Evaluator:
         return rank
 
     def test_head_rank(self, r, t, topk=-1):
+        if self.config.reciprocal:
+            # (?, r, t) is the tail query (t, r^-1, ?) of the inverse relation.
+            return self.test_tail_rank(t, r + self.config.tot_relation // 2, topk=topk)
+
         if hasattr(self.model, 'predict_head_rank'):
             rank = self.model.predict_head_rank(torch.LongTensor([t]), torch.LongTensor([r]), topk=topk)
             return rank.squeeze(0)
@@ -278,9 +295,11 @@ class Evaluator:
             rank = self.model.predict_rel_rank(h, t, topk=topk)
             return rank.squeeze(0)
 
-        h_batch = torch.LongTensor([h]).repeat([self.config.tot_relation]).to(self.config.device)
-        rel_array = torch.LongTensor(list(range(self.config.tot_relation))).to(self.config.device)
-        t_batch = torch.LongTensor([t]).repeat([self.config.tot_relation]).to(self.config.device)
+        # the inverse relations are not candidates.
+        tot_relation = self.config.tot_relation // 2 if self.config.reciprocal else self.config.tot_relation
+        h_batch = torch.LongTensor([h]).repeat([tot_relation]).to(self.config.device)
+        rel_array = torch.LongTensor(list(range(tot_relation))).to(self.config.device)
+        t_batch = torch.LongTensor([t]).repeat([tot_relation]).to(self.config.device)
 
         preds = self.model.forward(h_batch, rel_array, t_batch)
         _, rank = torch.topk(preds, k=topk)
@@ -305,26 +324,50 @@ class Evaluator:
         self._logger.info("Full-Testing on [%d/%d] Triples in the test set." % (tot_valid_to_test, len(self.test_data)))
         return self.test(self.test_data, tot_valid_to_test, epoch=epoch)
 
-    def test(self, data, num_of_test, epoch=None):
+    def rank_triples(self, data, num_of_test, epoch=None):
+        """Function to rank the heads and tails of the first num_of_test triples of data and to settle the metrics."""
         self.metric_calculator.reset()
 
-        progress_bar = tqdm(range(num_of_test))
-        for i in progress_bar:
-            h, r, t = data[i].h, data[i].r, data[i].t
+        if self.partitions is not None:
+            # the entity tables only hold the resident partitions.
+            with record('rank'):
+                self.partitions.rank_triples(data[:num_of_test], self.metric_calculator)
+            self.metric_calculator.epoch = epoch
+            self.metric_calculator.settle()
+            return
+
+        # in distributed training every rank evaluates its own stride of the triples.
+        progress_bar = tqdm(range(get_rank(), num_of_test, get_world_size()))
+        with build_profiler(self.config, 'eval', epoch, self.model.model_name) as profiler:
+            for i in progress_bar:
+                h, r, t = data[i].h, data[i].r, data[i].t
+
+                # generate head batch and predict heads.
+                h_tensor = torch.LongTensor([h]).to(self.config.device)
+                r_tensor = torch.LongTensor([r]).to(self.config.device)
+                t_tensor = torch.LongTensor([t]).to(self.config.device)
 
-            # generate head batch and predict heads.
-            h_tensor = torch.LongTensor([h]).to(self.config.device)
-            r_tensor = torch.LongTensor([r]).to(self.config.device)
-            t_tensor = torch.LongTensor([t]).to(self.config.device)
+                with record('rank'), autocast(self.config):
+                    hrank = self.test_head_rank(r_tensor, t_tensor, self.config.tot_entity)
+                    trank = self.test_tail_rank(h_tensor, r_tensor, self.config.tot_entity)
 
-            hrank = self.test_head_rank(r_tensor, t_tensor, self.config.tot_entity)
-            trank = self.test_tail_rank(h_tensor, r_tensor, self.config.tot_entity)
+                result_data = [trank.cpu().numpy(), hrank.cpu().numpy(), h, r, t, epoch]
 
-            result_data = [trank.cpu().numpy(), hrank.cpu().numpy(), h, r, t, epoch]
+                with record('filter'):
+                    self.metric_calculator.append_result(result_data)
 
-            self.metric_calculator.append_result(result_data)
+                profiler.step()
+
+        if is_distributed():
+            self.metric_calculator.gather(epoch)
 
         self.metric_calculator.settle()
+
+    def test(self, data, num_of_test, epoch=None):
+        self.rank_triples(data, num_of_test, epoch=epoch)
+
+        if not is_main_process():
+            return self.metric_calculator.get_curr_scores()
         self.metric_calculator.display_summary()
 
         if self.metric_calculator.epoch >= self.config.epochs - 1:
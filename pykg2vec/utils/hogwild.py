@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for Hogwild! style training on CPU: several trainer processes
+update the parameters of one model living in shared memory, without locks.
+"""
+import os
+import queue
+import traceback
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from pykg2vec.utils.optimizer import build_sparse_optimizer
+from pykg2vec.utils.resources import pin
+from pykg2vec.utils.logger import Logger
+
+
+def hogwild_worker(worker_id, model, config, command_queue, result_queue, seed, num_threads):
+    """Function run by every Hogwild trainer process.
+
+        The worker trains on its own shard of the training triples with its own in-process
+        sampler and its own (sparse) optimizer state, and reports the loss and the telemetry
+        counters of every epoch.
+
+        Args:
+            worker_id (int): Index of the worker, also the index of its shard.
+            model (object): KGE model whose parameters are in shared memory.
+            config (object): Configuration object.
+            command_queue (Queue): Queue to receive the epoch to train (None to quit).
+            result_queue (Queue): Queue to send back the losses and the telemetry (or the traceback of a failure).
+            seed (int): Base seed, offset by the worker id.
+            num_threads (int): The number of intra-op threads of the worker.
+    """
+    from pykg2vec.utils.trainer import Trainer
+
+    torch.set_num_threads(num_threads)
+    np.random.seed(seed + worker_id)
+    torch.manual_seed(seed + worker_id)
+
+    config.shard_id = worker_id
+    config.num_shards = config.hogwild_workers
+    config.hogwild_workers = 0
+    config.data_loader = 'map'
+    config.num_process_gen = 0
+
+    try:
+        trainer = Trainer(model, config)
+        trainer.optimizer = build_sparse_optimizer(model, config)
+        trainer.generator = trainer.create_generator()
+    except Exception:
+        result_queue.put(traceback.format_exc())
+        return
+
+    while True:
+        epoch_idx = command_queue.get()
+        if epoch_idx is None:
+            return
+        try:
+            loss = trainer.train_model_epoch(epoch_idx, tuning=True)
+            result_queue.put((loss, trainer.telemetry.counters()))
+        except Exception:
+            result_queue.put(traceback.format_exc())
+
+
+class HogwildTrainer:
+    """Pool of trainer processes sharing the model parameters (Hogwild!).
+
+        The parameters are moved to shared memory and config.hogwild_workers processes train
+        on disjoint shards of the triples, applying sparse updates to the embedding tables
+        without any locking. The calling process stays the coordinator: it starts the epochs
+        and runs the evaluation and the early stopping between them. The optimizer states
+        live in the workers, so the training cannot be checkpointed and resumed.
+
+        Args:
+            model (object): KGE model.
+            config (object): Configuration object (uses hogwild_workers, cpu_budget and resource_plan).
+
+        Examples:
+            >>> from pykg2vec.utils.hogwild import HogwildTrainer
+            >>> workers = HogwildTrainer(model, config)
+            >>> loss = workers.train_epoch(0)
+            >>> workers.stop()
+    """
+    _logger = Logger().get_logger(__name__)
+
+    def __init__(self, model, config):
+        self.model = model
+        self.num_workers = config.hogwild_workers
+
+        plan = config.resource_plan
+        if plan is not None:
+            num_threads = plan['hogwild_threads']
+        else:
+            cpu_budget = config.cpu_budget if config.cpu_budget > 0 else (os.cpu_count() or 1)
+            num_threads = max(1, cpu_budget // self.num_workers)
+        self._logger.info("Hogwild training with %d processes of %d threads each." % (self.num_workers, num_threads))
+
+        self.model.share_memory()
+
+        seed = np.random.randint(2**31 - self.num_workers)
+        self.command_queues = [mp.Queue() for _ in range(self.num_workers)]
+        self.result_queue = mp.Queue()
+        self.process_list = []
+        for worker_id in range(self.num_workers):
+            process = mp.Process(target=hogwild_worker, args=(worker_id, model, config, self.command_queues[worker_id],
+                                                              self.result_queue, seed, num_threads))
+            process.daemon = True
+            process.start()
+            if plan is not None and plan['trainer_cores']:
+                # the workers share the cores of the trainer.
+                pin(plan['trainer_cores'][worker_id * num_threads:(worker_id + 1) * num_threads] or plan['trainer_cores'], process.pid)
+            self.process_list.append(process)
+
+    def train_epoch(self, epoch_idx, telemetry=None):
+        """Function to train all the workers for one epoch.
+
+            Args:
+                epoch_idx (int): The index of the epoch.
+                telemetry (EpochTelemetry): Receives the telemetry counters of the workers, if given.
+
+            Returns:
+                float: the loss accumulated over the workers.
+        """
+        for command_queue in self.command_queues:
+            command_queue.put(epoch_idx)
+
+        acc_loss = 0
+        worker_counters = []
+        for _ in range(self.num_workers):
+            result = self.get_result()
+            if isinstance(result, str):
+                raise RuntimeError("Hogwild worker failed:\n%s" % result)
+            acc_loss += result[0]
+            worker_counters.append(result[1])
+
+        if telemetry is not None:
+            telemetry.merge_workers(worker_counters)
+
+        return acc_loss
+
+    def get_result(self, poll_interval=1.0):
+        """Function to wait for the result of a worker, raising if a worker died without sending one."""
+        while True:
+            try:
+                return self.result_queue.get(timeout=poll_interval)
+            except queue.Empty:
+                for worker_id, process in enumerate(self.process_list):
+                    if not process.is_alive():
+                        raise RuntimeError("Hogwild worker %d exited with code %s." % (worker_id, process.exitcode))
+
+    def stop(self):
+        """Function to stop all the worker process."""
+        for command_queue in self.command_queues:
+            command_queue.put(None)
+        for process in self.process_list:
+            process.join()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for training several models concurrently from one sampling stream: the
+batches of a single generator are fed to every model, each with its own optimizer,
+evaluation, early stopping and checkpoints.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+from pykg2vec.utils.telemetry import count_triples
+from pykg2vec.utils.logger import Logger
+
+# the settings which define the sampled batches, shared by all the trainers.
+SAMPLING_SETTINGS = ['batch_size', 'neg_rate', 'neg_pool_size', 'neg_chunk_size',
+                     'sampling', 'negative_distribution', 'relation_bucket', 'reciprocal', 'one_to_n', 'entity_chunk_size']
+
+
+class MultiModelTrainer:
+    """Trainer feeding identical batches from one generator to several models.
+
+        The trainers must be built (Trainer.build_model) and their models must share the
+        training strategy, the dataset and the sampling settings, as the models were built
+        (and their steps chosen) for their own settings. Every batch is trained by all the models in parallel threads
+        (the torch ops release the GIL), then every model runs its own mini-test, early
+        stopping and checkpoint for its own number of epochs; a model which stops early
+        leaves the others training.
+
+        Args:
+            trainers (list): The built Trainer of every model.
+
+        Examples:
+            >>> from pykg2vec.utils.multi_trainer import MultiModelTrainer
+            >>> trainers = [Trainer(model, config) for model, config in zip(models, configs)]
+            >>> for trainer in trainers:
+            >>>     trainer.build_model()
+            >>> MultiModelTrainer(trainers).train_model()
+    """
+    _logger = Logger().get_logger(__name__)
+
+    def __init__(self, trainers):
+        self.trainers = trainers
+        self.lead = lead = trainers[0]
+
+        for trainer in trainers:
+            config = trainer.config
+            if trainer.model.training_strategy != lead.model.training_strategy:
+                raise ValueError("%s and %s do not share the training strategy, they cannot share the batches."
+                                 % (lead.model.model_name, trainer.model.model_name))
+            if config.dataset_name != lead.config.dataset_name:
+                raise ValueError("%s and %s are not trained on the same dataset." % (lead.model.model_name, trainer.model.model_name))
+            if config.hogwild_workers > 0 or config.num_partitions > 0 or config.world_size > 1:
+                raise NotImplementedError("Hogwild, partitioned and distributed training cannot be combined with the multi-model trainer.")
+
+            for name in SAMPLING_SETTINGS:
+                if getattr(config, name) != getattr(lead.config, name):
+                    raise ValueError("%s has %s=%s but %s has %s=%s, they cannot share the batches."
+                                     % (trainer.model.model_name, name, getattr(config, name),
+                                        lead.model.model_name, name, getattr(lead.config, name)))
+
+        self.pool = ThreadPoolExecutor(max_workers=len(trainers))
+
+    def train_model_epoch(self, trainers, epoch_idx):
+        """Function to train the models for one epoch on the same batches.
+
+            Args:
+                trainers (list): The trainers still training.
+                epoch_idx (int): The index of the epoch.
+
+            Returns:
+                list: the loss accumulated by every trainer.
+        """
+        for trainer in trainers:
+            trainer.telemetry.start_epoch()
+
+        staged_batches, num_batch = self.lead.stage_epoch(epoch_idx)
+        acc_losses = [0.0] * len(trainers)
+
+        try:
+            for _ in tqdm(range(num_batch)):
+                start_time = time.perf_counter()
+                data = next(staged_batches)
+                generator_time = time.perf_counter() - start_time
+
+                losses = self.pool.map(lambda trainer: trainer.train_batch(data).item(), trainers)
+                for idx, (trainer, loss) in enumerate(zip(trainers, losses)):
+                    acc_losses[idx] += loss
+                    trainer.telemetry.add_time('generator', generator_time)
+                    trainer.telemetry.add_batch(*count_triples(data, trainer.model.training_strategy, trainer.config))
+        finally:
+            staged_batches.close()
+
+        for trainer, acc_loss in zip(trainers, acc_losses):
+            trainer.telemetry.add_time('staging', staged_batches.stage_time)
+            trainer.training_results.append([epoch_idx, acc_loss])
+
+        return acc_losses
+
+    def train_model(self):
+        """Function to train all the models.
+
+            Returns:
+                list: the index of the last trained epoch of every model.
+        """
+        generator = self.lead.create_generator()
+        start_epoch_idx = []
+        for trainer in self.trainers:
+            trainer.generator = generator
+            start_epoch_idx.append(trainer.start_training())
+
+        last_epoch_idx = [idx - 1 for idx in start_epoch_idx]
+        active = list(range(len(self.trainers)))
+        try:
+            for cur_epoch_idx in range(min(start_epoch_idx), max(trainer.config.epochs for trainer in self.trainers)):
+                # the trainers resumed from a later epoch join when the stream reaches it.
+                training = [idx for idx in active if start_epoch_idx[idx] <= cur_epoch_idx < self.trainers[idx].config.epochs]
+                if not training:
+                    continue
+                self._logger.info("Epoch[%d] of %s" % (cur_epoch_idx, ", ".join(self.trainers[idx].model.model_name for idx in training)))
+
+                self.train_model_epoch([self.trainers[idx] for idx in training], cur_epoch_idx)
+
+                for idx in training:
+                    last_epoch_idx[idx] = cur_epoch_idx
+                    if self.trainers[idx].end_epoch(cur_epoch_idx):
+                        self._logger.info("Early stop of %s." % self.trainers[idx].model.model_name)
+                        active.remove(idx)
+                if not active:
+                    break
+        finally:
+            self.lead.stop_generator()
+            self.pool.shutdown()
+
+        return [trainer.finish_training(epoch_idx) for trainer, epoch_idx in zip(self.trainers, last_epoch_idx)]
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for the online (continual) training of a trained model on a stream of new
+triples: the tables grow for the unseen entities and relations and every update trains the
+new triples mixed with replayed old ones, so the work is proportional to the delta.
+"""
+import math
+import time
+import numpy as np
+import torch
+from pykg2vec.common import TrainingStrategy
+from pykg2vec.data.generator import NegativeSampler, sample_pairwise, sample_pointwise, sample_shared
+from pykg2vec.data.staging import BatchStager
+from pykg2vec.utils.logger import Logger
+
+
+def parse_triple(line):
+    """Function to parse a tab separated line of the dataset files into a (head, relation, tail) of names, None for a blank line."""
+    line = line.strip()
+    if not line:
+        return None
+    h, r, t = line.split('\t')
+    return h.strip(), r.strip(), t.strip()
+
+
+def follow_file(path, poll_interval=1.0, idle_limit=None):
+    """Function to follow a file of tab separated triples as it grows (as tail -f).
+
+        Args:
+            path (str): The file, appended to by the producer of the new facts.
+            poll_interval (float): The time to wait for new lines at the end of the file.
+            idle_limit (int): The number of polls without new lines before stopping, None to follow forever.
+
+        Yields:
+            tuple: the (head, relation, tail) names of the new triples, None whenever
+            the end of the file is reached (so that the buffered triples get trained).
+    """
+    idle = 0
+    with open(str(path), 'r', encoding='utf-8') as fh:
+        pending = ''
+        while True:
+            line = fh.readline()
+            if line:
+                pending += line
+                if not pending.endswith('\n'):
+                    # the producer is still writing the line.
+                    continue
+                triple = parse_triple(pending)
+                pending = ''
+                idle = 0
+                if triple is not None:
+                    yield triple
+                continue
+
+            yield None
+            idle += 1
+            if idle_limit is not None and idle >= idle_limit:
+                return
+            time.sleep(poll_interval)
+
+
+class OnlineTrainer:
+    """Trainer keeping a trained model fresh on a stream of new triples.
+
+        The new triples are named as in the dataset files. Unseen entities and relations get
+        new ids, their rows are appended to the embedding tables (drawn with the spread of the
+        existing rows) and the optimizer states are extended with zeros. The new triples are
+        buffered into updates of config.online_update_size triples, every update is trained once
+        together with config.replay_ratio times as many old triples replayed from the training
+        set and the earlier updates, with the negatives of the training strategy of the model.
+
+        The mappings of the new names are kept in entity2idx and relation2idx, the cached
+        dataset is left untouched.
+
+        Args:
+            trainer (Trainer): The built (and usually trained) trainer of the model.
+
+        Examples:
+            >>> from pykg2vec.utils.online import OnlineTrainer, follow_file
+            >>> trainer.train_model()
+            >>> online_trainer = OnlineTrainer(trainer)
+            >>> online_trainer.run(follow_file('new_facts.txt'))
+    """
+    _logger = Logger().get_logger(__name__)
+
+    def __init__(self, trainer):
+        self.trainer = trainer
+        self.model = trainer.model
+        self.config = config = trainer.config
+
+        if self.model.training_strategy == TrainingStrategy.PROJECTION_BASED:
+            raise NotImplementedError("Online training does not support the projection based models.")
+        if config.hogwild_workers > 0 or config.num_partitions > 0 or config.world_size > 1:
+            raise NotImplementedError("Online training cannot be combined with Hogwild, partitioned or distributed training.")
+        if config.one_to_n is not None or config.reciprocal:
+            raise NotImplementedError("Online training does not support the 1-N training and the reciprocal relations.")
+
+        knowledge_graph = config.knowledge_graph
+        self.entity2idx = dict(knowledge_graph.read_cache_data('entity2idx'))
+        self.relation2idx = dict(knowledge_graph.read_cache_data('relation2idx'))
+        self.relation_property = dict(knowledge_graph.read_cache_data('relationproperty'))
+
+        data = knowledge_graph.read_cache_data('triplets_train')
+        self.replay_pool = [np.asarray([[t.h, t.r, t.t] for t in data], dtype=np.int64)]
+        self.num_replay = len(data)
+        self.positive_triplets = {(t.h, t.r, t.t): 1 for t in data}
+        del data
+
+        self.negative_sampler = NegativeSampler(config)
+        self.buffer = []
+        self.num_updates = 0
+
+    def add_ids(self, names, name2idx):
+        """Function to get the ids of names, giving the next ids to the unseen ones."""
+        ids = []
+        for name in names:
+            if name not in name2idx:
+                name2idx[name] = len(name2idx)
+            ids.append(name2idx[name])
+        return ids
+
+    def grow(self, tot_entity, tot_relation):
+        """Function to append rows to the entity and relation tables and to their optimizer states.
+
+            Args:
+                tot_entity (int): The new number of entities.
+                tot_relation (int): The new number of relations.
+        """
+        config = self.config
+        tables = self.model.get_embedding_tables()
+        if tot_relation > config.tot_relation and any(table.num_embeddings != config.tot_relation
+                                                      for table in tables['relation']):
+            raise NotImplementedError("Cannot add relations to the models with reciprocal relation tables.")
+
+        optimizers = getattr(self.trainer.optimizer, 'optimizers', [self.trainer.optimizer])
+        growth = [(table, tot_entity) for table in tables['entity']] + [(table, tot_relation) for table in tables['relation']]
+        for table, new_rows in growth:
+            old_rows = table.num_embeddings
+            if new_rows <= old_rows:
+                continue
+
+            weight = table.weight
+            # the same spread as the trained rows.
+            bound = weight.data.std().item() * math.sqrt(3)
+            rows = torch.empty(new_rows - old_rows, *weight.shape[1:], device=weight.device).uniform_(-bound, bound)
+            weight.data = torch.cat([weight.data, rows])
+            table.num_embeddings = new_rows
+
+            for optimizer in optimizers:
+                state = optimizer.state.get(weight, {})
+                for key, value in state.items():
+                    if isinstance(value, torch.Tensor) and value.dim() > 0 and value.shape[0] == old_rows:
+                        state[key] = torch.cat([value, value.new_zeros(new_rows - old_rows, *value.shape[1:])])
+
+        self._logger.info("Grew the tables to %d entities and %d relations." % (tot_entity, tot_relation))
+        config.tot_entity = self.model.tot_entity = tot_entity
+        config.tot_relation = self.model.tot_relation = tot_relation
+        self.negative_sampler.tot_entity = tot_entity
+        if self.trainer.constraint_projector is not None:
+            self.trainer.constraint_projector.project()
+
+    def add(self, triples):
+        """Function to map new (head, relation, tail) names to ids, growing the tables for the unseen ones.
+
+            Returns:
+                array: the [n, 3] ids of the triples.
+        """
+        if not triples:
+            return np.zeros((0, 3), dtype=np.int64)
+        heads, relations, tails = zip(*triples)
+        h = self.add_ids(heads, self.entity2idx)
+        r = self.add_ids(relations, self.relation2idx)
+        t = self.add_ids(tails, self.entity2idx)
+
+        if len(self.entity2idx) > self.config.tot_entity or len(self.relation2idx) > self.config.tot_relation:
+            for relation in range(self.config.tot_relation, len(self.relation2idx)):
+                # no statistics yet for the bern sampling.
+                self.relation_property[relation] = 0.5
+            self.grow(len(self.entity2idx), len(self.relation2idx))
+
+        return np.asarray([h, r, t], dtype=np.int64).T
+
+    def sample_batch(self, pos_triples):
+        """Function to draw the negatives of a batch of positives as the Generator does."""
+        if self.config.neg_pool_size > 0:
+            return sample_shared(pos_triples, self.negative_sampler, self.config)
+        if self.model.training_strategy == TrainingStrategy.POINTWISE_BASED:
+            return sample_pointwise(pos_triples, self.positive_triplets, self.relation_property, self.negative_sampler, self.config)
+        return sample_pairwise(pos_triples, self.positive_triplets, self.relation_property, self.negative_sampler, self.config)
+
+    def update(self, triples):
+        """Function to train an update: the new triples mixed with replayed old ones.
+
+            Args:
+                triples (list): The (head, relation, tail) names of the new triples.
+
+            Returns:
+                float: the loss accumulated over the batches of the update.
+        """
+        new_triples = self.add(triples)
+        for h, r, t in new_triples:
+            self.positive_triplets[(h, r, t)] = 1
+
+        num_replayed = min(int(len(new_triples) * self.config.replay_ratio), self.num_replay)
+        replay_pool = np.concatenate(self.replay_pool)
+        replayed = replay_pool[np.random.choice(len(replay_pool), num_replayed, replace=False)]
+
+        pos_triples = np.concatenate([new_triples, replayed])
+        pos_triples = pos_triples[np.random.permutation(len(pos_triples))]
+
+        batch_size = self.config.batch_size
+        num_batch = (len(pos_triples) + batch_size - 1) // batch_size
+        batches = (self.sample_batch(pos_triples[i:i + batch_size]) for i in range(0, len(pos_triples), batch_size))
+
+        acc_loss = 0.0
+        for data in BatchStager(batches, num_batch, self.config, depth=0):
+            acc_loss += self.trainer.train_batch(data).item()
+
+        self.replay_pool.append(new_triples)
+        self.num_replay += len(new_triples)
+        self.num_updates += 1
+        self._logger.info("Update %d: %d new and %d replayed triples, loss %f"
+                          % (self.num_updates, len(new_triples), num_replayed, acc_loss))
+        return acc_loss
+
+    def run(self, stream):
+        """Function to train on a stream of new triples until it ends.
+
+            Args:
+                stream (iterable): (head, relation, tail) names of the new triples, None to flush
+                    the buffered triples into an update (as yielded by follow_file).
+
+            Returns:
+                list: the loss of every update.
+        """
+        losses = []
+        for triple in stream:
+            if triple is not None:
+                self.buffer.append(triple)
+            if self.buffer and (triple is None or len(self.buffer) >= self.config.online_update_size):
+                losses.append(self.update(self.buffer))
+                self.buffer = []
+
+        if self.buffer:
+            losses.append(self.update(self.buffer))
+            self.buffer = []
+
+        return losses
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module provides the optimizers used by the sparse-gradient training mode,
+in which the embedding tables receive sparse gradients and only the rows touched
+by a batch (and their optimizer state) are updated.
+"""
+import torch
+import torch.optim as optim
+from torch.optim import Optimizer
+
+
+class RowAdagrad(Optimizer):
+    """Row-wise Adagrad keeping a single accumulator per embedding row (as in PyTorch-BigGraph).
+
+        Args:
+            params (iterable): The embedding tables to optimize.
+            lr (float): Learning rate.
+            eps (float): Term added to the denominator for numerical stability.
+    """
+
+    def __init__(self, params, lr=0.01, eps=1e-10):
+        defaults = dict(lr=lr, eps=eps)
+        super(RowAdagrad, self).__init__(params, defaults)
+
+    @torch.no_grad()
+    def step(self, closure=None):
+        loss = None
+        if closure is not None:
+            with torch.enable_grad():
+                loss = closure()
+
+        for group in self.param_groups:
+            for p in group['params']:
+                if p.grad is None:
+                    continue
+
+                state = self.state[p]
+                if len(state) == 0:
+                    state['sum'] = torch.zeros(p.shape[0], dtype=p.dtype, device=p.device)
+
+                grad = p.grad
+                if grad.is_sparse:
+                    grad = grad.coalesce()
+                    rows = grad.indices()[0]
+                    values = grad.values()
+                else:
+                    rows = torch.arange(p.shape[0], device=p.device)
+                    values = grad
+
+                state['sum'].index_add_(0, rows, values.pow(2).view(values.shape[0], -1).mean(1))
+                std = state['sum'][rows].sqrt().add_(group['eps'])
+                p.index_add_(0, rows, values / std.view(-1, *([1] * (values.dim() - 1))) * -group['lr'])
+
+        return loss
+
+
+class MultiOptimizer:
+    """Optimizer stepping a sparse optimizer for the embedding tables and a dense one for the other layers.
+
+        The gradients of the tables that come out dense (e.g. from a regularizer over the whole
+        weight) are converted to row-sparse gradients before the sparse optimizer steps.
+
+        Args:
+            sparse_optimizer (Optimizer): Optimizer of the embedding tables.
+            dense_optimizer (Optimizer): Optimizer of the dense layers, None if the model has none.
+    """
+
+    def __init__(self, sparse_optimizer, dense_optimizer=None):
+        self.sparse_optimizer = sparse_optimizer
+        self.dense_optimizer = dense_optimizer
+        self.optimizers = [o for o in [sparse_optimizer, dense_optimizer] if o is not None]
+
+    @property
+    def param_groups(self):
+        return [group for o in self.optimizers for group in o.param_groups]
+
+    def zero_grad(self, set_to_none=True):
+        for o in self.optimizers:
+            o.zero_grad(set_to_none=set_to_none)
+
+    def step(self):
+        for group in self.sparse_optimizer.param_groups:
+            for p in group['params']:
+                if p.grad is not None and not p.grad.is_sparse:
+                    p.grad = p.grad.to_sparse(sparse_dim=1)
+        for o in self.optimizers:
+            o.step()
+
+    def state_dict(self):
+        return {'optimizers': [o.state_dict() for o in self.optimizers]}
+
+    def load_state_dict(self, state_dict):
+        for o, state in zip(self.optimizers, state_dict['optimizers']):
+            o.load_state_dict(state)
+
+
+def build_sparse_optimizer(model, config):
+    """Function to switch the embedding tables of a model to sparse gradients and build their optimizers.
+
+        The tables (model.get_embedding_tables()) are optimized by SparseAdam (adam), RowAdagrad (adagrad)
+        or SGD (sgd) which all update only the rows present in the gradient, the dense layers keep the
+        dense optimizer.
+
+        Args:
+            model (object): KGE model.
+            config (object): Configuration object (uses optimizer and learning_rate).
+
+        Returns:
+            MultiOptimizer: the optimizer to be used by the Trainer.
+    """
+    tables = [table for tables in model.get_embedding_tables().values() for table in tables]
+    for table in tables:
+        table.sparse = True
+
+    table_params = [table.weight for table in tables]
+    table_ids = {id(p) for p in table_params}
+    dense_params = [p for p in model.parameters() if id(p) not in table_ids]
+
+    if config.optimizer == "adam":
+        sparse_optimizer = optim.SparseAdam(table_params, lr=config.learning_rate)
+        dense_optimizer = optim.Adam
+    elif config.optimizer == "adagrad":
+        sparse_optimizer = RowAdagrad(table_params, lr=config.learning_rate)
+        dense_optimizer = optim.Adagrad
+    elif config.optimizer == "sgd":
+        sparse_optimizer = optim.SGD(table_params, lr=config.learning_rate)
+        dense_optimizer = optim.SGD
+    else:
+        raise NotImplementedError("No sparse support for %s optimizer" % config.optimizer)
+
+    if dense_params:
+        return MultiOptimizer(sparse_optimizer, dense_optimizer(dense_params, lr=config.learning_rate))
+    return MultiOptimizer(sparse_optimizer)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for partitioned (out-of-core) training as in PyTorch-BigGraph: the entity
+embeddings and their optimizer state are split into partitions stored on disk, the training
+triples are bucketed by the partitions of their head and tail, and only the two partitions
+of the current bucket are resident in memory.
+"""
+import os
+import math
+import shutil
+import numpy as np
+import torch
+import torch.optim as optim
+from pykg2vec.common import TrainingStrategy
+from pykg2vec.data.generator import read_train_triples
+from pykg2vec.utils.optimizer import RowAdagrad, MultiOptimizer
+from pykg2vec.utils.precision import autocast
+from pykg2vec.utils.logger import Logger
+
+
+def partition_capacity(tot_entity, num_partitions):
+    """Function to get the number of rows of an entity partition (the largest one)."""
+    return (tot_entity + num_partitions - 1) // num_partitions
+
+
+class PartitionedTrainer:
+    """Trainer iterating over the (head partition, tail partition) buckets of the training triples.
+
+        Entity e belongs to partition e % P at row e // P, the partitions of every entity table
+        and of its RowAdagrad accumulator are memory-mapped files in path_tmp/<model>/partitions.
+        The resident entity tables hold two partitions, the triples of a bucket are trained
+        with Trainer.train_batch against pools of negatives drawn from the resident partitions
+        (scored by the model's score_tails/score_heads kernels). The relation tables and the
+        other parameters stay resident.
+
+        The full entity tables are never assembled: the model is built with entity tables of two
+        partitions (see Config.get_model_params), the partitions are initialized on disk with the
+        spread of the initial resident tables, the evaluation ranks the test triples one resident
+        pair of partitions at a time and the export reads the rows from the partition files.
+
+        Args:
+            trainer (Trainer): The trainer whose model, optimizer and train_batch are used.
+
+        Examples:
+            >>> from pykg2vec.utils.partition import PartitionedTrainer
+            >>> partitions = PartitionedTrainer(trainer)
+            >>> loss = partitions.train_epoch(0)
+            >>> partitions.rank_triples(test_triples, metric_calculator)
+    """
+    _logger = Logger().get_logger(__name__)
+
+    def __init__(self, trainer):
+        self.trainer = trainer
+        self.model = trainer.model
+        self.config = config = trainer.config
+
+        if self.model.training_strategy == TrainingStrategy.PROJECTION_BASED:
+            raise NotImplementedError("Partitioned training does not support the projection based models.")
+
+        self.num_partitions = num_partitions = config.num_partitions
+        self.capacity = partition_capacity(config.tot_entity, num_partitions)
+        self.partition_sizes = [len(range(p, config.tot_entity, num_partitions)) for p in range(num_partitions)]
+
+        tables = self.model.get_embedding_tables()
+        self.entity_tables = tables['entity']
+        for table in self.entity_tables:
+            if table.num_embeddings != 2 * self.capacity:
+                raise ValueError("The entity table %s has %d rows instead of the %d rows of two partitions, "
+                                 "build the model with config.get_model_params()." % (table.name, table.num_embeddings, 2 * self.capacity))
+        tables = tables['entity'] + tables['relation']
+        for table in tables:
+            table.sparse = True
+
+        table_ids = {id(table.weight) for table in tables}
+        dense_params = [p for p in self.model.parameters() if id(p) not in table_ids]
+        sparse_optimizer = RowAdagrad([table.weight for table in tables], lr=config.learning_rate)
+        dense_optimizer = optim.Adagrad(dense_params, lr=config.learning_rate) if dense_params else None
+        trainer.optimizer = MultiOptimizer(sparse_optimizer, dense_optimizer)
+        self.state = sparse_optimizer.state
+        self._logger.info("Partitioned training optimizes the embedding tables with RowAdagrad and the other parameters with Adagrad.")
+
+        self.path = config.path_tmp / self.model.model_name / 'partitions'
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.weight_files = []
+        self.state_files = []
+        for table in self.entity_tables:
+            # the partitions get the spread of the initialization of the model, drawn on the resident table.
+            mean = table.weight.data.mean().item()
+            bound = table.weight.data.std().item() * math.sqrt(3)
+            self.weight_files.append([self._open(table, p, 'weight', (mean - bound, mean + bound)) for p in range(num_partitions)])
+            self.state_files.append([self._open(table, p, 'state') for p in range(num_partitions)])
+            self.state[table.weight] = {'sum': torch.zeros(2 * self.capacity, device=table.weight.device)}
+
+        triples = read_train_triples(config)
+        triples = np.asarray([[t.h, t.r, t.t] for t in triples], dtype=np.int64)
+        bucket_ids = (triples[:, 0] % num_partitions) * num_partitions + triples[:, 2] % num_partitions
+        self.buckets = [triples[bucket_ids == b] for b in range(num_partitions * num_partitions)]
+
+        # partition -> slot of the resident tables.
+        self.resident = {}
+
+        self._logger.info("Partitioned training: %d partitions of %d entities, %d buckets."
+                          % (num_partitions, self.capacity, len(self.buckets)))
+
+    def _open(self, table, partition, kind, init_range=None):
+        """Function to create the file of a partition, the weights drawn uniformly from init_range and the state zeroed."""
+        shape = (self.capacity,) if kind == 'state' else (self.capacity, table.embedding_dim)
+        path = self.path / ("%s_%s_%d.npy" % (table.name, kind, partition))
+        data = np.lib.format.open_memmap(str(path), mode='w+', dtype=np.float32, shape=shape)
+        data[:] = 0
+        if kind == 'weight':
+            size = self.partition_sizes[partition]
+            data[:size] = torch.empty(size, table.embedding_dim).uniform_(*init_range).numpy()
+        data.flush()
+        return data
+
+    def flush(self):
+        """Function to write the resident partitions back to their files."""
+        for partition, slot in self.resident.items():
+            self._store(partition, slot)
+
+    def _store(self, partition, slot):
+        rows = slice(slot * self.capacity, (slot + 1) * self.capacity)
+        for table, weight_files, state_files in zip(self.entity_tables, self.weight_files, self.state_files):
+            weight_files[partition][:] = table.weight.data[rows].cpu().numpy()
+            state_files[partition][:] = self.state[table.weight]['sum'][rows].cpu().numpy()
+
+    def _load(self, partition, slot):
+        rows = slice(slot * self.capacity, (slot + 1) * self.capacity)
+        for table, weight_files, state_files in zip(self.entity_tables, self.weight_files, self.state_files):
+            table.weight.data[rows] = torch.from_numpy(np.asarray(weight_files[partition]))
+            self.state[table.weight]['sum'][rows] = torch.from_numpy(np.asarray(state_files[partition]))
+
+    def swap_in(self, head_partition, tail_partition):
+        """Function to make the partitions of a bucket resident, writing back the evicted one."""
+        for partition in {head_partition, tail_partition}:
+            if partition in self.resident:
+                continue
+            used_slots = {self.resident[p] for p in {head_partition, tail_partition} if p in self.resident}
+            slot = 0 if 0 not in used_slots else 1
+            for evicted, evicted_slot in list(self.resident.items()):
+                if evicted_slot == slot:
+                    self._store(evicted, slot)
+                    del self.resident[evicted]
+            self._load(partition, slot)
+            self.resident[partition] = slot
+
+    def train_bucket(self, head_partition, tail_partition):
+        """Function to train the triples of one bucket.
+
+            Returns:
+                float: the loss accumulated over the batches of the bucket.
+        """
+        triples = self.buckets[head_partition * self.num_partitions + tail_partition]
+        if len(triples) == 0:
+            return 0.0
+
+        self.swap_in(head_partition, tail_partition)
+        head_offset = self.resident[head_partition] * self.capacity
+        tail_offset = self.resident[tail_partition] * self.capacity
+        # the local ids of the resident entities, from which the negatives are drawn.
+        candidates = np.concatenate([np.arange(self.partition_sizes[p]) + slot * self.capacity
+                                     for p, slot in self.resident.items()])
+
+        device = self.config.device
+        batch_size = self.config.batch_size
+        acc_loss = 0.0
+        triples = triples[np.random.permutation(len(triples))]
+        for batch_start in range(0, len(triples), batch_size):
+            batch = triples[batch_start:batch_start + batch_size]
+            h = torch.as_tensor(batch[:, 0] // self.num_partitions + head_offset, device=device)
+            r = torch.as_tensor(batch[:, 1], device=device)
+            t = torch.as_tensor(batch[:, 2] // self.num_partitions + tail_offset, device=device)
+
+            num_chunks = (len(batch) + self.config.neg_chunk_size - 1) // self.config.neg_chunk_size
+            neg = torch.as_tensor(candidates[np.random.randint(len(candidates), size=(num_chunks, self.config.neg_pool_size))], device=device)
+
+            acc_loss += self.trainer.train_batch([h, r, t, neg]).item()
+
+        return acc_loss
+
+    def train_epoch(self, epoch_idx):
+        """Function to train all the buckets once, the buckets sharing their head partition in a row.
+
+            Returns:
+                float: the loss accumulated over the buckets.
+        """
+        acc_loss = 0.0
+        for head_partition in np.random.permutation(self.num_partitions):
+            for tail_partition in np.random.permutation(self.num_partitions):
+                acc_loss += self.train_bucket(int(head_partition), int(tail_partition))
+        self.flush()
+
+        return acc_loss
+
+    def rank_triples(self, triples, metric_calculator):
+        """Function to rank the heads and the tails of test triples, one resident pair of partitions at a time.
+
+            Every triple gives a tail query (h, r, ?) and a head query (?, r, t), answered with the
+            inverse relation as the tail query (t, r^-1, ?) with config.reciprocal. A first sweep
+            over the buckets scores the test triples, a second one counts for every query the
+            entities of each partition scoring below the answer (as the rank of the Evaluator),
+            minus the known answers for the filtered rank.
+
+            Args:
+                triples (list): The test triples.
+                metric_calculator (MetricCalculator): Receives the ranks (and gives the known answers).
+        """
+        num_partitions = self.num_partitions
+        device = self.config.device
+        num_triples = len(triples)
+
+        tail_known = [metric_calculator.hr_t[(t.h, t.r)] for t in triples]
+        head_known = [metric_calculator.tr_h[(t.t, t.r)] for t in triples]
+        triples = np.asarray([[t.h, t.r, t.t] for t in triples], dtype=np.int64)
+        # the queries: anchor entity, relation, answer entity and direction (True to score tails).
+        anchors = np.concatenate([triples[:, 0], triples[:, 2]])
+        answers = np.concatenate([triples[:, 2], triples[:, 0]])
+        relations = np.concatenate([triples[:, 1], triples[:, 1]])
+        tails = np.arange(2 * num_triples) < num_triples
+        if self.config.reciprocal:
+            relations[num_triples:] += self.config.tot_relation // 2
+            tails[:] = True
+        known = tail_known + head_known
+
+        def local(entities, partition):
+            return torch.as_tensor(entities // num_partitions + self.resident[partition] * self.capacity, device=device)
+
+        def score(anchor, relation, candidates, to_tails):
+            anchor, relation, candidates = anchor.unsqueeze(0), relation.unsqueeze(0), candidates.unsqueeze(0)
+            if to_tails:
+                return self.model.score_tails(anchor, relation, candidates)[0]
+            return self.model.score_heads(candidates, relation, anchor)[0]
+
+        answer_scores = np.zeros(2 * num_triples, dtype=np.float32)
+        raw_ranks = np.zeros(2 * num_triples, dtype=np.int64)
+        filtered_ranks = np.zeros(2 * num_triples, dtype=np.int64)
+
+        with torch.no_grad(), autocast(self.config):
+            for anchor_partition in range(num_partitions):
+                in_anchor = anchors % num_partitions == anchor_partition
+                # the answers, with the pair of partitions of every query resident.
+                for answer_partition in range(num_partitions):
+                    ids = np.nonzero(in_anchor & (answers % num_partitions == answer_partition))[0]
+                    if len(ids) == 0:
+                        continue
+                    self.swap_in(anchor_partition, answer_partition)
+                    for to_tails in (True, False):
+                        query = ids[tails[ids] == to_tails]
+                        if len(query) == 0:
+                            continue
+                        anchor = local(anchors[query], anchor_partition)
+                        answer = local(answers[query], answer_partition)
+                        relation = torch.as_tensor(relations[query], device=device)
+                        args = (anchor, relation, answer) if to_tails else (answer, relation, anchor)
+                        answer_scores[query] = self.model.forward(*args).float().cpu().numpy()
+
+                ids = np.nonzero(in_anchor)[0]
+                if len(ids) == 0:
+                    continue
+                for partition in range(num_partitions):
+                    self.swap_in(anchor_partition, partition)
+                    candidates = local(np.arange(self.partition_sizes[partition]) * num_partitions + partition, partition)
+                    for to_tails in (True, False):
+                        query = ids[tails[ids] == to_tails]
+                        for start in range(0, len(query), self.config.batch_size):
+                            chunk = query[start:start + self.config.batch_size]
+                            scores = score(local(anchors[chunk], anchor_partition), torch.as_tensor(relations[chunk], device=device),
+                                           candidates, to_tails).float().cpu().numpy()
+                            below = scores < answer_scores[chunk, None]
+                            for row, i in enumerate(chunk):
+                                if answers[i] % num_partitions == partition:
+                                    # the answer does not rank against itself.
+                                    below[row, answers[i] // num_partitions] = False
+                                raw_ranks[i] += below[row].sum()
+                                known_ids = [e // num_partitions for e in known[i]
+                                             if e % num_partitions == partition and e != answers[i]]
+                                filtered_ranks[i] += below[row].sum() - below[row, known_ids].sum()
+
+        metric_calculator.rank_tail = raw_ranks[:num_triples].tolist()
+        metric_calculator.rank_head = raw_ranks[num_triples:].tolist()
+        metric_calculator.f_rank_tail = filtered_ranks[:num_triples].tolist()
+        metric_calculator.f_rank_head = filtered_ranks[num_triples:].tolist()
+
+    def iter_rows(self, table):
+        """Function to read the rows of an entity table from the partition files, in the order of the entity ids."""
+        self.flush()
+        weight_files = self.weight_files[[id(t) for t in self.entity_tables].index(id(table))]
+        for idx in range(self.config.tot_entity):
+            yield weight_files[idx % self.num_partitions][idx // self.num_partitions]
+
+    def save(self, path):
+        """Function to copy the entity partitions next to a saved model."""
+        self.flush()
+        path.mkdir(parents=True, exist_ok=True)
+        for weight_files in self.weight_files:
+            for data in weight_files:
+                data.flush()
+                shutil.copyfile(data.filename, str(path / os.path.basename(data.filename)))
+
+    def stop(self):
+        """Function to write back the resident partitions."""
+        self.flush()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for the reduced-precision (bfloat16) mode: the forward passes run
+under autocast so the matmuls, convolutions and the [b, tot_entity] score matrices
+are computed in bfloat16 while the parameters and the losses stay in float32.
+"""
+import timeit
+import torch
+from pykg2vec.utils.logger import Logger
+
+_logger = Logger().get_logger(__name__)
+
+
+def autocast(config):
+    """Function to get the autocast context of the forward passes, disabled unless config.precision is bf16.
+
+        Args:
+            config (object): Configuration object (uses precision and device).
+
+        Examples:
+            >>> from pykg2vec.utils.precision import autocast
+            >>> with autocast(config):
+            >>>     preds = model(h, r, t)
+    """
+    return torch.autocast(device_type=torch.device(config.device).type, dtype=torch.bfloat16,
+                          enabled=config.precision == 'bf16')
+
+
+def measure_precision_drift(model, config, num_of_test=None):
+    """Function to evaluate a model in fp32 and in bf16 and to report the drift of the metrics.
+
+        Both passes rank the same triples of the validation set, the model is not modified.
+
+        Args:
+            model (object): Trained KGE model.
+            config (object): Configuration object.
+            num_of_test (int): The number of validation triples to rank (config.test_num if None).
+
+        Returns:
+            dict: for every metric (mr, fmr, mrr, fmrr, hit1, fhit1, ...),
+            a dict holding its fp32 and bf16 values and their drift (bf16 - fp32),
+            plus the time in seconds of both passes under 'time'.
+
+        Examples:
+            >>> from pykg2vec.utils.precision import measure_precision_drift
+            >>> drift = measure_precision_drift(trainer.model, config)
+            >>> drift['fmrr']['drift']
+    """
+    from pykg2vec.utils.evaluator import Evaluator
+
+    evaluator = Evaluator(model, config, tuning=True)
+    if num_of_test is None:
+        num_of_test = config.test_num if config.test_num > 0 else len(evaluator.eval_data)
+    num_of_test = min(num_of_test, len(evaluator.eval_data))
+
+    precision = config.precision
+    calculator = evaluator.metric_calculator
+    times = {}
+    model.eval()
+    try:
+        for mode in ['fp32', 'bf16']:
+            config.precision = mode
+            start_time = timeit.default_timer()
+            # the mode is used as the "epoch" under which the calculator stores the metrics.
+            evaluator.rank_triples(evaluator.eval_data, num_of_test, epoch=mode)
+            times[mode] = timeit.default_timer() - start_time
+    finally:
+        config.precision = precision
+
+    metrics = {'mr': calculator.mr, 'fmr': calculator.fmr, 'mrr': calculator.mrr, 'fmrr': calculator.fmrr}
+    drift = {name: {mode: float(values[mode]) for mode in times} for name, values in metrics.items()}
+    for hit in config.hits:
+        drift['hit%d' % hit] = {mode: float(calculator.hit[(mode, hit)]) for mode in times}
+        drift['fhit%d' % hit] = {mode: float(calculator.fhit[(mode, hit)]) for mode in times}
+
+    logs = ["", "------Precision drift on %d validation triples------" % num_of_test]
+    for name, values in drift.items():
+        values['drift'] = values['bf16'] - values['fp32']
+        logs.append("--%-6s fp32: %.4f, bf16: %.4f, drift: %+.4f" % (name, values['fp32'], values['bf16'], values['drift']))
+    logs.append("--time   fp32: %.2fs, bf16: %.2fs" % (times['fp32'], times['bf16']))
+    _logger.info("\n".join(logs))
+
+    drift['time'] = times
+    return drift
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for profiling a window of training or evaluation steps with torch.profiler,
+the results are written to config.path_result as a Chrome trace and a summary table.
+"""
+import torch
+from contextlib import nullcontext
+from torch.profiler import profile, schedule, record_function, ProfilerActivity
+from pykg2vec.utils.logger import Logger
+
+# the named ranges are only recorded while a profiler is running.
+_profiling = False
+
+
+def record(name):
+    """Function to get a named range of the profile, a no-op context when nothing is profiled.
+
+        Examples:
+            >>> from pykg2vec.utils.profiler import record
+            >>> with record('forward'):
+            >>>     preds = model(h, r, t)
+    """
+    return record_function(name) if _profiling else nullcontext()
+
+
+class StepProfiler:
+    """Profiler of a window of steps of the training or of the evaluation.
+
+        The first config.profile_wait steps are skipped, the next config.profile_warmup
+        steps warm the profiler up and the following config.profile_steps steps are recorded,
+        with the CPU (and cuda) ops, the memory and the input shapes. Once the window is
+        over the Chrome trace and the table of the ops sorted by self CPU time are saved to
+        config.path_result as <model>_<stage>_trace_<epoch>.json and <model>_<stage>_profile_<epoch>.txt.
+
+        Args:
+            config (object): Configuration object.
+            stage (str): The profiled loop, train or eval.
+            epoch (int): The epoch of the profiled loop.
+            model_name (str): The name of the model.
+
+        Examples:
+            >>> from pykg2vec.utils.profiler import StepProfiler
+            >>> with StepProfiler(config, 'train', 0, 'transe') as profiler:
+            >>>     for data in batches:
+            >>>         trainer.train_batch(data)
+            >>>         profiler.step()
+    """
+    _logger = Logger().get_logger(__name__)
+
+    def __init__(self, config, stage, epoch, model_name):
+        self.path_result = config.path_result
+        self.file_name = "%s_%s_%%s_%s" % (model_name, stage, epoch)
+
+        activities = [ProfilerActivity.CPU]
+        if torch.device(config.device).type == 'cuda':
+            activities.append(ProfilerActivity.CUDA)
+
+        self.profiler = profile(activities=activities,
+                                schedule=schedule(wait=config.profile_wait, warmup=config.profile_warmup,
+                                                  active=config.profile_steps, repeat=1),
+                                on_trace_ready=self.save,
+                                record_shapes=True,
+                                profile_memory=True)
+
+    def __enter__(self):
+        global _profiling
+        _profiling = True
+        self.profiler.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        global _profiling
+        _profiling = False
+        return self.profiler.__exit__(*exc)
+
+    def step(self):
+        """Function to mark the end of a step."""
+        self.profiler.step()
+
+    def save(self, profiler):
+        """Function to write the trace and the summary table of the profiled window."""
+        trace_path = self.path_result / ((self.file_name % 'trace') + '.json')
+        profiler.export_chrome_trace(str(trace_path))
+
+        table = profiler.key_averages().table(sort_by="self_cpu_time_total", row_limit=30)
+        with open(str(self.path_result / ((self.file_name % 'profile') + '.txt')), 'w') as fh:
+            fh.write(table)
+
+        self._logger.info("Saved the profile to %s\n%s" % (trace_path, table))
+
+
+class NullProfiler:
+    """Profiler doing nothing, used outside of the profiled window."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def step(self):
+        pass
+
+
+def build_profiler(config, stage, epoch, model_name):
+    """Function to get the profiler of a loop, a StepProfiler if config.profile selects the stage and the epoch.
+
+        Args:
+            config (object): Configuration object (uses profile and profile_epoch).
+            stage (str): The loop, train or eval.
+            epoch (int): The epoch of the loop.
+            model_name (str): The name of the model.
+    """
+    if config.profile == stage and epoch == config.profile_epoch:
+        return StepProfiler(config, stage, epoch, model_name)
+    return NullProfiler()
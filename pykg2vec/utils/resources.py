@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for planning the use of the cores: the cpu budget is split between the
+intra-op threads of the trainer, the sampler processes and the background evaluator,
+which are optionally pinned to disjoint sets of cores, so that they do not oversubscribe
+the host.
+"""
+import os
+import torch
+from pykg2vec.utils.logger import Logger
+
+_logger = Logger().get_logger(__name__)
+
+
+def available_cores():
+    """Function to get the ids of the cores the process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def pin(cores, pid=0):
+    """Function to pin a process (the calling one by default) to cores, where the platform supports it."""
+    if cores and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(pid, cores)
+
+
+def plan_resources(config):
+    """Function to split the cpu budget between the components of the training.
+
+        The background evaluator (config.async_eval) gets a quarter of the budget. Each sampler
+        process gets one core and one intra-op thread. There are up to config.num_process_gen
+        of them, using at most half of the cores left. The trainer gets the rest, split between
+        the workers of the Hogwild training, whose samplers run in process. The distributed
+        ranks of a host share its budget. config.trainer_threads, config.sampler_processes and
+        config.eval_threads (when positive) replace the planned values.
+
+        With config.cpu_affinity every component also gets its own cores.
+
+        Args:
+            config (object): Configuration object (uses cpu_budget, num_process_gen, async_eval,
+                hogwild_workers, world_size, rank, trainer_threads, sampler_processes, eval_threads
+                and cpu_affinity).
+
+        Returns:
+            dict: the threads, processes and cores (None without affinity) of every component.
+
+        Examples:
+            >>> from pykg2vec.utils.resources import plan_resources
+            >>> config.cpu_budget = 32
+            >>> plan = plan_resources(config)
+            >>> print(plan['trainer_threads'], plan['sampler_processes'], plan['eval_threads'])
+    """
+    cores = available_cores()
+    budget = config.cpu_budget if config.cpu_budget > 0 else len(cores)
+    offset = 0
+    if config.world_size > 1:
+        budget = max(1, budget // config.world_size)
+        offset = config.rank * budget
+
+    if config.eval_threads > 0:
+        eval_threads = config.eval_threads
+    else:
+        eval_threads = max(1, budget // 4) if config.async_eval else 0
+
+    if config.hogwild_workers > 0:
+        sampler_processes = 0
+    elif config.sampler_processes > 0:
+        sampler_processes = config.sampler_processes
+    else:
+        sampler_processes = min(config.num_process_gen, max(1, (budget - eval_threads) // 2))
+
+    if config.trainer_threads > 0:
+        trainer_threads = config.trainer_threads
+    else:
+        trainer_threads = max(1, budget - eval_threads - sampler_processes)
+
+    plan = {
+        'budget': budget,
+        'trainer_threads': trainer_threads,
+        'hogwild_threads': max(1, trainer_threads // config.hogwild_workers) if config.hogwild_workers > 0 else 0,
+        'sampler_processes': sampler_processes,
+        'sampler_threads': 1,
+        'eval_threads': eval_threads,
+        'trainer_cores': None,
+        'sampler_cores': None,
+        'eval_cores': None,
+    }
+
+    num_used = trainer_threads + sampler_processes + eval_threads
+    if config.cpu_affinity:
+        # the budget wraps around the available cores if it is larger.
+        pool = [cores[(offset + i) % len(cores)] for i in range(num_used)]
+        plan['trainer_cores'] = pool[:trainer_threads]
+        plan['sampler_cores'] = pool[trainer_threads:trainer_threads + sampler_processes]
+        plan['eval_cores'] = pool[trainer_threads + sampler_processes:]
+
+    _logger.info("Resource plan for %d cores: trainer %d threads%s, %d sampler processes of %d thread, evaluator %d threads%s."
+                 % (budget, trainer_threads,
+                    " (%d per Hogwild worker)" % plan['hogwild_threads'] if config.hogwild_workers > 0 else "",
+                    sampler_processes, plan['sampler_threads'], eval_threads,
+                    ", pinned to %s" % [plan['trainer_cores'], plan['sampler_cores'], plan['eval_cores']] if config.cpu_affinity else ""))
+    if num_used > budget:
+        _logger.warning("The resource plan uses %d threads for a budget of %d cores." % (num_used, budget))
+
+    return plan
+
+
+def apply_trainer_plan(plan):
+    """Function to set the intra-op threads (and the cores) of the trainer process from a plan."""
+    torch.set_num_threads(plan['trainer_threads'])
+    pin(plan['trainer_cores'])
+
+
+def sampler_cores(plan, index):
+    """Function to get the cores of the index-th sampler process of a plan (None without affinity)."""
+    if not plan['sampler_cores']:
+        return None
+    return [plan['sampler_cores'][index % len(plan['sampler_cores'])]]
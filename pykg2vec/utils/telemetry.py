@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module is for the epoch telemetry of the training: the time spent in every stage
+of the training loop, the throughput and the occupancy of the Generator queue, appended
+after every epoch so that a run can be told sampler-bound or compute-bound at a glance.
+"""
+import json
+import os
+import time
+import pandas as pd
+from contextlib import contextmanager
+from pykg2vec.common import TrainingStrategy
+from pykg2vec.utils.logger import Logger
+
+STAGES = ['generator', 'staging', 'forward', 'loss', 'backward', 'sync', 'optimizer', 'evaluation']
+
+
+def count_triples(data, training_strategy, config):
+    """Function to count the positive and the negative triples scored by a staged batch.
+
+        Args:
+            data (list): Tensors of the batch as staged by BatchStager.
+            training_strategy (TrainingStrategy): The training strategy of the model.
+            config (object): Configuration object (uses one_to_n, reciprocal, neg_pool_size and tot_entity).
+
+        Returns:
+            tuple: the number of positive and the number of negative triples.
+    """
+    num_pos = len(data[0])
+    # with reciprocal relations the positives are only scored as tails.
+    num_directions = 1 if config.reciprocal else 2
+    if training_strategy == TrainingStrategy.PROJECTION_BASED or config.one_to_n is not None:
+        # every positive is scored against all the entities as tail and as head.
+        return num_pos, num_directions * num_pos * (config.tot_entity - 1)
+    if config.neg_pool_size > 0:
+        # every positive is scored against its pool as tails and as heads.
+        return num_pos, num_directions * num_pos * data[3].shape[-1]
+    if training_strategy == TrainingStrategy.POINTWISE_BASED:
+        num_pos = int((data[3] == 1).sum())
+        return num_pos, len(data[0]) - num_pos
+    return num_pos, len(data[3])
+
+
+class EpochTelemetry:
+    """Timers of the training stages and throughput counters, recorded per epoch.
+
+        The stages are: generator (waiting for the next batch), staging (converting and
+        moving the batches to the device, on a background thread if staging_depth > 0),
+        forward, loss, backward, sync (gradient all-reduce of the distributed training),
+        optimizer and evaluation. The rates are computed over the training time of the
+        epoch, i.e. without the evaluation. Once open() is called, the record of every epoch
+        is appended to <model>_Telemetry_<n>.csv and .jsonl in the result directory.
+
+        Examples:
+            >>> from pykg2vec.utils.telemetry import EpochTelemetry
+            >>> telemetry = EpochTelemetry()
+            >>> telemetry.open(config.path_result, 'transe')
+            >>> telemetry.start_epoch()
+            >>> with telemetry.stage('forward'):
+            >>>     loss = trainer.train_step_pairwise(*data)
+            >>> telemetry.end_epoch(0)
+    """
+    _logger = Logger().get_logger(__name__)
+
+    def __init__(self):
+        self.records = []
+        self.path_result = None
+        self.file_name = None
+        # the stages being timed, innermost last.
+        self.active = []
+        self.start_epoch()
+
+    def open(self, path_result, model_name):
+        """Function to pick the files the records of the next epochs are appended to."""
+        files = os.listdir(str(path_result))
+        l = len([f for f in files if model_name in f if 'Telemetry' in f and f.endswith('.csv')])
+        self.path_result = path_result
+        self.file_name = model_name + '_Telemetry_' + str(l)
+
+    def start_epoch(self):
+        """Function to reset the timers and the counters at the beginning of an epoch."""
+        self.times = {name: 0.0 for name in STAGES}
+        self.batches = 0
+        self.positives = 0
+        self.negatives = 0
+        self.occupancy = []
+        self.start_time = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager adding the time spent in its block to a stage.
+
+            The stages nest: the time of an inner stage (e.g. the loss of a train step timed
+            as forward) is not counted in the outer one.
+        """
+        now = time.perf_counter()
+        if self.active:
+            outer, outer_start = self.active[-1]
+            self.times[outer] += now - outer_start
+        self.active.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, start_time = self.active.pop()
+            self.times[name] += now - start_time
+            if self.active:
+                self.active[-1][1] = now
+
+    def add_time(self, name, seconds):
+        """Function to add the time measured elsewhere (e.g. on the staging thread) to a stage."""
+        self.times[name] += seconds
+
+    def add_batch(self, num_pos, num_neg, occupancy=None):
+        """Function to count a trained batch.
+
+            Args:
+                num_pos (int): The number of positive triples of the batch.
+                num_neg (int): The number of negative triples of the batch.
+                occupancy (float): The fill ratio of the Generator queue when the batch was taken, if known.
+        """
+        self.batches += 1
+        self.positives += num_pos
+        self.negatives += num_neg
+        if occupancy is not None:
+            self.occupancy.append(occupancy)
+
+    def counters(self):
+        """Function to get the stage times and the counters of the current epoch (sent by the Hogwild workers)."""
+        return {'times': dict(self.times), 'batches': self.batches, 'positives': self.positives, 'negatives': self.negatives}
+
+    def merge_workers(self, worker_counters):
+        """Function to add the counters of workers training concurrently to the current epoch.
+
+            The batches and the triples add up, the stage times are averaged over the workers
+            as they overlap in time.
+        """
+        for counters in worker_counters:
+            for name, seconds in counters['times'].items():
+                self.times[name] += seconds / len(worker_counters)
+            self.batches += counters['batches']
+            self.positives += counters['positives']
+            self.negatives += counters['negatives']
+
+    def end_epoch(self, epoch_idx, steady_state=None):
+        """Function to record the telemetry of an epoch.
+
+            Args:
+                epoch_idx (int): The index of the epoch.
+                steady_state (dict): The steady state of the Generator autotune, if any.
+
+            Returns:
+                dict: the record of the epoch.
+        """
+        elapsed = time.perf_counter() - self.start_time
+        # the rates are over the training, the mini-test is timed on its own.
+        train_time = elapsed - self.times['evaluation']
+        record = {'epoch': epoch_idx, 'time': elapsed, 'train_time': train_time}
+        for name in STAGES:
+            record['%s_time' % name] = self.times[name]
+        record['batches_per_sec'] = self.batches / train_time if train_time > 0 else 0.0
+        record['triples_per_sec'] = self.positives / train_time if train_time > 0 else 0.0
+        record['negatives_per_sec'] = self.negatives / train_time if train_time > 0 else 0.0
+        record['generator_fraction'] = self.times['generator'] / train_time if train_time > 0 else 0.0
+        record['queue_occupancy'] = sum(self.occupancy) / len(self.occupancy) if self.occupancy else None
+        if steady_state:
+            record['generator_workers'] = steady_state['workers']
+            record['prefetch_depth'] = steady_state['prefetch_depth']
+        self.records.append(record)
+        if self.file_name is not None:
+            self.append(record)
+
+        compute_time = self.times['forward'] + self.times['loss'] + self.times['backward'] + self.times['optimizer']
+        self._logger.info("Epoch %d: %.1f triples/s, %.1f negatives/s, generator %.2fs, forward %.2fs, loss %.2fs, compute %.2fs, evaluation %.2fs (%s-bound)"
+                          % (epoch_idx, record['triples_per_sec'], record['negatives_per_sec'], self.times['generator'],
+                             self.times['forward'], self.times['loss'], compute_time, self.times['evaluation'],
+                             'sampler' if self.times['generator'] > compute_time else 'compute'))
+        return record
+
+    def append(self, record):
+        """Function to append the record of an epoch to the csv and jsonl files."""
+        csv_path = self.path_result / (self.file_name + '.csv')
+        is_new = not csv_path.exists()
+        with open(str(csv_path), 'a') as fh:
+            pd.DataFrame([record]).to_csv(fh, header=is_new, index=False)
+        with open(str(self.path_result / (self.file_name + '.jsonl')), 'a') as fh:
+            fh.write(json.dumps(record) + "\n")
@@ -11,11 +11,30 @@ import pandas as pd
 
 from tqdm import tqdm
 from pathlib import Path
+from contextlib import nullcontext
+from torch.utils.data import DataLoader
 from pykg2vec.utils.evaluator import Evaluator
+from pykg2vec.utils.optimizer import build_sparse_optimizer
+from pykg2vec.utils.hogwild import HogwildTrainer
+from pykg2vec.utils.partition import PartitionedTrainer
+from pykg2vec.utils.constraint import ConstraintProjector
+from pykg2vec.utils.chunked_loss import chunked_one_to_n_loss
+from pykg2vec.utils.batch_size import find_batch_size
+from pykg2vec.utils.resources import plan_resources, apply_trainer_plan
+from pykg2vec.utils.async_evaluator import AsyncEvaluator
+from pykg2vec.utils.precision import autocast
+from pykg2vec.utils.compiler import CompiledStep
+from pykg2vec.utils.profiler import build_profiler, record
+from pykg2vec.utils.telemetry import EpochTelemetry, count_triples
+from pykg2vec.utils.checkpoint import CheckpointWriter, latest_checkpoint, get_rng_state, set_rng_state
+from pykg2vec.utils.distributed import init_distributed, broadcast_parameters, all_reduce_gradients, all_reduce_sum, is_distributed, is_main_process
 from pykg2vec.utils.visualization import Visualization
 from pykg2vec.data.generator import Generator
+from pykg2vec.data.loader import build_data_loader
+from pykg2vec.data.staging import BatchStager
 from pykg2vec.utils.logger import Logger
 from pykg2vec.common import Monitor, TrainingStrategy
+from pykg2vec.models.KGMeta import Model
 warnings.filterwarnings('ignore')
 
 
@@ -90,6 +109,7 @@ class Trainer:
     def __init__(self, model, config):
         self.model = model
         self.config = config
+        self.model.activation_checkpointing = config.activation_checkpointing
 
         self.best_metric = None
         self.monitor = None
@@ -101,6 +121,12 @@ class Trainer:
         self.optimizer = None
         self.early_stopper = None
 
+        self.compiled_steps = {}
+        self.checkpoint_writer = None
+        self.async_evaluator = None
+        self.telemetry = EpochTelemetry()
+        self.constraint_projector = ConstraintProjector(model, config) if config.constraint is not None else None
+
     def build_model(self, monitor=Monitor.FILTERED_MEAN_RANK):
         """function to build the model"""
         if self.config.load_from_data is not None:
@@ -110,7 +136,50 @@ class Trainer:
 
         self.model.to(self.config.device)
 
-        if self.config.optimizer == "adam":
+        if self.constraint_projector is not None:
+            self.constraint_projector.project()
+
+        if self.config.hogwild_workers > 0 and (self.config.checkpoint_step > 0 or self.config.resume is not None):
+            raise NotImplementedError("Hogwild training does not support the resumable checkpoints, the optimizer states live in the workers.")
+        if self.config.hogwild_workers > 0 and self.config.optimizer not in ("adam", "adagrad", "sgd"):
+            raise NotImplementedError("Hogwild training updates the tables with sparse optimizers, use the adam, adagrad or sgd optimizer.")
+
+        if self.config.world_size > 1:
+            if self.config.hogwild_workers > 0:
+                raise NotImplementedError("Hogwild training cannot be combined with distributed training.")
+            if self.config.async_eval:
+                raise NotImplementedError("Background evaluation cannot be combined with distributed training.")
+            init_distributed(self.config)
+            broadcast_parameters(self.model)
+
+        if self.config.thread_plan:
+            self.config.resource_plan = plan_resources(self.config)
+            apply_trainer_plan(self.config.resource_plan)
+
+        if self.config.entity_chunk_size > 0 and not hasattr(self.model, 'output_layer'):
+            raise NotImplementedError("%s has no output layer for the chunked 1-N loss." % self.model.model_name)
+
+        if self.config.one_to_n is not None:
+            if self.model.training_strategy != TrainingStrategy.POINTWISE_BASED or type(self.model).score_tails is Model.score_tails:
+                raise NotImplementedError("%s has no dense kernels for the 1-N training." % self.model.model_name)
+            if self.config.num_partitions > 0:
+                raise NotImplementedError("The 1-N training cannot be combined with partitioned training.")
+
+        if self.config.num_partitions > 0:
+            if self.config.hogwild_workers > 0 or self.config.world_size > 1:
+                raise NotImplementedError("Partitioned training cannot be combined with Hogwild or distributed training.")
+            if self.config.checkpoint_step > 0 or self.config.resume is not None:
+                raise NotImplementedError("Partitioned training does not support the resumable checkpoints.")
+            if self.config.async_eval or self.config.disp_result:
+                raise NotImplementedError("Partitioned training never assembles the full entity tables for the background evaluation or the plots.")
+            if self.config.neg_pool_size == 0:
+                raise NotImplementedError("Partitioned training draws the negatives from the resident partitions, set the shared negatives (-nps).")
+            if self.config.optimizer != "adagrad":
+                raise NotImplementedError("Partitioned training swaps the row-wise Adagrad state with the partitions, use the adagrad optimizer.")
+
+        if self.config.sparse_grad:
+            self.optimizer = build_sparse_optimizer(self.model, self.config)
+        elif self.config.optimizer == "adam":
             self.optimizer = optim.Adam(
                 self.model.parameters(),
                 lr=self.config.learning_rate,
@@ -139,27 +208,29 @@ class Trainer:
 
     # Training related functions:
     def train_step_pairwise(self, pos_h, pos_r, pos_t, neg_h, neg_r, neg_t):
-        pos_preds = self.model(pos_h, pos_r, pos_t)
-        neg_preds = self.model(neg_h, neg_r, neg_t)
-
-        if self.config.sampling == 'adversarial_negative_sampling':
-            # RotatE: Adversarial Negative Sampling and alpha is the temperature.
-            pos_preds = -pos_preds
-            neg_preds = -neg_preds
-            pos_preds = F.logsigmoid(pos_preds)
-            neg_preds = neg_preds.view((-1, self.config.neg_rate))
-            softmax = nn.Softmax(dim=1)(neg_preds*self.config.alpha).detach()
-            neg_preds = torch.sum(softmax * (F.logsigmoid(-neg_preds)), dim=-1)
-            loss = -neg_preds.mean() - pos_preds.mean()
-        else:
-            # others that use margin-based & pairwise loss function. (uniform or bern)
-            loss = pos_preds + self.config.margin - neg_preds
-            loss = torch.max(loss, torch.zeros_like(loss)).sum()
+        with record('forward'), autocast(self.config):
+            pos_preds = self.model(pos_h, pos_r, pos_t).float()
+            neg_preds = self.model(neg_h, neg_r, neg_t).float()
+
+        with record('loss'), self.loss_stage():
+            if self.config.sampling == 'adversarial_negative_sampling':
+                # RotatE: Adversarial Negative Sampling and alpha is the temperature.
+                pos_preds = -pos_preds
+                neg_preds = -neg_preds
+                pos_preds = F.logsigmoid(pos_preds)
+                neg_preds = neg_preds.view((-1, self.config.neg_rate))
+                softmax = nn.Softmax(dim=1)(neg_preds*self.config.alpha).detach()
+                neg_preds = torch.sum(softmax * (F.logsigmoid(-neg_preds)), dim=-1)
+                loss = -neg_preds.mean() - pos_preds.mean()
+            else:
+                # others that use margin-based & pairwise loss function. (uniform or bern)
+                loss = pos_preds + self.config.margin - neg_preds
+                loss = torch.max(loss, torch.zeros_like(loss)).sum()
 
-        if hasattr(self.model, 'get_reg'):
-            # now only NTN uses regularizer,
-            # other pairwise based KGE methods use normalization to regularize parameters.
-            loss += self.model.get_reg()
+            if hasattr(self.model, 'get_reg'):
+                # now only NTN uses regularizer,
+                # other pairwise based KGE methods use normalization to regularize parameters.
+                loss += self.model.get_reg()
 
         return loss
 
@@ -169,19 +240,22 @@ class Trainer:
                 hr_t = hr_t * (1.0 - self.config.label_smoothing) + 1.0 / self.config.tot_entity
                 tr_h = tr_h * (1.0 - self.config.label_smoothing) + 1.0 / self.config.tot_entity
 
-            pred_tails = self.model(h, r, direction="tail")  # (h, r) -> hr_t forward
-            pred_heads = self.model(t, r, direction="head")  # (t, r) -> tr_h backward
-
-            loss_tails = torch.mean(F.binary_cross_entropy(pred_tails, hr_t))
-            loss_heads = torch.mean(F.binary_cross_entropy(pred_heads, tr_h))
+            with record('forward'), autocast(self.config):
+                pred_tails = self.model(h, r, direction="tail").float()  # (h, r) -> hr_t forward
+                if not self.config.reciprocal:
+                    # with reciprocal relations the heads are trained as the tails of the inverse triples.
+                    pred_heads = self.model(t, r, direction="head").float()  # (t, r) -> tr_h backward
 
-            loss = loss_tails + loss_heads
+            with record('loss'), self.loss_stage():
+                loss = torch.mean(F.binary_cross_entropy(pred_tails, hr_t))
+                if not self.config.reciprocal:
+                    loss = loss + torch.mean(F.binary_cross_entropy(pred_heads, tr_h))
 
         else:
-            loss_tails = self.model(h, r, hr_t, direction="tail")  # (h, r) -> hr_t forward
-            loss_heads = self.model(t, r, tr_h, direction="head")  # (t, r) -> tr_h backward
-
-            loss = loss_tails + loss_heads
+            with record('forward'), autocast(self.config):
+                loss = self.model(h, r, hr_t, direction="tail")  # (h, r) -> hr_t forward
+                if not self.config.reciprocal:
+                    loss = loss + self.model(t, r, tr_h, direction="head")  # (t, r) -> tr_h backward
 
             if hasattr(self.model, 'get_reg'):
                 # now only complex distmult uses regularizer in algorithms,
@@ -189,12 +263,195 @@ class Trainer:
 
         return loss
 
+    def train_step_chunked(self, h, r, t, hr_t, tr_h):
+        """Function to train a batch of ConvE or TuckER with the 1-N loss computed by chunks of config.entity_chunk_size entities.
+
+            Args:
+                h (Tensor): Head entity ids, shape [b].
+                r (Tensor): Relation ids, shape [b].
+                t (Tensor): Tail entity ids, shape [b].
+                hr_t (Tensor): Flat indices of the known tails in the [b, tot_entity] labels.
+                tr_h (Tensor): Flat indices of the known heads in the [b, tot_entity] labels.
+        """
+        weight, bias = self.model.output_layer()
+
+        with record('forward'), autocast(self.config):
+            tails = self.model.project(h, r, direction="tail")
+            if not self.config.reciprocal:
+                heads = self.model.project(t, r, direction="head")
+
+        with record('loss'), self.loss_stage():
+            loss = chunked_one_to_n_loss(tails, weight, bias, hr_t, self.config.label_smoothing, self.config.entity_chunk_size)
+            if not self.config.reciprocal:
+                loss = loss + chunked_one_to_n_loss(heads, weight, bias, tr_h, self.config.label_smoothing, self.config.entity_chunk_size)
+
+        return loss
+
     def train_step_pointwise(self, h, r, t, y):
-        preds = self.model(h, r, t)
-        loss = F.softplus(y*preds).mean()
+        with record('forward'), autocast(self.config):
+            preds = self.model(h, r, t).float()
+
+        with record('loss'), self.loss_stage():
+            loss = F.softplus(y*preds).mean()
+
+            if hasattr(self.model, 'get_reg'): # for complex & complex-N3 & DistMult & CP & ANALOGY
+                loss += self.model.get_reg(h, r, t)
+
+        return loss
+
+    def train_step_one_to_n(self, h, r, t, hr_t=None, tr_h=None):
+        """Function to train a batch of a pointwise model against all the entities (config.one_to_n).
+
+            Every (h, r) is scored against the whole entity table as tails and every (r, t) as
+            heads with one matmul of the dense model.score_tails/score_heads kernels (the tails only
+            with config.reciprocal). With kvsall the loss is the binary cross entropy against all the
+            known tails and heads, with 1vsall the cross entropy of the true tail and head.
+
+            Args:
+                h (Tensor): Head entity ids, shape [b].
+                r (Tensor): Relation ids, shape [b].
+                t (Tensor): Tail entity ids, shape [b].
+                hr_t (Tensor): Flat indices of the known tails in the [b, tot_entity] labels (kvsall).
+                tr_h (Tensor): Flat indices of the known heads in the [b, tot_entity] labels (kvsall).
+        """
+        entities = torch.arange(self.config.tot_entity, device=h.device).unsqueeze(0)
+
+        with record('forward'), autocast(self.config):
+            # the scores are lower for the plausible triples, the logits are their opposites.
+            tail_logits = -self.model.score_tails(h.unsqueeze(0), r.unsqueeze(0), entities)[0].float()
+            if not self.config.reciprocal:
+                head_logits = -self.model.score_heads(entities, r.unsqueeze(0), t.unsqueeze(0))[0].float()
+
+        with record('loss'), self.loss_stage():
+            if self.config.one_to_n == '1vsall':
+                loss = F.cross_entropy(tail_logits, t)
+                if not self.config.reciprocal:
+                    loss = loss + F.cross_entropy(head_logits, h)
+            else:
+                tail_labels = torch.zeros_like(tail_logits).view(-1).index_fill_(0, hr_t, 1.0).view_as(tail_logits)
+                loss = F.binary_cross_entropy_with_logits(tail_logits, tail_labels)
+                if not self.config.reciprocal:
+                    head_labels = torch.zeros_like(head_logits).view(-1).index_fill_(0, tr_h, 1.0).view_as(head_logits)
+                    loss = loss + F.binary_cross_entropy_with_logits(head_logits, head_labels)
+
+            if hasattr(self.model, 'get_reg'):
+                loss += self.model.get_reg(h, r, t)
+
+        return loss
+
+    def train_step_shared(self, h, r, t, neg):
+        """Function to train a batch against chunked negatives shared by the positives (PyTorch-BigGraph style).
+
+            Every chunk of positives is scored against its pool of entities as heads and
+            as tails (as tails only with config.reciprocal) with the dense model.score_heads/score_tails kernels.
+
+            Args:
+                h (Tensor): Head entity ids of the positives, shape [b].
+                r (Tensor): Relation ids of the positives, shape [b].
+                t (Tensor): Tail entity ids of the positives, shape [b].
+                neg (Tensor): Entity pools of shape [c, n], one per chunk of ceil(b / c) positives.
+        """
+        num_pos = h.shape[0]
+        num_chunks = neg.shape[0]
+        chunk_size = (num_pos + num_chunks - 1) // num_chunks
+
+        # pad the last chunk with the first positives, their scores are dropped below.
+        padding = num_chunks * chunk_size - num_pos
+        chunk_h = torch.cat([h, h[:padding]]).view(num_chunks, chunk_size)
+        chunk_r = torch.cat([r, r[:padding]]).view(num_chunks, chunk_size)
+        chunk_t = torch.cat([t, t[:padding]]).view(num_chunks, chunk_size)
+
+        with record('forward'), autocast(self.config):
+            neg_preds = self.model.score_tails(chunk_h, chunk_r, neg)
+            if not self.config.reciprocal:
+                neg_preds = torch.cat([neg_preds, self.model.score_heads(neg, chunk_r, chunk_t)], -1)
+            neg_preds = neg_preds.view(num_chunks * chunk_size, -1)[:num_pos].float()
+            # [b, 2n], [b, n] with reciprocal relations.
+            pos_preds = self.model(h, r, t).float()
+
+        with record('loss'), self.loss_stage():
+            if self.model.training_strategy == TrainingStrategy.POINTWISE_BASED:
+                loss = F.softplus(pos_preds).mean() + F.softplus(-neg_preds).mean()
+
+                if hasattr(self.model, 'get_reg'):
+                    loss += self.model.get_reg(h, r, t)
+
+                return loss
+
+            if self.config.sampling == 'adversarial_negative_sampling':
+                pos_preds = F.logsigmoid(-pos_preds)
+                softmax = nn.Softmax(dim=1)(-neg_preds*self.config.alpha).detach()
+                neg_preds = torch.sum(softmax * (F.logsigmoid(neg_preds)), dim=-1)
+                loss = -neg_preds.mean() - pos_preds.mean()
+            else:
+                # margin loss averaged over the pool of every positive.
+                loss = pos_preds.unsqueeze(-1) + self.config.margin - neg_preds
+                loss = torch.max(loss, torch.zeros_like(loss)).mean(-1).sum()
+
+            if hasattr(self.model, 'get_reg'):
+                loss += self.model.get_reg()
+
+        return loss
+
+    def loss_stage(self):
+        """Function to get the context timing the loss of a train step, a no-op when the step is compiled as one graph."""
+        if self.config.compile_mode is not None:
+            return nullcontext()
+        return self.telemetry.stage('loss')
+
+    def get_train_step(self):
+        """Function to get the train step function matching the training strategy of the model.
 
-        if hasattr(self.model, 'get_reg'): # for complex & complex-N3 & DistMult & CP & ANALOGY
-            loss += self.model.get_reg(h, r, t)
+            With config.compile_mode set, the step (forward pass and loss) is compiled
+            with torch.compile the first time it is requested.
+        """
+        if self.model.training_strategy == TrainingStrategy.PROJECTION_BASED:
+            step = self.train_step_chunked if self.config.entity_chunk_size > 0 else self.train_step_projection
+        elif self.config.one_to_n is not None:
+            step = self.train_step_one_to_n
+        elif self.config.neg_pool_size > 0:
+            step = self.train_step_shared
+        elif self.model.training_strategy == TrainingStrategy.POINTWISE_BASED:
+            step = self.train_step_pointwise
+        elif self.model.training_strategy == TrainingStrategy.PAIRWISE_BASED:
+            step = self.train_step_pairwise
+        else:
+            raise NotImplementedError("Unknown training strategy: %s" % self.model.training_strategy)
+
+        if self.config.compile_mode is None:
+            return step
+
+        if step.__name__ not in self.compiled_steps:
+            self.compiled_steps[step.__name__] = CompiledStep(step, self.config.compile_mode)
+        return self.compiled_steps[step.__name__]
+
+    def train_batch(self, data):
+        """Function to run one optimization step on a staged batch.
+
+            Args:
+                data (list): Tensors of the batch as staged by BatchStager, in the
+                    order expected by the train_step function of the training strategy.
+
+            Returns:
+                Tensor: the loss of the batch.
+        """
+        self.model.train()
+        self.optimizer.zero_grad()
+
+        # with config.precision == 'bf16' only the forward passes of the train steps run under autocast,
+        # the predictions are cast back to fp32 and the losses are computed outside of it.
+        with self.telemetry.stage('forward'):
+            loss = self.get_train_step()(*data)
+
+        with self.telemetry.stage('backward'), record('backward'):
+            loss.backward()
+        if is_distributed():
+            with self.telemetry.stage('sync'), record('sync'):
+                all_reduce_gradients(self.model)
+        with self.telemetry.stage('optimizer'), record('optimizer'):
+            self.optimizer.step()
+            if self.constraint_projector is not None:
+                self.constraint_projector.project_step(data, self.optimizer)
 
         return loss
 
@@ -206,41 +463,101 @@ class Trainer:
         # pdb.set_trace()
 
         """Function to train the model."""
-        self.generator = Generator(self.model, self.config)
-        self.monitor = Monitor.FILTERED_MEAN_RANK
-        for cur_epoch_idx in range(self.config.epochs):
+        if self.config.find_batch_size:
+            find_batch_size(self, memory_cap=self.config.memory_cap, scale_learning_rate=self.config.scale_learning_rate)
+
+        self.generator = self.create_generator()
+        start_epoch_idx = self.start_training()
+
+        cur_epoch_idx = start_epoch_idx - 1
+        for cur_epoch_idx in range(start_epoch_idx, self.config.epochs):
             self._logger.info("Epoch[%d/%d]" % (cur_epoch_idx, self.config.epochs))
 
             self.train_model_epoch(cur_epoch_idx)
 
-            if cur_epoch_idx % self.config.test_step == 0:
-                self.model.eval()
-                metrics = self.evaluator.mini_test(cur_epoch_idx)
+            if self.end_epoch(cur_epoch_idx):
+                ### Early Stop Mechanism
+                ### start to check if the metric is still improving after each mini-test.
+                ### Example, if test_step == 5, the trainer will check metrics every 5 epoch.
+                break
 
-                if self.early_stopper.should_stop(metrics):
-                    ### Early Stop Mechanism
-                    ### start to check if the metric is still improving after each mini-test.
-                    ### Example, if test_step == 5, the trainer will check metrics every 5 epoch.
-                    break
+        self.stop_generator()
+
+        return self.finish_training(cur_epoch_idx)
+
+    def start_training(self):
+        """Function to resume from the checkpoint and to start the checkpoint writer and the background evaluator.
+
+            Returns:
+                int: the index of the first epoch to train.
+        """
+        self.monitor = Monitor.FILTERED_MEAN_RANK
+
+        start_epoch_idx = 0
+        if self.config.resume is not None:
+            start_epoch_idx = self.load_checkpoint(self.config.resume)
+        if is_main_process():
+            self.telemetry.open(self.config.path_result, self.model.model_name)
+        if self.config.checkpoint_step > 0 and is_main_process():
+            self.checkpoint_writer = CheckpointWriter(self.config.path_tmp / self.model.model_name / 'checkpoints',
+                                                      keep=self.config.keep_checkpoints)
+        if self.config.async_eval:
+            # the evaluator process copies the model with its full entity tables.
+            self.prepare_tables()
+            self.async_evaluator = AsyncEvaluator(self.model, self.config)
+
+        return start_epoch_idx
+
+    def end_epoch(self, cur_epoch_idx):
+        """Function to run the mini-test, record the telemetry and write the checkpoint of a trained epoch.
+
+            Returns:
+                bool: True if the training should stop.
+        """
+        if cur_epoch_idx % self.config.test_step == 0:
+            self.model.eval()
+            self.prepare_tables()
+            with self.telemetry.stage('evaluation'):
+                if self.async_evaluator is not None:
+                    # the metrics of the earlier snapshots are acted on as they arrive.
+                    self.async_evaluator.submit(cur_epoch_idx)
+                    results = self.collect_async_results(self.async_evaluator.poll())
+                else:
+                    results = [(self.evaluator.mini_test(cur_epoch_idx), None)]
+            self.telemetry.end_epoch(cur_epoch_idx, getattr(self.generator, 'steady_state', None))
+
+            if any(self.update_best_model(metrics, state_dict) for metrics, state_dict in results):
+                return True
+        else:
+            self.telemetry.end_epoch(cur_epoch_idx, getattr(self.generator, 'steady_state', None))
 
-                # store the best model weights.
-                if self.config.save_model:
-                    if self.best_metric is None:
-                        self.best_metric = metrics
-                        self.save_model()
-                    else:
-                        if self.monitor == Monitor.MEAN_RANK or self.monitor == Monitor.FILTERED_MEAN_RANK:
-                            is_better = self.best_metric[self.monitor.value] > metrics[self.monitor.value]
-                        else:
-                            is_better = self.best_metric[self.monitor.value] < metrics[self.monitor.value]
-                        if is_better:
-                            self.save_model()
-                            self.best_metric = metrics
+        if self.checkpoint_writer is not None and (cur_epoch_idx + 1) % self.config.checkpoint_step == 0:
+            self.checkpoint_writer.write(self.get_checkpoint_state(cur_epoch_idx), cur_epoch_idx)
 
+        return False
+
+    def finish_training(self, cur_epoch_idx):
+        """Function to collect the pending checkpoints and evaluations, run the full test and save the results.
+
+            Returns:
+                int: the index of the last trained epoch.
+        """
+        if self.checkpoint_writer is not None:
+            self.checkpoint_writer.close()
+
+        if self.async_evaluator is not None:
+            for metrics, state_dict in self.collect_async_results(self.async_evaluator.drain()):
+                if self.update_best_model(metrics, state_dict):
+                    break
+            self.async_evaluator.stop()
+
+        self.prepare_tables()
         self.evaluator.full_test(cur_epoch_idx)
-        self.evaluator.metric_calculator.save_test_summary(self.model.model_name)
 
-        self.generator.stop()
+        if not is_main_process():
+            return cur_epoch_idx
+
+        self.evaluator.metric_calculator.save_test_summary(self.model.model_name)
         self.save_training_result()
 
         # if self.config.save_model:
@@ -253,73 +570,169 @@ class Trainer:
 
         return cur_epoch_idx # the runned epoches.
 
+    def update_best_model(self, metrics, state_dict=None):
+        """Function to feed the metrics of a mini-test to the early stopper and to save the best model.
+
+            Args:
+                metrics (dict): The metrics of the mini-test.
+                state_dict (dict): The weights the metrics were computed with, None for the current weights.
+
+            Returns:
+                bool: True if the training should stop.
+        """
+        if self.early_stopper.should_stop(metrics):
+            return True
+
+        # store the best model weights.
+        if self.config.save_model and is_main_process():
+            if self.best_metric is None:
+                self.best_metric = metrics
+                self.save_model(state_dict)
+            else:
+                if self.monitor == Monitor.MEAN_RANK or self.monitor == Monitor.FILTERED_MEAN_RANK:
+                    is_better = self.best_metric[self.monitor.value] > metrics[self.monitor.value]
+                else:
+                    is_better = self.best_metric[self.monitor.value] < metrics[self.monitor.value]
+                if is_better:
+                    self.save_model(state_dict)
+                    self.best_metric = metrics
+
+        return False
+
+    def collect_async_results(self, results):
+        """Function to merge the metrics computed by the background evaluator into the evaluation history.
+
+            Returns:
+                list: (metrics, state_dict) of every evaluation, in order.
+        """
+        metric_calculator = self.evaluator.metric_calculator
+        for epoch, metrics, history, _ in results:
+            self._logger.info("Background evaluation of epoch %d: %s" % (epoch, metrics))
+            for name, values in history.items():
+                getattr(metric_calculator, name).update(values)
+        return [(metrics, state_dict) for _, metrics, _, state_dict in results]
+
     def tune_model(self):
         """Function to tune the model."""
         current_loss = float("inf")
 
-        self.generator = Generator(self.model, self.config)
         self.evaluator = Evaluator(self.model, self.config, tuning=True)
+        self.generator = self.create_generator()
 
         for cur_epoch_idx in range(self.config.epochs):
             current_loss = self.train_model_epoch(cur_epoch_idx, tuning=True)
 
+        self.prepare_tables()
         self.evaluator.full_test(cur_epoch_idx)
 
-        self.generator.stop()
+        self.stop_generator()
 
         return current_loss
 
+    def create_generator(self):
+        """Function to create the source of training batches,
+           either the Generator, a torch DataLoader if config.data_loader is set,
+           the pool of Hogwild trainer processes if config.hogwild_workers is set
+           or the partitioned trainer if config.num_partitions is set."""
+        if self.config.num_partitions > 0:
+            partitions = PartitionedTrainer(self)
+            self.evaluator.partitions = partitions
+            return partitions
+        if self.config.hogwild_workers > 0:
+            return HogwildTrainer(self.model, self.config)
+        if self.config.data_loader is not None:
+            return build_data_loader(self.model, self.config, iterable=self.config.data_loader == 'iterable')
+        return Generator(self.model, self.config)
+
+    def stop_generator(self):
+        """Function to stop the worker processes of the Generator."""
+        if isinstance(self.generator, (Generator, HogwildTrainer, PartitionedTrainer)):
+            self.generator.stop()
+
+    def prepare_tables(self):
+        """Function to write back the resident partitions of the partitioned training and to project the
+           constrained tables before the model is evaluated."""
+        if isinstance(self.generator, PartitionedTrainer):
+            self.generator.flush()
+        if self.constraint_projector is not None:
+            self.constraint_projector.project()
+
     def train_model_epoch(self, epoch_idx, tuning=False):
         """Function to train the model for one epoch."""
-        acc_loss = 0
+        self.telemetry.start_epoch()
 
-        num_batch = self.config.tot_train_triples // self.config.batch_size if not self.config.debug else 10
+        if isinstance(self.generator, HogwildTrainer):
+            acc_loss = self.generator.train_epoch(epoch_idx, self.telemetry)
+            self.training_results.append([epoch_idx, acc_loss])
+            return acc_loss
+        if isinstance(self.generator, PartitionedTrainer):
+            acc_loss = self.generator.train_epoch(epoch_idx)
+            self.training_results.append([epoch_idx, acc_loss])
+            return acc_loss
 
-        self.generator.start_one_epoch(num_batch)
+        acc_loss = 0
+
+        staged_batches, num_batch = self.stage_epoch(epoch_idx)
 
         progress_bar = tqdm(range(num_batch))
 
-        for _ in progress_bar:
-            data = list(next(self.generator))
-
-            self.model.train()
-            self.optimizer.zero_grad()
-
-            if self.model.training_strategy == TrainingStrategy.PROJECTION_BASED:
-                h = torch.LongTensor(data[0]).to(self.config.device)
-                r = torch.LongTensor(data[1]).to(self.config.device)
-                t = torch.LongTensor(data[2]).to(self.config.device)
-                hr_t = data[3].to(self.config.device)
-                tr_h = data[4].to(self.config.device)
-                loss = self.train_step_projection(h, r, t, hr_t, tr_h)
-            elif self.model.training_strategy == TrainingStrategy.POINTWISE_BASED:
-                h = torch.LongTensor(data[0]).to(self.config.device)
-                r = torch.LongTensor(data[1]).to(self.config.device)
-                t = torch.LongTensor(data[2]).to(self.config.device)
-                y = torch.LongTensor(data[3]).to(self.config.device)
-                loss = self.train_step_pointwise(h, r, t, y)
-            elif self.model.training_strategy == TrainingStrategy.PAIRWISE_BASED:
-                pos_h = torch.LongTensor(data[0]).to(self.config.device)
-                pos_r = torch.LongTensor(data[1]).to(self.config.device)
-                pos_t = torch.LongTensor(data[2]).to(self.config.device)
-                neg_h = torch.LongTensor(data[3]).to(self.config.device)
-                neg_r = torch.LongTensor(data[4]).to(self.config.device)
-                neg_t = torch.LongTensor(data[5]).to(self.config.device)
-                loss = self.train_step_pairwise(pos_h, pos_r, pos_t, neg_h, neg_r, neg_t)
-            else:
-                raise NotImplementedError("Unknown training strategy: %s" % self.model.training_strategy)
+        queue_size = self.generator.processed_queue_size if isinstance(self.generator, Generator) else None
 
-            loss.backward()
-            self.optimizer.step()
-            acc_loss += loss.item()
+        try:
+            with build_profiler(self.config, 'train', epoch_idx, self.model.model_name) as profiler:
+                for _ in progress_bar:
+                    with self.telemetry.stage('generator'), record('sampling'):
+                        data = next(staged_batches)
+                    occupancy = self.generator.occupancy() / queue_size if queue_size else None
+
+                    loss = self.train_batch(data)
+                    acc_loss += loss.item()
+                    self.telemetry.add_batch(*count_triples(data, self.model.training_strategy, self.config), occupancy=occupancy)
 
-            if not tuning:
-                progress_bar.set_description('acc_loss: %f, cur_loss: %f'% (acc_loss, loss))
+                    if not tuning:
+                        progress_bar.set_description('acc_loss: %f, cur_loss: %f'% (acc_loss, loss))
+
+                    profiler.step()
+        finally:
+            staged_batches.close()
+
+        self.telemetry.add_time('staging', staged_batches.stage_time)
+
+        if is_distributed():
+            acc_loss = all_reduce_sum(acc_loss)
 
         self.training_results.append([epoch_idx, acc_loss])
 
         return acc_loss
 
+    def stage_epoch(self, epoch_idx, num_batch=None):
+        """Function to start an epoch of the generator and stage its batches.
+
+            Args:
+                epoch_idx (int): The index of the epoch.
+                num_batch (int): The number of batches to stage, None for a whole epoch.
+
+            Returns:
+                tuple: the BatchStager of the epoch and its number of batches.
+        """
+        if num_batch is None:
+            # the size of the smallest shard, so that every shard runs the same number of steps.
+            num_train_triples = self.config.tot_train_triples // self.config.num_shards
+            if self.config.reciprocal:
+                num_train_triples *= 2
+            num_batch = num_train_triples // self.config.batch_size if not self.config.debug else 10
+
+        if isinstance(self.generator, DataLoader):
+            num_batch = min(num_batch, len(self.generator))
+            if hasattr(self.generator.dataset, 'set_epoch'):
+                self.generator.dataset.set_epoch(epoch_idx)
+            batches = iter(self.generator)
+        else:
+            self.generator.start_one_epoch(num_batch)
+            batches = self.generator
+
+        return BatchStager(batches, num_batch, self.config, depth=self.config.staging_depth), num_batch
+
     def enter_interactive_mode(self):
         self.build_model()
         self.load_model()
@@ -400,16 +813,64 @@ class Trainer:
         return {rel: idx2rel[rel] for rel in rels}
 
     # ''' Procedural functions:'''
-    def save_model(self):
-        """Function to save the model."""
+    def save_model(self, state_dict=None):
+        """Function to save the model (or the given weights of the model)."""
         saved_path = self.config.path_tmp / self.model.model_name
         saved_path.mkdir(parents=True, exist_ok=True)
-        torch.save(self.model.state_dict(), str(saved_path / self.TRAINED_MODEL_FILE_NAME))
+        state_dict = self.model.state_dict() if state_dict is None else state_dict
+        torch.save(state_dict, str(saved_path / self.TRAINED_MODEL_FILE_NAME))
+        if isinstance(self.generator, PartitionedTrainer):
+            # the entity tables of the state dict only hold the resident partitions.
+            self.generator.save(saved_path / 'saved_partitions')
 
         """Save hyper-parameters into a yaml file with the model"""
         save_path_config = saved_path / self.TRAINED_MODEL_CONFIG_NAME
         np.save(save_path_config, self.config)
 
+    def get_checkpoint_state(self, epoch_idx):
+        """Function to get the complete training state after an epoch, as saved in the checkpoints."""
+        metric_calculator = self.evaluator.metric_calculator
+        return {
+            'epoch': epoch_idx,
+            'model': self.model.state_dict(),
+            'optimizer': self.optimizer.state_dict(),
+            'training_results': self.training_results,
+            'best_metric': self.best_metric,
+            'early_stopper': {'previous_metrics': self.early_stopper.previous_metrics,
+                              'patience_left': self.early_stopper.patience_left},
+            'metrics': {name: getattr(metric_calculator, name) for name in ['mr', 'fmr', 'mrr', 'fmrr', 'hit', 'fhit']},
+            'rng': get_rng_state(),
+        }
+
+    def load_checkpoint(self, checkpoint_path):
+        """Function to restore the training state saved in a checkpoint.
+
+            The training continues exactly where it stopped when the batches are drawn
+            in the training process (-dl map -npg 0 -sd 0), otherwise the sampling of
+            the worker processes and threads is not reproduced.
+
+            Args:
+                checkpoint_path (str): A checkpoint file, or a directory holding checkpoints (the latest is used).
+
+            Returns:
+                int: the index of the epoch to continue from.
+        """
+        checkpoint_path = latest_checkpoint(checkpoint_path)
+        state = torch.load(str(checkpoint_path), map_location=self.config.device, weights_only=False)
+
+        self.model.load_state_dict(state['model'])
+        self.optimizer.load_state_dict(state['optimizer'])
+        self.training_results = state['training_results']
+        self.best_metric = state['best_metric']
+        self.early_stopper.previous_metrics = state['early_stopper']['previous_metrics']
+        self.early_stopper.patience_left = state['early_stopper']['patience_left']
+        for name, values in state['metrics'].items():
+            setattr(self.evaluator.metric_calculator, name, values)
+        set_rng_state(state['rng'])
+
+        self._logger.info("Resumed the training from %s after epoch %d." % (checkpoint_path, state['epoch']))
+        return state['epoch'] + 1
+
     def load_model(self, model_path=None):
         """Function to load the model."""
         if model_path is None:
@@ -483,17 +944,22 @@ class Trainer:
         with open(str(save_path / "rel_labels.tsv"), 'w') as l_export_file:
             for label in idx2rel.values():
                 l_export_file.write(label + "\n")
+            if self.config.reciprocal:
+                for label in idx2rel.values():
+                    l_export_file.write(label + "^-1\n")
 
         for named_embedding in self.model.parameter_list:
-            all_ids = list(range(0, int(named_embedding.weight.shape[0])))
-
             stored_name = named_embedding.name
 
             if len(named_embedding.weight.shape) == 2:
-                all_embs = named_embedding.weight.detach().cpu().numpy()
+                if isinstance(self.generator, PartitionedTrainer) and named_embedding in self.generator.entity_tables:
+                    # the rows are read from the partition files.
+                    all_embs = self.generator.iter_rows(named_embedding)
+                else:
+                    all_embs = named_embedding.weight.detach().cpu().numpy()
                 with open(str(save_path / ("%s.tsv" % stored_name)), 'w') as v_export_file:
-                    for idx in all_ids:
-                        v_export_file.write("\t".join([str(x) for x in all_embs[idx]]) + "\n")
+                    for emb in all_embs:
+                        v_export_file.write("\t".join([str(x) for x in emb]) + "\n")
 
     def save_training_result(self):
         """Function that saves training result"""